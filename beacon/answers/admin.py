@@ -17,7 +17,7 @@ from beacon.users.tasks import send_multiple_f2f_appointments_data_task
 
 from .models import UserAppointment, UserResponse
 from .services import backup_user_response_json, generate_user_response_json
-from .utils import ordered
+from .utils import get_response_fingerprint
 
 
 @admin.register(UserResponse)
@@ -153,7 +153,9 @@ class UserResponseAdmin(admin.ModelAdmin):
         old_response_json = user_response.response.copy()
         new_response_json = generate_user_response_json(user_response=user_response)
         if old_response_json:
-            if ordered(old_response_json) != ordered(new_response_json):
+            if user_response.get_response_fingerprint() != get_response_fingerprint(
+                new_response_json
+            ):
                 backup_user_response_json(
                     answer_obj=user_response, response_json=old_response_json
                 )
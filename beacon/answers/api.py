@@ -64,8 +64,7 @@ class AnswerViewSet(
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         validated_response = serializer.validated_data.get("response")
-        services.replace_or_append_response(instance, validated_response)
-        services.set_attributes_from_response_json(instance)
+        services.add_or_update_answers(instance, validated_response)
         return response.Ok({"message": "Answer appended successfully!"})
 
     @action(methods=["PATCH"], detail=True, url_path="add-or-update-answer")
@@ -74,8 +73,7 @@ class AnswerViewSet(
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         validated_response = serializer.validated_data.get("response")
-        services.replace_or_append_response(instance, validated_response)
-        services.set_attributes_from_response_json(instance)
+        services.add_or_update_answers(instance, validated_response)
         return response.Ok({"message": "Answer updated successfully!"})
 
     @action(
@@ -113,17 +111,21 @@ class AppointmentViewSet(
         context["organisation"] = organisation
         return context
 
-    def set_attribute_from_response_json(self, obj):
-        user_appointment_object = None
-        for answer in obj.response:
-            _, user_appointment_object = services.set_attribute_from_response(
-                obj.user_response, obj, answer
+    def set_attribute_from_response_json(self, obj, response_json, update_fields=()):
+        appointment_data = {}
+        for answer in response_json:
+            services.set_attribute_from_response(
+                obj.user_response, answer, appointment_data
             )
-        user_appointment_object.save()
+        services.update_or_create_appointment(
+            obj.user_response, obj, appointment_data, update_fields=update_fields
+        )
 
     def perform_create(self, serializer):
         super().perform_create(serializer)
-        return self.set_attribute_from_response_json(serializer.instance)
+        return self.set_attribute_from_response_json(
+            serializer.instance, serializer.instance.response
+        )
 
     def update(self, request, *args, **kwargs):
         partial = kwargs.pop("partial", False)
@@ -131,8 +133,10 @@ class AppointmentViewSet(
         serializer = self.get_serializer(instance, data=request.data, partial=partial)
         serializer.is_valid(raise_exception=True)
         validated_response = serializer.validated_data.get("response")
-        services.replace_or_append_response(instance, validated_response)
-        self.set_attribute_from_response_json(instance)
+        services.replace_or_append_response(instance, validated_response, save=False)
+        self.set_attribute_from_response_json(
+            instance, validated_response, update_fields=["response"]
+        )
         return response.Ok(serializer.data)
 
     @action(methods=["POST"], detail=True, url_path="finalize")
@@ -96,3 +96,6 @@ F2F_HOME_ADDRESS = "home_address"
 F2F_OTHER_ADDRESS = "other_address"
 F2F_PHONE = "phone"
 F2F_EMAIL = "email"
+
+# A full snapshot of the response JSON is stored after these many backup versions
+RESPONSE_BACKUP_SNAPSHOT_INTERVAL = 10
@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+from django.core.management.base import BaseCommand
+
+from beacon.answers.models import UserResponse
+from beacon.answers.services import compact_user_response_backup
+
+
+class Command(BaseCommand):
+    help = "Move response JSON backups of user responses into the backup table"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=100,
+            help="Number of user responses to fetch per query",
+        )
+
+    def handle(self, *args, **options):
+        user_responses = (
+            UserResponse.objects.filter(response_backup__isnull=False)
+            .only("id", "response_backup")
+            .order_by("id")
+        )
+        compacted_count = 0
+        backup_count = 0
+        for user_response in user_responses.iterator(chunk_size=options["chunk_size"]):
+            backup_count += len(compact_user_response_backup(user_response))
+            compacted_count += 1
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Successfully moved {backup_count} backups of {compacted_count} user responses!"
+            )
+        )
@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+from django.core.management.base import BaseCommand
+
+from beacon.answers.models import UserResponse
+from beacon.answers.services import regenerate_user_response_jsons
+
+
+class Command(BaseCommand):
+    help = "Regenerate response JSON of all user responses from their answer columns"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of user responses to write per query",
+        )
+
+    def handle(self, *args, **options):
+        updated_count, failed_ids = regenerate_user_response_jsons(
+            UserResponse.objects.all(), batch_size=options["batch_size"]
+        )
+        for user_response_id in failed_ids:
+            self.stdout.write(
+                self.style.WARNING(
+                    f"Unable to regenerate response JSON of user response {user_response_id}"
+                )
+            )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Successfully regenerated response JSON of {updated_count} user responses!"
+            )
+        )
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 3.2.11 on 2026-10-18 18:42
+
+import uuid
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("answers", "0031_auto_20220328_1248"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="UserResponseBackup",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("modified_at", models.DateTimeField(auto_now=True)),
+                ("version", models.PositiveIntegerField(verbose_name="version")),
+                (
+                    "is_snapshot",
+                    models.BooleanField(default=False, verbose_name="is snapshot"),
+                ),
+                ("data", models.JSONField(verbose_name="data")),
+                ("backed_up_at", models.DateTimeField(verbose_name="backed up at")),
+                (
+                    "user_response",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="backups",
+                        to="answers.userresponse",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "answer backup",
+                "verbose_name_plural": "answer backups",
+                "db_table": "answer_backup",
+                "ordering": ["user_response", "version"],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="userresponsebackup",
+            constraint=models.UniqueConstraint(
+                fields=("user_response", "version"), name="unique_answer_backup_version"
+            ),
+        ),
+    ]
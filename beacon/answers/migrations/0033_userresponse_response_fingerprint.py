@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 3.2.11 on 2026-10-18 19:02
+
+# Standard Library
+import hashlib
+import json
+
+from django.db import migrations, models
+
+
+def ordered(obj):
+    """Frozen copy of `answers.utils.ordered`."""
+    if isinstance(obj, dict):
+        return sorted((k, ordered(v)) for k, v in obj.items())
+    if isinstance(obj, list):
+        return sorted(ordered(x) for x in obj)
+    else:
+        return str(obj)
+
+
+def get_response_fingerprint(response):
+    """Frozen copy of `answers.utils.get_response_fingerprint`."""
+    canonical = json.dumps(ordered(response), separators=(",", ":"))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def set_response_fingerprint(apps, schema_editor):
+    user_response_model = apps.get_model("answers", "UserResponse")
+    batch = []
+    for user_response in user_response_model.objects.only("id", "response").iterator(
+        chunk_size=500
+    ):
+        user_response.response_fingerprint = get_response_fingerprint(
+            user_response.response
+        )
+        batch.append(user_response)
+        if len(batch) >= 500:
+            user_response_model.objects.bulk_update(batch, ["response_fingerprint"])
+            batch = []
+    if batch:
+        user_response_model.objects.bulk_update(batch, ["response_fingerprint"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("answers", "0032_userresponsebackup"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="userresponse",
+            name="response_fingerprint",
+            field=models.CharField(
+                blank=True, editable=False, max_length=64, null=True
+            ),
+        ),
+        migrations.RunPython(set_response_fingerprint, migrations.RunPython.noop),
+    ]
@@ -10,6 +10,8 @@ from django.utils.translation import gettext_lazy as _
 from beacon.base.models import TimeStampedUUIDModel
 from beacon.organisations.models import Organisation
 
+from .utils import get_response_fingerprint
+
 
 class UserResponse(TimeStampedUUIDModel):
     """Store answers from each individual"""
@@ -20,9 +22,13 @@ class UserResponse(TimeStampedUUIDModel):
     APPOINTMENT_CHOICES = [VIDEO, PHONE, FACE_TO_FACE]
 
     response = JSONField()
-    # Creating a backup of response JSON. Because SCC can update the existing answers of a user to "null", which if
-    # creates any unforeseeable issue in future, we can use this response backup to get the working data back. And this
-    # also helps in tracking answer changes.
+    # Canonical hash of `response` (see `utils.get_response_fingerprint`), kept up to date on save. Used to detect
+    # changes of the response JSON without comparing whole trees.
+    response_fingerprint = models.CharField(
+        max_length=64, null=True, blank=True, editable=False
+    )
+    # Legacy backups of response JSON keyed by timestamp. New backups are stored in `UserResponseBackup`, and
+    # existing ones are moved there by `compact_user_response_backups` management command.
     response_backup = JSONField(null=True, default=None)
 
     request_type = models.CharField(max_length=30, null=True, default="Emotional")
@@ -99,6 +105,20 @@ class UserResponse(TimeStampedUUIDModel):
     def __str__(self):
         return "{} - {}".format(self.id, self.user)
 
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None or "response" in update_fields:
+            self.response_fingerprint = get_response_fingerprint(self.response)
+            if update_fields is not None:
+                kwargs["update_fields"] = {*update_fields, "response_fingerprint"}
+        super().save(*args, **kwargs)
+
+    def get_response_fingerprint(self):
+        """Return stored fingerprint of `response`, computing it for rows saved before it existed."""
+        if self.response_fingerprint is None:
+            return get_response_fingerprint(self.response)
+        return self.response_fingerprint
+
 
 class UserAppointment(TimeStampedUUIDModel):
     VIDEO = "video"
@@ -187,3 +207,40 @@ class UserAppointment(TimeStampedUUIDModel):
 
     def __str__(self):
         return "{} - {}".format(self.id, self.user_response)
+
+
+class UserResponseBackup(TimeStampedUUIDModel):
+    """
+    Append-only history of a user's response JSON.
+
+    SCC can update the existing answers of a user to "null", which if creates any
+    unforeseeable issue in future, we can use these backups to get the working data
+    back. And this also helps in tracking answer changes.
+
+    Every `RESPONSE_BACKUP_SNAPSHOT_INTERVAL` versions a full snapshot of the response
+    JSON is stored in `data`, while versions in between only store the `dictdiffer`
+    diff against the previous version.
+    """
+
+    user_response = models.ForeignKey(
+        UserResponse, on_delete=models.CASCADE, related_name="backups"
+    )
+    version = models.PositiveIntegerField(_("version"))
+    is_snapshot = models.BooleanField(_("is snapshot"), default=False)
+    data = JSONField(_("data"))
+    backed_up_at = models.DateTimeField(_("backed up at"))
+
+    class Meta:
+        db_table = "answer_backup"
+        verbose_name = _("answer backup")
+        verbose_name_plural = _("answer backups")
+        ordering = ["user_response", "version"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user_response", "version"],
+                name="unique_answer_backup_version",
+            )
+        ]
+
+    def __str__(self):
+        return "{} - v{}".format(self.user_response_id, self.version)
@@ -1,35 +1,35 @@
 # -*- coding: utf-8 -*-
+# Standard Library
+import copy
+
 # Third Party Stuff
+import dictdiffer
 import jwt
 from django.conf import settings
 from django.core.signing import BadSignature, SignatureExpired, TimestampSigner
+from django.db import transaction
 from django.utils import timezone
 from rest_framework.exceptions import ValidationError
 
 # beacon Stuff
+from beacon.base.utils.tokens import unsign_token
 from beacon.questionnaire.choices import QUESTION_KEYS
-from beacon.questionnaire.models import Option, Question
+from beacon.questionnaire.index import get_questionnaire_index
+from beacon.questionnaire.models import Question
 from beacon.users.choices import STATE_CHOICES
 
 from . import constants, utils
-from .models import UserAppointment, UserResponse
+from .models import UserAppointment, UserResponse, UserResponseBackup
 
 ALGORITHM = "HS256"  # type: str
 
 
 def get_user_response_for_token(token, scope):
-    signer = TimestampSigner()
     try:
-        token = signer.unsign(
+        data = unsign_token(
             token, max_age=60 * settings.ANSWER_PERMISSION_SESSION_TIMEOUT
         )
-    except SignatureExpired:
-        return None
-    except BadSignature:
-        return None
-    try:
-        data = jwt.decode(token, settings.SECRET_KEY, algorithms=[ALGORITHM])
-    except jwt.DecodeError:
+    except (SignatureExpired, BadSignature, jwt.DecodeError):
         return None
 
     try:
@@ -107,17 +107,18 @@ def validate_multiple_choice_or_checkbox(question, response):
                 "Length of array should be maximum {} for question id {} "
                 "response!".format(max_length, question.id)
             )
-    choices = list(question.choices.all().values_list("text", flat=True))
+    choice_values = get_questionnaire_index().get_choice_values(question)
     text_mapped_values = list()
     for res in response:
-        choice = next((item for item in choices if item[0] == res), None)
-        if choice is None:
+        if not isinstance(res, str) or res not in choice_values:
             raise ValidationError(
                 f"'{response}' doesn't exists in valid choices of question"
                 f" id = '{question.id}', info = '{get_question_info(question)}'"
             )
-        text_mapped_value = choice[1] if choice[1] is not None else choice[0]
-        text_mapped_values.append(text_mapped_value)
+        text_mapped_value = choice_values[res]
+        text_mapped_values.append(
+            text_mapped_value if text_mapped_value is not None else res
+        )
     return get_formatted_response(
         question, response, text_mapped_value=text_mapped_values
     )
@@ -145,14 +146,15 @@ def validate_string_type(question, response):
 
 def validate_dropdown_or_checkbox_choice(question, response):
     validate_string_type(question, response)
-    choices = list(question.choices.all().values_list("text", "text_mapped_value"))
-    choice = next((item for item in choices if item[0] == response), None)
-    if choice is None:
+    choice_values = get_questionnaire_index().get_choice_values(question)
+    if response not in choice_values:
         raise ValidationError(
             f"'{response}' doesn't exists in valid choices of question"
             f" id = '{question.id}', info = '{get_question_info(question)}'"
         )
-    text_mapped_value = choice[1] if choice[1] is not None else choice[0]
+    text_mapped_value = choice_values[response]
+    if text_mapped_value is None:
+        text_mapped_value = response
     return get_formatted_response(
         question, response, text_mapped_value=text_mapped_value
     )
@@ -261,7 +263,7 @@ def validate_nested_response(question, response, organisation=None):
 
 
 def validate_multiple_questions_response(
-    question, response, questions_qs, organisation=None
+    question, response, questionnaire_index, organisation=None
 ):
     if response:
         multiple_questions_response = response.pop("multiple_questions_response", None)
@@ -271,14 +273,11 @@ def validate_multiple_questions_response(
             for question_response in multiple_questions_response:
                 question_id = question_response.get("question")
                 answer = question_response.get("answer")
-                array_questions = list(
-                    filter(lambda q: str(q.id) == question_id, questions_qs)
-                )
-                if not array_questions:
+                array_question = questionnaire_index.get_question(question_id)
+                if array_question is None:
                     raise ValidationError(
                         f"Question with id {question_id} does not exists"
                     )
-                array_question = array_questions[0]
                 formatted_response["multiple_questions_response"].append(
                     validate_on_question_type(array_question, answer, organisation)
                 )
@@ -289,23 +288,22 @@ def validate_multiple_questions_response(
     )
 
 
-def validate_single_response(response, questions_qs, organisation=None):
+def validate_single_response(response, questionnaire_index, organisation=None):
     question_id = response.get("question")
     answer = response.get("answer")
-    questions = list(filter(lambda q: str(q.id) == question_id, questions_qs))
-    if not questions:
+    question = questionnaire_index.get_question(question_id)
+    if question is None:
         raise ValidationError(f"Question with id {question_id} doesn't exists")
-    question = questions[0]
     if question.nested_question:
         return validate_nested_response(question, response, organisation=None)
     elif question.kind == question.MULTIPLE_QUESTIONS:
         return validate_multiple_questions_response(
-            question, response, questions_qs, organisation
+            question, response, questionnaire_index, organisation
         )
     return validate_on_question_type(question, answer, organisation)
 
 
-def validate_response_json(json_data, organisation=None):
+def validate_response_json(json_data, organisation=None, questionnaire_index=None):
     """
     Method to validate user response json (question-answers) data, convert and return it in a verbose format.
     Example input `json_data`:
@@ -333,56 +331,91 @@ def validate_response_json(json_data, organisation=None):
     """
     validated_json = list()
     if json_data:
-        questions = Question.objects.prefetch_related("choices").all()
+        if questionnaire_index is None:
+            questionnaire_index = get_questionnaire_index()
         for response in json_data:
             validated_json.append(
-                validate_single_response(response, questions, organisation)
+                validate_single_response(response, questionnaire_index, organisation)
             )
     return validated_json
 
 
-def update_or_create_appointment(appointment_instance, appointment_data: dict):
+def get_appointment_data(appointment_data: dict):
+    """
+    Return appointment attributes which are fields of `UserAppointment`. Questions can
+    still refer to removed fields, e.g. `f2f_confirm`, whose answers are ignored.
+    """
+    field_names = set()
+    for field in UserAppointment._meta.concrete_fields:
+        field_names |= {field.name, field.attname}
+    return {
+        attr: value for attr, value in appointment_data.items() if attr in field_names
+    }
+
+
+def update_or_create_appointment(
+    user_response_object, appointment_instance, appointment_data: dict, update_fields=()
+):
+    """
+    Write collected appointment attributes to user's latest appointment in a single
+    query, creating the appointment if user doesn't have one yet.
+
+    :param update_fields: other already set fields of `appointment_instance` to save
+    """
+    appointment_data = get_appointment_data(appointment_data)
     if appointment_instance is None:
-        return UserAppointment.objects.create(**appointment_data)
+        if not appointment_data:
+            return None
+        appointment_instance = user_response_object.appointments.first()
+        if appointment_instance is None:
+            return UserAppointment.objects.create(
+                user_response=user_response_object, **appointment_data
+            )
 
     for attr, value in appointment_data.items():
         setattr(appointment_instance, attr, value)
-    return appointment_instance.save()
+    update_fields = set(appointment_data) | set(update_fields)
+    if update_fields:
+        appointment_instance.save(update_fields=update_fields | {"modified_at"})
+    return appointment_instance
 
 
-def replace_or_append_response(instance, validated_response):
+def replace_or_append_response(instance, validated_response, save=True):
     """
     Update existing json with new response
     :param instance: instance of UserResponse or UserAppointment
     :param validated_response:
+    :param save: whether to save the whole instance after updating its response
     :return: updated instance
     """
     response = instance.response
     if response == {}:
         response = []
+    # Position of the first answer of every question, so that each answer is looked up
+    # in constant time instead of scanning the whole response
+    question_indexes = {}
+    for index, dct in enumerate(response):
+        question_indexes.setdefault(dct["question"], index)
     for answer in validated_response:
-        # Check question already exists or not
-        question_index = next(
-            (
-                index
-                for (index, dct) in enumerate(response)
-                if dct["question"] == answer["question"]
-            ),
-            None,
-        )
+        question_index = question_indexes.get(answer["question"])
         if question_index is None:
+            question_indexes[answer["question"]] = len(response)
             response.append(answer)
         else:
             response[question_index] = answer
 
     instance.response = response
-    instance.save()
+    if save:
+        instance.save()
     return instance
 
 
-def set_attribute_from_response(
-    user_response_object, user_appointment_object, response
-):
+def set_attribute_from_response(user_response_object, response, appointment_data):
+    """
+    Set `UserResponse` attributes of an answer on `user_response_object`, and collect
+    `UserAppointment` attributes into `appointment_data` so that they can be written
+    at once by `update_or_create_appointment`.
+    """
     user_response_attribute = response.get("user_response_attribute")
     user_appointment_attribute = response.get("user_appointment_attribute")
     value = response.get("answer")
@@ -402,63 +435,200 @@ def set_attribute_from_response(
         setattr(user_response_object, user_response_attribute, value)
 
     if user_appointment_attribute:
-        if user_appointment_object is None:
-            user_appointment_object = user_response_object.appointments.first()
-        update_or_create_appointment(
-            user_appointment_object,
-            {user_appointment_attribute: value, "user_response": user_response_object},
-        )
+        appointment_data[user_appointment_attribute] = value
 
     multiple_questions_response = response.get("multiple_questions_response", None)
     if multiple_questions_response:
         for question_response in multiple_questions_response:
-            user_response_object, user_appointment_object = set_attribute_from_response(
-                user_response_object, user_appointment_object, question_response
+            set_attribute_from_response(
+                user_response_object, question_response, appointment_data
             )
 
     nested_response = response.get("nested_response", None)
     if nested_response:
-        user_response_object, user_appointment_object = set_attribute_from_response(
-            user_response_object, user_appointment_object, nested_response
+        set_attribute_from_response(
+            user_response_object, nested_response, appointment_data
         )
-    return user_response_object, user_appointment_object
+    return user_response_object
 
 
 def set_attributes_from_response_json(user_response_object):
-    user_appointment_object = None
+    appointment_data = {}
     for answer in user_response_object.response:
-        user_response_object, user_appointment_object = set_attribute_from_response(
-            user_response_object, user_appointment_object, answer
-        )
+        set_attribute_from_response(user_response_object, answer, appointment_data)
     user_response_object.save()
-    if user_appointment_object:
-        user_appointment_object.save()
+    user_appointment_object = update_or_create_appointment(
+        user_response_object, None, appointment_data
+    )
     return user_response_object, user_appointment_object
 
 
-def backup_user_response_json(answer_obj, response_json):
-    """Method to create backup of a user's response json."""
+def get_user_response_attributes_from_response(response):
+    """Return names of `UserResponse` attributes set by a (validated) answer."""
+    attributes = set()
+    if response.get("user_response_attribute"):
+        attributes.add(response["user_response_attribute"])
+    for question_response in response.get("multiple_questions_response") or []:
+        attributes |= get_user_response_attributes_from_response(question_response)
+    nested_response = response.get("nested_response")
+    if nested_response:
+        attributes |= get_user_response_attributes_from_response(nested_response)
+    return attributes
 
-    def format_timestamped_backup(value):
-        timestamp = str(timezone.datetime.now())
-        return {timestamp: value}
 
-    existing_backup = answer_obj.response_backup
-    new_response_to_backup = format_timestamped_backup(value=response_json)
-    if existing_backup:
-        existing_backup.update(new_response_to_backup)
-    else:
-        answer_obj.response_backup = new_response_to_backup
+def add_or_update_answers(user_response_object, validated_response):
+    """
+    Merge new answers into user's response JSON and apply only their attributes.
+
+    Unlike `set_attributes_from_response_json`, stored answers aren't replayed and only
+    the response along with the columns touched by the new answers are written.
+    """
+    replace_or_append_response(user_response_object, validated_response, save=False)
+    update_fields = {"response", "modified_at"}
+    appointment_data = {}
+    for answer in validated_response:
+        update_fields |= get_user_response_attributes_from_response(answer)
+        set_attribute_from_response(user_response_object, answer, appointment_data)
+    user_response_object.save(update_fields=update_fields)
+    user_appointment_object = update_or_create_appointment(
+        user_response_object, None, appointment_data
+    )
+    return user_response_object, user_appointment_object
+
+
+def _get_response_backup_json(backups):
+    """
+    Rebuild response JSON of the last of given backups (ordered by version), starting
+    from the latest snapshot among them and applying diffs of the following versions.
+    """
+    response_json = None
+    for backup in backups:
+        if backup.is_snapshot:
+            response_json = copy.deepcopy(backup.data)
+        elif response_json is not None:
+            response_json = dictdiffer.patch(backup.data, response_json, in_place=True)
+    return response_json
+
+
+def get_user_response_backup(user_response, version=None):
+    """Return response JSON backed up at given version (latest version by default)."""
+    backups = user_response.backups.order_by("-version")
+    if version is not None:
+        backups = backups.filter(version__lte=version)
+    # Snapshots are stored at least every `RESPONSE_BACKUP_SNAPSHOT_INTERVAL` versions,
+    # so the last few versions are enough to rebuild the requested one.
+    backups = list(backups[: constants.RESPONSE_BACKUP_SNAPSHOT_INTERVAL])
+    if version is not None and (not backups or backups[0].version != version):
+        return None
+    return _get_response_backup_json(reversed(backups))
+
+
+def get_user_response_backups(user_response):
+    """Return list of `(backed_up_at, response_json)` of all backups of a user response."""
+    backups = []
+    response_json = None
+    for backup in user_response.backups.order_by("version"):
+        if backup.is_snapshot:
+            response_json = copy.deepcopy(backup.data)
+        else:
+            response_json = dictdiffer.patch(backup.data, response_json)
+        backups.append((backup.backed_up_at, response_json))
+    return backups
+
+
+def append_user_response_backups(user_response, response_jsons):
+    """
+    Append backups to the history of a user response.
+
+    :param response_jsons: iterable of `(backed_up_at, response_json)` tuples, ordered
+        from the oldest to the newest backup.
+    """
+    response_jsons = list(response_jsons)
+    if not response_jsons:
+        return []
+
+    with transaction.atomic():
+        # Lock the user response, so concurrent backups get consecutive versions.
+        list(
+            UserResponse.objects.select_for_update()
+            .filter(pk=user_response.pk)
+            .values_list("pk", flat=True)
+        )
+        latest_backups = list(
+            user_response.backups.order_by("-version")[
+                : constants.RESPONSE_BACKUP_SNAPSHOT_INTERVAL
+            ]
+        )
+        version = latest_backups[0].version if latest_backups else 0
+        previous_json = _get_response_backup_json(reversed(latest_backups))
+
+        backups = []
+        for backed_up_at, response_json in response_jsons:
+            version += 1
+            is_snapshot = (
+                previous_json is None
+                or type(previous_json) != type(response_json)
+                or (version - 1) % constants.RESPONSE_BACKUP_SNAPSHOT_INTERVAL == 0
+            )
+            if is_snapshot:
+                data = response_json
+            else:
+                data = list(
+                    dictdiffer.diff(previous_json, response_json, dot_notation=False)
+                )
+            backups.append(
+                UserResponseBackup(
+                    user_response=user_response,
+                    version=version,
+                    is_snapshot=is_snapshot,
+                    data=data,
+                    backed_up_at=backed_up_at,
+                )
+            )
+            previous_json = copy.deepcopy(response_json)
+        return UserResponseBackup.objects.bulk_create(backups)
+
+
+def get_legacy_user_response_backups(user_response):
+    """Return `(backed_up_at, response_json)` tuples of `response_backup` column."""
+    legacy_backups = []
+    for timestamp, response_json in (user_response.response_backup or {}).items():
+        backed_up_at = timezone.datetime.fromisoformat(timestamp)
+        if timezone.is_naive(backed_up_at):
+            backed_up_at = timezone.make_aware(backed_up_at)
+        legacy_backups.append((backed_up_at, response_json))
+    return sorted(legacy_backups, key=lambda backup: backup[0])
+
+
+def compact_user_response_backup(user_response):
+    """Move legacy backups of `response_backup` column into `UserResponseBackup`."""
+    with transaction.atomic():
+        backups = append_user_response_backups(
+            user_response, get_legacy_user_response_backups(user_response)
+        )
+        UserResponse.objects.filter(pk=user_response.pk).update(response_backup=None)
+        user_response.response_backup = None
+    return backups
 
-    answer_obj.save()
 
+def backup_user_response_json(answer_obj, response_json):
+    """Method to create backup of a user's response json."""
+    with transaction.atomic():
+        # Legacy backups are moved first, so they stay ahead of the new one.
+        if answer_obj.response_backup:
+            compact_user_response_backup(answer_obj)
+        append_user_response_backups(answer_obj, [(timezone.now(), response_json)])
 
-def generate_user_response_json(user_response):
+
+def generate_user_response_json(user_response, questionnaire_index=None):
     """Method to generate user response JSON given a UserResponse object."""
+    if questionnaire_index is None:
+        questionnaire_index = get_questionnaire_index()
     answer_data = user_response_to_dict(user_response=user_response)
     question_answer_json = get_question_answer_json(
         answer_data=answer_data,
         user_response=user_response,
+        questionnaire_index=questionnaire_index,
     )
     user_org = user_response.user.organisation if user_response.user else None
 
@@ -467,10 +637,51 @@ def generate_user_response_json(user_response):
     user_response_json = validate_response_json(
         json_data=question_answer_json,
         organisation=user_org,
+        questionnaire_index=questionnaire_index,
     )
     return user_response_json
 
 
+def regenerate_user_response_jsons(user_responses, batch_size=500):
+    """
+    Regenerate response JSON of many users in a single pass over `user_responses`
+    queryset, writing the changed ones in batches.
+
+    :return: tuple of number of updated user responses and ids of the ones that failed
+    validation
+    """
+    questionnaire_index = get_questionnaire_index()
+    updated_count = 0
+    failed_ids = []
+    batch = []
+    for user_response in user_responses.select_related("user__organisation").iterator(
+        chunk_size=batch_size
+    ):
+        try:
+            response_json = generate_user_response_json(
+                user_response, questionnaire_index=questionnaire_index
+            )
+        except ValidationError:
+            failed_ids.append(user_response.id)
+            continue
+        if response_json != user_response.response:
+            user_response.response = response_json
+            user_response.response_fingerprint = utils.get_response_fingerprint(
+                response_json
+            )
+            batch.append(user_response)
+        if len(batch) >= batch_size:
+            UserResponse.objects.bulk_update(
+                batch, ["response", "response_fingerprint"]
+            )
+            updated_count += len(batch)
+            batch = []
+    if batch:
+        UserResponse.objects.bulk_update(batch, ["response", "response_fingerprint"])
+        updated_count += len(batch)
+    return updated_count, failed_ids
+
+
 def user_response_to_dict(user_response):
     """Method to convert a UserResponse object into a dictionary having only question fields"""
     answers_data = {}
@@ -480,7 +691,7 @@ def user_response_to_dict(user_response):
     return answers_data
 
 
-def get_question_answer_json(answer_data, user_response=None):
+def get_question_answer_json(answer_data, user_response=None, questionnaire_index=None):
     """
     Method to return user response in the format that BWB BE System receive from FE. For example:
     ```json
@@ -496,16 +707,17 @@ def get_question_answer_json(answer_data, user_response=None):
 
     :param answer_data: Dictionary with `question.user_response_attribute` as keys and latest answers as values.
     :param user_response: Pre existing UserResponse object. Useful if `answer_data` is partial.
+    :param questionnaire_index: Questionnaire index to resolve questions and options from.
     """
+    if questionnaire_index is None:
+        questionnaire_index = get_questionnaire_index()
     response = []
 
     def format_answer(question, answer):
-        answer_option = Option.objects.filter(
-            question=question.id, text_mapped_value=answer
-        ).first()
-        if not answer_option:
+        answer_text = questionnaire_index.get_choice_text(question, answer)
+        if answer_text is None:
             return {"question": str(question.id), "answer": answer}
-        return {"question": str(question.id), "answer": answer_option.text}
+        return {"question": str(question.id), "answer": answer_text}
 
     def update_response(question_obj, answer):
         if answer is not None:
@@ -513,7 +725,7 @@ def get_question_answer_json(answer_data, user_response=None):
             response.append(answer)
 
     for question_key in QUESTION_KEYS:
-        question = Question.objects.filter(user_response_attribute=question_key).first()
+        question = questionnaire_index.get_question_for_response_attribute(question_key)
         if question:
             user_response_attribute = question.user_response_attribute
             if user_response_attribute in answer_data.keys():
@@ -555,14 +767,31 @@ def save_answer_serializer(answer_serializer, user_obj, answer_data):
     this backing up can be used to track the changes (if any).
     2. SCC can update the existing answers of a user to "null", which if creates any
     unforeseeable issue in future, we can use the backup to get back the working data.
+
+    :return: `False` if the answers didn't change and nothing was saved, else `True`.
     """
-    old_response_json = (
-        user_obj.answer.response if hasattr(user_obj, "answer") else None
-    )
+    answer_obj = user_obj.answer if hasattr(user_obj, "answer") else None
     new_response_json = answer_serializer.validated_data["response"]
+    new_fingerprint = utils.get_response_fingerprint(new_response_json)
+    old_fingerprint = answer_obj.get_response_fingerprint() if answer_obj else None
+
+    # Skip the write entirely when neither the response JSON nor any answer changed.
+    answers = {**answer_data, **answer_serializer.validated_data}
+    if (
+        old_fingerprint == new_fingerprint
+        and answer_obj.user_id == user_obj.id
+        and all(
+            getattr(answer_obj, field, None) == value
+            for field, value in answers.items()
+            if field != "response"
+        )
+    ):
+        return False
+
+    old_response_json = answer_obj.response if answer_obj else None
     answer_serializer.save(user=user_obj, response=new_response_json, **answer_data)
-    if old_response_json:
-        if utils.ordered(old_response_json) != utils.ordered(new_response_json):
-            backup_user_response_json(
-                answer_obj=user_obj.answer, response_json=old_response_json
-            )
+    if old_response_json and old_fingerprint != new_fingerprint:
+        backup_user_response_json(
+            answer_obj=user_obj.answer, response_json=old_response_json
+        )
+    return True
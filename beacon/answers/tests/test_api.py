@@ -1,14 +1,19 @@
 # -*- coding: utf-8 -*-
 # Standard Library
+import io
 import json
 
 # Third Party Stuff
 import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 # beacon Stuff
-from beacon.answers import constants
+from beacon.answers import constants, services, utils
 from beacon.answers.models import UserAppointment, UserResponse
+from beacon.questionnaire.index import get_questionnaire_index
 from beacon.questionnaire.models import Question
 from beacon.questionnaire.tests import factories as questionnaire_f
 from beacon.users.tests import factories as users_f
@@ -170,6 +175,176 @@ def test_update_answer(client):
     assert user_response.chief_complaint1 == option2.text
 
 
+def test_add_or_update_answers_writes_only_touched_columns():
+    question = questionnaire_f.create_question(
+        kind=Question.DROPDOWN, user_response_attribute=constants.CHIEF_COMPLAINT1
+    )
+    option = questionnaire_f.create_option(
+        text="option 1", text_mapped_value="option 1", question=question
+    )
+    user_response = f.create_user_response(response=[], user=None)
+
+    # Column written by someone else in between must not be overwritten
+    UserResponse.objects.filter(id=user_response.id).update(
+        how_often_worry="Several days"
+    )
+
+    validated_response = services.validate_response_json(
+        [{"question": str(question.id), "answer": option.text}]
+    )
+    services.add_or_update_answers(user_response, validated_response)
+    services.add_or_update_answers(user_response, validated_response)
+
+    user_response.refresh_from_db()
+    assert user_response.chief_complaint1 == option.text
+    assert user_response.how_often_worry == "Several days"
+    assert len(user_response.response) == 1
+
+
+def test_add_or_update_answers_writes_appointment_once():
+    gender_question = questionnaire_f.create_question(
+        kind=Question.TEXT,
+        user_appointment_attribute=constants.F2F_GENDER_PREFERENCE,
+        nested_question=None,
+    )
+    city_question = questionnaire_f.create_question(
+        kind=Question.TEXT,
+        user_appointment_attribute=constants.F2F_CITY,
+        nested_question=None,
+    )
+    user_response = f.create_user_response(response=[], user=None)
+    validated_response = services.validate_response_json(
+        [
+            {"question": str(gender_question.id), "answer": "Female"},
+            {"question": str(city_question.id), "answer": "Boston"},
+        ]
+    )
+
+    with CaptureQueriesContext(connection) as context:
+        services.add_or_update_answers(user_response, validated_response)
+    appointment_writes = [
+        q["sql"]
+        for q in context.captured_queries
+        if q["sql"].startswith(('INSERT INTO "appointment"', 'UPDATE "appointment"'))
+    ]
+    assert len(appointment_writes) == 1
+    appointment = UserAppointment.objects.get(user_response=user_response)
+    assert appointment.f2f_gender_preference == "Female"
+    assert appointment.f2f_city == "Boston"
+
+    validated_response = services.validate_response_json(
+        [{"question": str(city_question.id), "answer": "Denver"}]
+    )
+    services.add_or_update_answers(user_response, validated_response)
+    appointment.refresh_from_db()
+    assert appointment.f2f_city == "Denver"
+    assert appointment.f2f_gender_preference == "Female"
+    assert UserAppointment.objects.filter(user_response=user_response).count() == 1
+
+
+def test_response_fingerprint_is_updated_on_save():
+    user_response = f.create_user_response(
+        response=[{"question": "q1", "answer": 1}, {"question": "q2", "answer": 2}],
+        user=None,
+    )
+    fingerprint = user_response.response_fingerprint
+    assert fingerprint == utils.get_response_fingerprint(user_response.response)
+    # Ordering of items and keys doesn't change the fingerprint
+    assert fingerprint == utils.get_response_fingerprint(
+        [{"answer": 2, "question": "q2"}, {"question": "q1", "answer": 1}]
+    )
+
+    user_response.response = [{"question": "q1", "answer": 3}]
+    user_response.save(update_fields=["response"])
+    user_response.refresh_from_db()
+    assert user_response.response_fingerprint != fingerprint
+    assert user_response.response_fingerprint == utils.get_response_fingerprint(
+        [{"question": "q1", "answer": 3}]
+    )
+
+
+def test_backup_user_response_json_stores_diffs_between_snapshots():
+    user_response = f.create_user_response(response=[], user=None)
+    response_jsons = [
+        [{"question": "q1", "answer": i}, {"question": "q2", "answer": [i, "x.y"]}]
+        for i in range(constants.RESPONSE_BACKUP_SNAPSHOT_INTERVAL * 2 + 3)
+    ]
+    for response_json in response_jsons:
+        services.backup_user_response_json(user_response, response_json)
+
+    backups = list(user_response.backups.order_by("version"))
+    assert [backup.version for backup in backups if backup.is_snapshot] == [
+        1,
+        constants.RESPONSE_BACKUP_SNAPSHOT_INTERVAL + 1,
+        constants.RESPONSE_BACKUP_SNAPSHOT_INTERVAL * 2 + 1,
+    ]
+    assert [
+        response_json
+        for _, response_json in services.get_user_response_backups(user_response)
+    ] == response_jsons
+    assert services.get_user_response_backup(user_response) == response_jsons[-1]
+    assert services.get_user_response_backup(user_response, version=15) == (
+        response_jsons[14]
+    )
+    assert services.get_user_response_backup(user_response, version=100) is None
+
+
+def test_compact_user_response_backups_command():
+    user_response = f.create_user_response(
+        response=[],
+        user=None,
+        response_backup={
+            "2021-12-09 10:00:00.000000": {"dummy": "second"},
+            "2021-12-08 10:00:00.000000": {"dummy": "first"},
+        },
+    )
+
+    call_command("compact_user_response_backups", stdout=io.StringIO())
+
+    user_response.refresh_from_db()
+    assert user_response.response_backup is None
+    backups = services.get_user_response_backups(user_response)
+    assert [response_json for _, response_json in backups] == [
+        {"dummy": "first"},
+        {"dummy": "second"},
+    ]
+    assert backups[0][0] < backups[1][0]
+
+
+def test_add_or_update_answers_ignores_removed_appointment_attributes():
+    confirm_question = questionnaire_f.create_question(
+        kind=Question.TEXT,
+        user_appointment_attribute=constants.F2F_CONFIRM,
+        nested_question=None,
+    )
+    city_question = questionnaire_f.create_question(
+        kind=Question.TEXT,
+        user_appointment_attribute=constants.F2F_CITY,
+        nested_question=None,
+    )
+    user_response = f.create_user_response(response=[], user=None)
+
+    validated_response = services.validate_response_json(
+        [{"question": str(confirm_question.id), "answer": "yes"}]
+    )
+    _, appointment = services.add_or_update_answers(user_response, validated_response)
+    assert appointment is None
+
+    validated_response = services.validate_response_json(
+        [
+            {"question": str(confirm_question.id), "answer": "yes"},
+            {"question": str(city_question.id), "answer": "Boston"},
+        ]
+    )
+    services.add_or_update_answers(user_response, validated_response)
+    services.add_or_update_answers(user_response, validated_response)
+    appointment = UserAppointment.objects.get(user_response=user_response)
+    assert appointment.f2f_city == "Boston"
+
+    _, appointment = services.set_attributes_from_response_json(user_response)
+    assert appointment.f2f_city == "Boston"
+
+
 def test_update_answer_f2f_zip(client):
     create_url = reverse("answers-list")
     question = questionnaire_f.create_question(
@@ -395,3 +570,40 @@ def test_get_latest_appointment(client, mocker):
     assert response.data.get("id") == str(appointment.id)
     assert response.data.get("show_homepage_message") is True
     assert response.data.get("bwb_inquiry_id") == "1111-1234"
+
+
+def test_generate_user_response_json_without_questionnaire_queries(
+    django_assert_num_queries,
+):
+    question = questionnaire_f.create_question(
+        kind=Question.DROPDOWN,
+        user_response_attribute=constants.CHIEF_COMPLAINT1,
+        nested_question=None,
+    )
+    questionnaire_f.create_option(
+        question=question, text="Stress", text_mapped_value="stress"
+    )
+    user_response = f.create_user_response(
+        response=[], user=None, chief_complaint1="stress"
+    )
+    get_questionnaire_index()
+
+    with django_assert_num_queries(0):
+        response_json = services.generate_user_response_json(user_response)
+
+    assert response_json == [
+        {
+            "question": question.text,
+            "answer": "Stress",
+            "text_mapped_value": "stress",
+            "user_response_attribute": constants.CHIEF_COMPLAINT1,
+            "user_appointment_attribute": None,
+        }
+    ]
+
+    updated_count, failed_ids = services.regenerate_user_response_jsons(
+        UserResponse.objects.all()
+    )
+    assert (updated_count, failed_ids) == (1, [])
+    user_response.refresh_from_db()
+    assert user_response.response == response_json
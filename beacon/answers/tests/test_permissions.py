@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+# Standard Library
+import time
+
+# Third Party Stuff
+import pytest
+from django.core.signing import TimestampSigner
+from django.test import RequestFactory
+
+# beacon Stuff
+from beacon.answers.permissions import LoggedInUserResponseAccess
+from beacon.answers.services import get_token_for_user_response
+
+from . import factories as f
+
+pytestmark = pytest.mark.django_db
+
+
+def test_logged_in_user_response_access_verifies_token_signature_once(mocker, settings):
+    settings.JWT_TOKEN_EXPIRATION_DURATION = 30
+    settings.ANSWER_PERMISSION_SESSION_TIMEOUT = 60
+    user_response = f.create_user_response(response=[], user=None)
+    token = get_token_for_user_response(user_response, "authentication")
+    unsign = mocker.spy(TimestampSigner, "unsign")
+
+    permission = LoggedInUserResponseAccess()
+    for _ in range(2):
+        request = RequestFactory().get("/", HTTP_AUTHORIZATION=f"Token {token}")
+        assert permission.has_permission(request, None)
+        assert request.user_response == user_response
+    assert unsign.call_count == 1
+
+    # Token too old to be a user token is still served from the cache for the user
+    # response scope, which allows older tokens
+    mocker.patch(
+        "beacon.base.utils.tokens.time.time", return_value=time.time() + 45 * 60
+    )
+    request = RequestFactory().get("/", HTTP_AUTHORIZATION=f"Token {token}")
+    assert permission.has_permission(request, None)
+    assert request.user_response == user_response
+    assert unsign.call_count == 1
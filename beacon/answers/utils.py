@@ -1,4 +1,7 @@
 # -*- coding: utf-8 -*-
+# Standard Library
+import hashlib
+import json
 
 
 def ordered(obj):
@@ -12,3 +15,12 @@ def ordered(obj):
         return sorted(ordered(x) for x in obj)
     else:
         return str(obj)
+
+
+def get_response_fingerprint(response):
+    """
+    Method to return a stable hash of a response JSON. Two responses get the same fingerprint whenever their
+    `ordered` structures are equal, i.e. ordering of keys and items doesn't matter.
+    """
+    canonical = json.dumps(ordered(response), separators=(",", ":"))
+    return hashlib.sha256(canonical.encode()).hexdigest()
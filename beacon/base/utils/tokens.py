@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""
+Verification of self contained (signed JWT) tokens with a per-process cache.
+
+Auth tokens are sent on every request of a session, so once a token's signature is
+verified its payload is kept in a bounded LRU cache. Repeat requests with the same
+token then skip `TimestampSigner.unsign` and `jwt.decode`, while the token's age is
+still checked against `max_age` on each hit. Every check of a signed token, including
+permission classes trying the token for several scopes, goes through `unsign_token`.
+"""
+# Standard Library
+import threading
+import time
+from collections import OrderedDict
+
+# Third Party Stuff
+import jwt
+from django.conf import settings
+from django.core.signing import SignatureExpired, TimestampSigner
+from django.utils import baseconv
+
+ALGORITHM = "HS256"  # type: str
+
+
+class VerifiedTokenCache:
+    """Thread-safe LRU cache of signed tokens to `(signed_at, payload)`."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._tokens = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, token):
+        with self._lock:
+            value = self._tokens.get(token)
+            if value is not None:
+                self._tokens.move_to_end(token)
+            return value
+
+    def set(self, token, signed_at, payload):
+        with self._lock:
+            self._tokens[token] = (signed_at, payload)
+            self._tokens.move_to_end(token)
+            while len(self._tokens) > self.maxsize:
+                self._tokens.popitem(last=False)
+
+    def discard(self, token):
+        with self._lock:
+            self._tokens.pop(token, None)
+
+    def clear(self):
+        with self._lock:
+            self._tokens.clear()
+
+    def __len__(self):
+        return len(self._tokens)
+
+
+verified_tokens = VerifiedTokenCache(maxsize=settings.VERIFIED_TOKEN_CACHE_SIZE)
+
+
+def unsign_token(signed_token, max_age):
+    """
+    Return payload of a token signed with `TimestampSigner` around a JWT.
+
+    :param max_age: max age of the token in seconds
+    :raises: `SignatureExpired` or `BadSignature` if signature isn't valid, and
+        `jwt.DecodeError` if the signed value isn't a valid JWT.
+    """
+    cached = verified_tokens.get(signed_token)
+    if cached is not None:
+        signed_at, payload = cached
+        age = time.time() - signed_at
+        if age > max_age:
+            # Token is kept, as callers checking it for another scope may allow an
+            # older token. The signature stays valid either way.
+            raise SignatureExpired("Signature age %s > %s seconds" % (age, max_age))
+        return dict(payload)
+
+    signer = TimestampSigner()
+    token = signer.unsign(signed_token, max_age=max_age)
+    payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[ALGORITHM])
+    signed_at = baseconv.base62.decode(signed_token.rsplit(signer.sep, 2)[1])
+    verified_tokens.set(signed_token, signed_at, payload)
+    return dict(payload)
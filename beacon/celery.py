@@ -4,6 +4,7 @@ import os
 # Third Party Stuff
 import raven
 from celery import Celery
+from celery.schedules import crontab
 from django.conf import settings
 from dotenv import load_dotenv
 from raven.contrib.celery import register_logger_signal, register_signal
@@ -38,4 +39,9 @@ app.config_from_object("django.conf:settings", namespace="CELERY")
 # Load task modules from all registered Django app configs.
 app.autodiscover_tasks(lambda: settings.INSTALLED_APPS)
 
-app.conf.beat_schedule = {}
+app.conf.beat_schedule = {
+    "refresh-stale-provider-profiles": {
+        "task": "beacon.mdlive.tasks.refresh_provider_profiles_task",
+        "schedule": crontab(minute=15),
+    },
+}
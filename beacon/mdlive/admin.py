@@ -50,7 +50,7 @@ class ProviderAdmin(admin.ModelAdmin):
         "specialities",
         "photo_url",
         "photo_url_absolute",
-        "photo_in_binary_data",
+        "photo",
         "photo_format",
         "created_at",
         "modified_at",
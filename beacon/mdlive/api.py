@@ -2,7 +2,6 @@
 
 # Third Party Stuff
 from django.contrib.auth import get_user_model
-from django.db.models import Q
 from rest_framework.decorators import action
 from rest_framework.exceptions import ValidationError
 from rest_framework.mixins import CreateModelMixin, ListModelMixin, RetrieveModelMixin
@@ -18,10 +17,10 @@ from beacon.base.api.pagination import paginated_response
 from beacon.organisations.services import get_organisation
 from beacon.scc.services import send_user_data_to_scc_if_non_f2f
 from beacon.users import services as user_services
-from beacon.users.tasks import sync_user_mdlive_messages
+from beacon.users.tasks import schedule_user_mdlive_messages_sync
 from beacon.users.utils import get_relationship_from_user
 
-from . import filters, models, serializers, services
+from . import filters, inbox, models, response_cache, serializers, services
 
 User = get_user_model()
 
@@ -53,8 +52,8 @@ class MDLiveViewSet(MultipleSerializerMixin, GenericViewSet):
             birth_date_str=request.user.birthdate.strftime("%Y-%m-%d"),
             relationship=relationship,
         )
-        user_token = services.get_user_token(
-            md_live_data, organisation=request.user.organisation
+        user_token = services.get_cached_user_token(
+            request.user, md_live_data, organisation=request.user.organisation
         )
         return response.Ok(user_token)
 
@@ -86,12 +85,20 @@ class MDLiveViewSet(MultipleSerializerMixin, GenericViewSet):
             raise ValidationError("patient_id query param should be present")
         page = request.query_params.get("page")
         per_page = request.query_params.get("per_page")
-        providers = services.get_providers(
-            per_page=per_page,
-            page=page,
-            data=request.data,
-            mdlive_fake_user_token=mdlive_fake_user_token,
-            patient_id=patient_id,
+        query = dict(
+            patient_id=patient_id, page=page, per_page=per_page, data=request.data
+        )
+        providers = response_cache.get_cached_response(
+            "search_providers",
+            query,
+            mdlive_fake_user_token,
+            lambda: services.get_providers(
+                per_page=per_page,
+                page=page,
+                data=request.data,
+                mdlive_fake_user_token=mdlive_fake_user_token,
+                patient_id=patient_id,
+            ),
         )
         return response.Ok(providers)
 
@@ -112,14 +119,21 @@ class MDLiveViewSet(MultipleSerializerMixin, GenericViewSet):
         specific_date = request.query_params.get("specific_date")
         state_abbrev = request.query_params.get("state_abbrev")
         show_next_availability = request.query_params.get("show_next_availability")
-        provider = services.get_provider(
+        query = dict(
             provider_id=provider_id,
             availability_type=availability_type,
             provider_type=provider_type,
             specific_date=specific_date,
             state_abbrev=state_abbrev,
             show_next_availability=show_next_availability,
-            mdlive_fake_user_token=mdlive_fake_user_token,
+        )
+        provider = response_cache.get_cached_response(
+            "get_provider",
+            query,
+            mdlive_fake_user_token,
+            lambda: services.get_provider(
+                mdlive_fake_user_token=mdlive_fake_user_token, **query
+            ),
         )
         return response.Ok(provider)
 
@@ -136,12 +150,11 @@ class MDLiveViewSet(MultipleSerializerMixin, GenericViewSet):
 
 class MessageViewSet(MultipleSerializerMixin, GenericViewSet):
     serializer_class = serializers.UserMDLiveTokenSerializer
-    queryset = models.Message.objects.select_related(
-        "provider_message__message_from",
-        "provider_message__message_to",
-        "user_message__message_from",
-        "user_message__message_to",
-    ).all()
+    queryset = (
+        models.Message.objects.select_related("user", "provider")
+        .defer("provider__photo_in_binary_data")
+        .all()
+    )
     lookup_field = "mdlive_id"
     filter_backends = [
         filters.ProviderFilter,
@@ -162,16 +175,7 @@ class MessageViewSet(MultipleSerializerMixin, GenericViewSet):
 
     def get_queryset(self):
         queryset = super().get_queryset()
-        queryset = queryset.filter(
-            Q(
-                message_type=models.Message.USER_MESSAGE,
-                user_message__message_from=self.request.user,
-            )
-            | Q(
-                message_type=models.Message.PROVIDER_MESSAGE,
-                provider_message__message_to=self.request.user,
-            )
-        )
+        queryset = queryset.filter(user=self.request.user)
         queryset = queryset.prefetch_related("documents")
         return self.filter_queryset(queryset)
 
@@ -210,7 +214,7 @@ class MessageViewSet(MultipleSerializerMixin, GenericViewSet):
                         .first()
                     )
                     if user:
-                        sync_user_mdlive_messages.delay(
+                        schedule_user_mdlive_messages_sync(
                             str(user.id), send_new_message_email=True
                         )
         return response.Ok("Received")
@@ -245,18 +249,21 @@ class MessageViewSet(MultipleSerializerMixin, GenericViewSet):
 
     @action(methods=["GET"], detail=False, url_path="unread-messages-count")
     def unread_messages_count(self, request, *args, **kwargs):
+        if not request.query_params:
+            return response.Ok(
+                {"count": inbox.get_unread_messages_count(request.user.id)}
+            )
+        # Filtered counts aren't cached, they are counted from the database
         queryset = self.get_queryset()
-        queryset = queryset.filter(is_read=False)
         queryset = queryset.filter(
-            message_type=models.Message.PROVIDER_MESSAGE,
-            provider_message__message_to=self.request.user,
+            is_read=False, message_type=models.Message.PROVIDER_MESSAGE
         )
         return response.Ok({"count": queryset.count()})
 
 
 class ContactViewSet(MultipleSerializerMixin, GenericViewSet):
     serializer_class = serializers.ProviderSerializer
-    queryset = models.Provider.objects.all()
+    queryset = models.Provider.objects.defer("photo_in_binary_data")
     lookup_field = "mdlive_id"
     filter_backends = [filters.ProviderFilter, filters.UnreadFilter]
     serializer_classes = {
@@ -307,7 +314,7 @@ class AppointmentSlotQueryViewSet(ListModelMixin, RetrieveModelMixin, GenericVie
         instance = serializer.save()
         instance.mdlive_id = mdlive_id
         instance.save()
-        sync_user_mdlive_messages.delay(str(request.user.id))
+        schedule_user_mdlive_messages_sync(str(request.user.id))
         send_user_data_to_scc_if_non_f2f(
             user=serializer.validated_data.get("user"),
             appointment_method=serializer.validated_data.get("appointment_method"),
@@ -318,7 +325,7 @@ class AppointmentSlotQueryViewSet(ListModelMixin, RetrieveModelMixin, GenericVie
     def remind(self, request, *args, **kwargs):
         instance = self.get_object()
         services.appointment_request_remind(request.user, instance.mdlive_id)
-        sync_user_mdlive_messages.delay(str(request.user.id))
+        schedule_user_mdlive_messages_sync(str(request.user.id))
         return response.Ok(
             {
                 "message": "The Provider has been reminded about your appointment slot query"
@@ -331,7 +338,7 @@ class AppointmentSlotQueryViewSet(ListModelMixin, RetrieveModelMixin, GenericVie
         services.appointment_request_cancel(request.user, instance.mdlive_id)
         instance.is_cancelled = True
         instance.save()
-        sync_user_mdlive_messages.delay(str(request.user.id))
+        schedule_user_mdlive_messages_sync(str(request.user.id))
         return response.Ok(
             {"message": "Your appointment slot query has been cancelled"}
         )
@@ -0,0 +1,10 @@
+# -*- coding: utf-8 -*-
+# Third Party Stuff
+from django.apps import AppConfig
+
+
+class MdliveConfig(AppConfig):
+    name = "beacon.mdlive"
+
+    def ready(self):
+        from . import signals  # noqa: F401
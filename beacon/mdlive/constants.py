@@ -19,3 +19,44 @@ TIMEZONE_TO_MDLIVE_ID_MAP = {
 }
 
 MDLIVE_ID_TO_TIMEZONE_NAME = get_reverse_mapping(TIMEZONE_TO_MDLIVE_ID_MAP)
+
+MDLIVE_USER_TOKEN_CACHE_KEY = "mdlive:user:{user_id}:token"
+# Cached MDLive user tokens are refreshed these many seconds before they expire
+MDLIVE_USER_TOKEN_REFRESH_MARGIN = 5 * 60
+
+# Coalescing of user's messages syncs, see `users.tasks.schedule_user_mdlive_messages_sync`
+MDLIVE_SYNC_PENDING_CACHE_KEY = "mdlive:user:{user_id}:sync:pending"
+MDLIVE_SYNC_EMAIL_CACHE_KEY = "mdlive:user:{user_id}:sync:email"
+MDLIVE_SYNC_RUNNING_CACHE_KEY = "mdlive:user:{user_id}:sync:running"
+# Events received within these many seconds are merged into a single sync
+MDLIVE_SYNC_DEBOUNCE_SECONDS = 10
+# Upper bound of a sync's duration, lock is released after it even if the worker died
+MDLIVE_SYNC_LOCK_TIMEOUT = 10 * 60
+
+# Provider directory, see `mdlive.directory`
+PROVIDER_CACHE_KEY = "mdlive:provider:{mdlive_id}"
+PROVIDER_CACHE_TIMEOUT = 24 * 60 * 60
+PROVIDER_LOCAL_CACHE_SIZE = 1024
+PROVIDER_LOCAL_CACHE_TIMEOUT = 60
+# Profiles of providers are refreshed from MDLive once they are older than these many hours
+PROVIDER_PROFILE_MAX_AGE_HOURS = 24
+PROVIDER_PROFILE_REFRESH_BATCH_SIZE = 100
+
+# Provider search and profile responses, see `mdlive.response_cache`
+PROVIDER_RESPONSE_CACHE_KEY = "mdlive:response:{endpoint}:{query_hash}"
+PROVIDER_RESPONSE_CACHE_STATS_KEY = "mdlive:response:{endpoint}:stats:{result}"
+PROVIDER_RESPONSE_CACHE_TIMEOUT = 30
+# Previous response of a query is returned while another request refreshes it
+PROVIDER_RESPONSE_STALE_TIMEOUT = 5 * 60
+# Longer than read timeout of the endpoints, so the lock outlives the request
+PROVIDER_RESPONSE_LOCK_TIMEOUT = 35
+# Requests of a query being fetched hold their worker at most these many seconds
+PROVIDER_RESPONSE_WAIT_TIMEOUT = 1.5
+PROVIDER_RESPONSE_POLL_INTERVAL = 0.1
+# Share of cache lookups counted in stats
+PROVIDER_RESPONSE_STATS_SAMPLE_RATE = 0.1
+
+# Counters of users' unread messages, see `mdlive.inbox`
+UNREAD_MESSAGES_COUNT_CACHE_KEY = "mdlive:user:{user_id}:unread_messages_count"
+# Counters are recounted at least this often, bounding drift from racing updates
+UNREAD_MESSAGES_COUNT_CACHE_TIMEOUT = 60 * 60
@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+"""
+Directory of MDLive providers keyed by their MDLive id.
+
+Providers are looked up for every synced contact and message, while their data rarely
+changes. Lookups go through a small per-process cache and the shared cache before
+hitting the database, and writes go through `upsert_providers` which only touches rows
+whose data actually changed. Providers saved or deleted one by one, e.g. in the admin,
+are re-cached or uncached by `mdlive.signals`. Per-process entries expire quickly, so an
+update made by another process is picked up within `PROVIDER_LOCAL_CACHE_TIMEOUT`
+seconds.
+"""
+# Standard Library
+import threading
+import time
+from collections import OrderedDict
+from copy import copy
+
+# Third Party Stuff
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from . import constants
+from .models import Provider
+
+
+class ProviderCache:
+    """Thread-safe LRU cache of MDLive ids to `(expires_at, provider)`."""
+
+    def __init__(self, maxsize, timeout):
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self._providers = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, mdlive_ids):
+        now = time.monotonic()
+        providers = {}
+        with self._lock:
+            for mdlive_id in mdlive_ids:
+                value = self._providers.get(mdlive_id)
+                if value is None:
+                    continue
+                expires_at, provider = value
+                if expires_at < now:
+                    del self._providers[mdlive_id]
+                    continue
+                self._providers.move_to_end(mdlive_id)
+                providers[mdlive_id] = provider
+        return providers
+
+    def set_many(self, providers):
+        expires_at = time.monotonic() + self.timeout
+        with self._lock:
+            for provider in providers:
+                self._providers[provider.mdlive_id] = (expires_at, provider)
+                self._providers.move_to_end(provider.mdlive_id)
+            while len(self._providers) > self.maxsize:
+                self._providers.popitem(last=False)
+
+    def delete_many(self, mdlive_ids):
+        with self._lock:
+            for mdlive_id in mdlive_ids:
+                self._providers.pop(mdlive_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._providers.clear()
+
+    def __len__(self):
+        return len(self._providers)
+
+
+local_providers = ProviderCache(
+    maxsize=constants.PROVIDER_LOCAL_CACHE_SIZE,
+    timeout=constants.PROVIDER_LOCAL_CACHE_TIMEOUT,
+)
+
+
+def get_provider_cache_key(mdlive_id):
+    return constants.PROVIDER_CACHE_KEY.format(mdlive_id=mdlive_id)
+
+
+def cache_providers(providers):
+    providers = list(providers)
+    local_providers.set_many(providers)
+    cache.set_many(
+        {
+            get_provider_cache_key(provider.mdlive_id): provider
+            for provider in providers
+        },
+        timeout=constants.PROVIDER_CACHE_TIMEOUT,
+    )
+
+
+def uncache_providers(mdlive_ids):
+    mdlive_ids = list(mdlive_ids)
+    local_providers.delete_many(mdlive_ids)
+    cache.delete_many([get_provider_cache_key(mdlive_id) for mdlive_id in mdlive_ids])
+
+
+def get_providers(mdlive_ids):
+    """
+    Return existing providers having given MDLive ids
+    :param mdlive_ids: Provider MDLive ids
+    :return dict of provider MDLive id to mdlive.Provider object
+    """
+    mdlive_ids = {int(mdlive_id) for mdlive_id in mdlive_ids}
+    providers = local_providers.get_many(mdlive_ids)
+
+    missing_ids = mdlive_ids - set(providers)
+    if missing_ids:
+        cached = cache.get_many([get_provider_cache_key(i) for i in missing_ids])
+        cached_providers = {
+            provider.mdlive_id: provider for provider in cached.values()
+        }
+        local_providers.set_many(cached_providers.values())
+        providers.update(cached_providers)
+        missing_ids -= set(cached_providers)
+
+    if missing_ids:
+        db_providers = {
+            provider.mdlive_id: provider
+            for provider in Provider.objects.filter(mdlive_id__in=missing_ids)
+        }
+        cache_providers(db_providers.values())
+        providers.update(db_providers)
+    return providers
+
+
+def upsert_providers(providers_fields, defaults=None):
+    """
+    Create missing providers and update existing ones whose fields changed
+    :param providers_fields: dict of provider MDLive id to dict of `mdlive.Provider`
+                             fields, which are set on both existing and new providers
+    :param defaults: dict of provider MDLive id to dict of fields only used to create
+                     the missing providers
+    :return tuple of dict of provider MDLive id to mdlive.Provider object, and list of
+            MDLive ids of the created providers
+    """
+    providers_fields = {
+        int(mdlive_id): fields for mdlive_id, fields in providers_fields.items()
+    }
+    defaults = {
+        int(mdlive_id): fields for mdlive_id, fields in (defaults or {}).items()
+    }
+    providers = get_providers(providers_fields)
+
+    changed_providers, changed_fields = [], set()
+    for mdlive_id, provider in list(providers.items()):
+        changes = {
+            field: value
+            for field, value in providers_fields[mdlive_id].items()
+            if getattr(provider, field) != value
+        }
+        if changes:
+            # Cached objects are shared, so changes are made on a copy
+            provider = providers[mdlive_id] = copy(provider)
+            for field, value in changes.items():
+                setattr(provider, field, value)
+            provider.modified_at = timezone.now()
+            changed_fields.update(changes)
+            changed_providers.append(provider)
+    if changed_providers:
+        Provider.objects.bulk_update(
+            changed_providers, sorted(changed_fields) + ["modified_at"]
+        )
+
+    created_mdlive_ids = sorted(set(providers_fields) - set(providers))
+    new_providers = Provider.objects.bulk_create(
+        [
+            Provider(
+                mdlive_id=mdlive_id,
+                **{**defaults.get(mdlive_id, {}), **providers_fields[mdlive_id]},
+            )
+            for mdlive_id in created_mdlive_ids
+        ]
+    )
+    providers.update({provider.mdlive_id: provider for provider in new_providers})
+
+    written_providers = changed_providers + new_providers
+    if written_providers:
+        # Rows are cached only once they are visible to other connections
+        transaction.on_commit(lambda: cache_providers(written_providers))
+    return providers, created_mdlive_ids
@@ -3,7 +3,6 @@
 import uuid
 
 # Third Party Stuff
-from django.db.models import Q
 from django.utils.encoding import force_str
 from rest_framework import filters
 from rest_framework.compat import coreapi, coreschema
@@ -92,16 +91,7 @@ class ProviderFilter(BaseFilterMixin):
                 provider_id = int(provider_id)
             except ValueError:
                 return queryset
-            queryset = queryset.filter(
-                Q(
-                    message_type=Message.USER_MESSAGE,
-                    user_message__message_to__mdlive_id=provider_id,
-                )
-                | Q(
-                    message_type=Message.PROVIDER_MESSAGE,
-                    provider_message__message_from__mdlive_id=provider_id,
-                )
-            )
+            queryset = queryset.filter(provider__mdlive_id=provider_id)
         return queryset
 
 
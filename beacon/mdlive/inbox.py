@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""
+Counters of users' unread messages.
+
+Clients poll the unread messages count for the inbox badge. The count is kept in the
+cache per user and adjusted by `change_unread_messages_count` whenever a provider's
+message is stored or marked read, so a poll is a cache read. A missing counter is
+counted again with the `(user, is_read)` index of messages.
+"""
+# Third Party Stuff
+from django.core.cache import cache
+from django.db import transaction
+
+from . import constants
+from .models import Message
+
+
+def get_unread_messages_count_cache_key(user_id):
+    return constants.UNREAD_MESSAGES_COUNT_CACHE_KEY.format(user_id=user_id)
+
+
+def count_unread_messages(user_id):
+    return Message.objects.filter(
+        user_id=user_id,
+        is_read=False,
+        message_type=Message.PROVIDER_MESSAGE,
+    ).count()
+
+
+def get_unread_messages_count(user_id):
+    """Return count of user's unread messages from providers."""
+    key = get_unread_messages_count_cache_key(user_id)
+    count = cache.get(key)
+    if count is None:
+        count = count_unread_messages(user_id)
+        cache.add(key, count, timeout=constants.UNREAD_MESSAGES_COUNT_CACHE_TIMEOUT)
+    return count
+
+
+def _apply_unread_messages_count_change(user_id, delta):
+    try:
+        cache.incr(get_unread_messages_count_cache_key(user_id), delta)
+    except ValueError:
+        # Counter isn't cached, it'll be counted on the next read
+        pass
+
+
+def change_unread_messages_count(user_id, delta):
+    """
+    Adjust cached count of user's unread messages once the transaction commits
+    :param user_id: users.User id
+    :param delta: Number of messages which became unread, negative if they were read
+    :return None
+    """
+    if delta:
+        transaction.on_commit(
+            lambda: _apply_unread_messages_count_change(user_id, delta)
+        )
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+# Standard Library
+import json
+import random
+import timeit
+
+from django.core.management.base import BaseCommand
+
+from beacon.mdlive import timezones
+
+
+class Command(BaseCommand):
+    help = "Precompute timezones of zip codes used by `get_timezone_from_zip`"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--output",
+            default=timezones.ZIP_TIMEZONES_PATH,
+            help="Path of the generated table",
+        )
+        parser.add_argument(
+            "--benchmark",
+            action="store_true",
+            help="Compare lookups in the table with resolving timezones on each call",
+        )
+
+    def handle(self, *args, **options):
+        if options["benchmark"]:
+            return self.benchmark()
+
+        zip_timezones = timezones.build_zip_timezones()
+        with open(options["output"], "w") as f:
+            json.dump(zip_timezones, f, separators=(",", ":"))
+            f.write("\n")
+        zip_codes_count = sum(len(zip_codes) for zip_codes in zip_timezones.values())
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Successfully stored timezones of {zip_codes_count} zip codes!"
+            )
+        )
+
+    def benchmark(self):
+        zip_codes = [f"{random.randint(500, 99950):05d}" for _ in range(100)]
+        per_call = timeit.timeit(
+            lambda: [timezones.resolve_timezone_from_zip(z) for z in zip_codes],
+            number=1,
+        )
+        load = timeit.timeit(timezones.get_zip_timezones, number=1)
+        table = timeit.timeit(
+            lambda: [timezones.get_timezone_from_zip(z) for z in zip_codes],
+            number=100,
+        )
+        self.stdout.write(
+            f"Resolving on each call: {per_call / len(zip_codes) * 1e6:.1f}us per lookup\n"
+            f"Loading table: {load * 1e3:.1f}ms once per process\n"
+            f"Table lookup: {table / (100 * len(zip_codes)) * 1e6:.2f}us per lookup"
+        )
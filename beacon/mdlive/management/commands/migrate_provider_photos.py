@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+from django.core.management.base import BaseCommand
+
+from beacon.mdlive.models import Provider
+from beacon.mdlive.services import save_provider_photo
+
+
+class Command(BaseCommand):
+    help = "Move base64 encoded photos of providers into media storage"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=100,
+            help="Number of providers to fetch per query",
+        )
+
+    def handle(self, *args, **options):
+        providers = Provider.objects.filter(
+            photo_in_binary_data__isnull=False
+        ).order_by("id")
+        migrated_count = 0
+        invalid_count = 0
+        for provider in providers.iterator(chunk_size=options["chunk_size"]):
+            if save_provider_photo(
+                provider, provider.photo_in_binary_data, provider.photo_format
+            ):
+                migrated_count += 1
+            else:
+                invalid_count += 1
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Successfully moved {migrated_count} photos of providers, "
+                f"skipped {invalid_count} invalid photos!"
+            )
+        )
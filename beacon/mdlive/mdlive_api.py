@@ -0,0 +1,378 @@
+# -*- coding: utf-8 -*-
+# Standard Library
+import json
+import logging
+import threading
+import time
+
+# Third Party Stuff
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from rest_framework.exceptions import ValidationError
+from urllib3.util.retry import Retry
+
+log = logging.getLogger(__name__)
+metrics_log = logging.getLogger("beacon.mdlive.metrics")
+
+_client_lock = threading.Lock()
+_client = None
+
+
+class MDLiveClient:
+    """
+    Client for MDLive's REST API.
+
+    All requests go through a keep-alive `requests.Session`, with connect/read timeouts
+    and bounded retries of idempotent requests. Latency and status code of every
+    request are logged to `beacon.mdlive.metrics` logger, tagged with the endpoint name.
+    """
+
+    AUTH_TOKEN_URI = "/auth/auth_token"
+    SSO_AUTH_TOKEN_URI = "/api/v1/sso_auth/auth_token"
+    SSO_AUTH_EXTEND_URI = "/api/v1/sso_auth/auth_extend"
+    PATIENTS_URI = "/api/v1/patients"
+    PATIENT_URI = "/api/v2/patients/{patient_id}"
+    PROVIDERS_SEARCH_URI = "/api/v2/patients/{patient_id}/providers/search"
+    PROVIDER_PROFILE_URI = "/api/v2/providers/{provider_id}/profile"
+    CONTACTS_URI = "/api/v1/patients/{patient_id}/messages/contacts"
+    CONVERSATION_URI = (
+        "/api/v1/patients/{patient_id}/providers/{provider_id}/conversation"
+    )
+    MESSAGES_URI = "/api/v1/patients/{patient_id}/messages"
+    MARK_READ_URI = "/api/v1/patients/{patient_id}/messages/{message_id}/mark_read"
+    APPOINTMENT_REQUESTS_URI = "/api/v2/patients/{patient_id}/appointment_requests"
+    APPOINTMENT_REQUEST_REMIND_URI = (
+        "/api/v2/patients/{patient_id}/appointment_requests/{request_id}/remind"
+    )
+    APPOINTMENT_REQUEST_CANCEL_URI = (
+        "/api/v2/patients/{patient_id}/appointment_requests/{request_id}/cancel"
+    )
+    DOCUMENT_URI = "/api/v1/patients/{patient_id}/documents/{document_id}"
+    WEBHOOK_URI = "/api/v1/webhook"
+
+    # Endpoints which are slower than others on MDLive's end
+    ENDPOINT_TIMEOUTS = {
+        "search_providers": (settings.MDLIVE_CONNECT_TIMEOUT, 30),
+        "get_provider": (settings.MDLIVE_CONNECT_TIMEOUT, 30),
+    }
+    RETRY_METHODS = frozenset(["GET", "HEAD", "OPTIONS", "PUT", "DELETE"])
+    RETRY_STATUSES = (502, 503, 504)
+
+    def __init__(self, base_url=None, session=None):
+        self._base_url = base_url or settings.MDLIVE_URL
+        self.session = session or self.get_session()
+
+    @classmethod
+    def get_session(cls):
+        retry = Retry(
+            total=settings.MDLIVE_MAX_RETRIES,
+            backoff_factor=0.3,
+            status_forcelist=cls.RETRY_STATUSES,
+            allowed_methods=cls.RETRY_METHODS,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=settings.MDLIVE_POOL_MAXSIZE,
+            max_retries=retry,
+        )
+        session = requests.Session()
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    @staticmethod
+    def get_headers(token=None):
+        headers = {"Content-type": "application/json"}
+        if token:
+            headers["Authorization"] = "Bearer {}".format(token)
+        return headers
+
+    def request(self, method, uri, endpoint, **kwargs):
+        kwargs.setdefault(
+            "timeout",
+            self.ENDPOINT_TIMEOUTS.get(
+                endpoint,
+                (settings.MDLIVE_CONNECT_TIMEOUT, settings.MDLIVE_READ_TIMEOUT),
+            ),
+        )
+        url = self._base_url + uri
+        status_code = None
+        start = time.monotonic()
+        try:
+            response = self.session.request(method, url, **kwargs)
+            status_code = response.status_code
+            return response
+        finally:
+            duration_ms = (time.monotonic() - start) * 1000
+            metrics_log.info(
+                "MDLive %s %s: %s in %.1fms",
+                method,
+                endpoint,
+                status_code or "failed",
+                duration_ms,
+                extra={
+                    "endpoint": endpoint,
+                    "method": method,
+                    "status_code": status_code,
+                    "duration_ms": duration_ms,
+                },
+            )
+
+    def get(self, uri, endpoint, **kwargs):
+        return self.request("GET", uri, endpoint, **kwargs)
+
+    def post(self, uri, endpoint, **kwargs):
+        return self.request("POST", uri, endpoint, **kwargs)
+
+    def put(self, uri, endpoint, **kwargs):
+        return self.request("PUT", uri, endpoint, **kwargs)
+
+    def patch(self, uri, endpoint, **kwargs):
+        return self.request("PATCH", uri, endpoint, **kwargs)
+
+    def delete(self, uri, endpoint, **kwargs):
+        return self.request("DELETE", uri, endpoint, **kwargs)
+
+    @staticmethod
+    def decode(response, expected_statuses=(200,)):
+        """Return JSON content of response, or raise `ValidationError` for other statuses."""
+        if response.status_code in expected_statuses:
+            return json.loads(response.content)
+        raise ValidationError(
+            f"Error from mdlive: {response.status_code} {response.content}"
+        )
+
+    @staticmethod
+    def get_error_content(response):
+        response_content = response.content
+        if response_content and hasattr(response, "json") and callable(response.json):
+            response_content = response.json()
+        return response_content
+
+    def get_token_from_keys(self, data):
+        response = self.post(
+            self.AUTH_TOKEN_URI,
+            "get_token_from_keys",
+            data=json.dumps(data),
+            headers=self.get_headers(),
+        )
+        return self.decode(response, expected_statuses=(201,)).get("jwt")
+
+    def get_user_token(self, data):
+        response = self.post(
+            self.SSO_AUTH_TOKEN_URI,
+            "get_user_token",
+            data=json.dumps(data),
+            headers=self.get_headers(),
+        )
+        if response.status_code == 200:
+            return json.loads(response.content)
+        log.info(
+            f"Error from MDLive User Token: {response.status_code} {response.content}\nData: {data}"
+        )
+        raise ValidationError(
+            f"Error from mdlive: {response.status_code} {self.get_error_content(response)}"
+        )
+
+    def extend_user_token(self, token, data):
+        response = self.post(
+            self.SSO_AUTH_EXTEND_URI,
+            "extend_user_token",
+            data=json.dumps(data),
+            headers=self.get_headers(token=token),
+        )
+        return self.decode(response).get("jwt")
+
+    def register_patient(self, token, data):
+        response = self.post(
+            self.PATIENTS_URI,
+            "register_patient",
+            data=json.dumps(data),
+            headers=self.get_headers(token=token),
+        )
+        return self.decode(response).get("token")
+
+    def search_providers(self, token, patient_id, params, data):
+        response = self.post(
+            self.PROVIDERS_SEARCH_URI.format(patient_id=patient_id),
+            "search_providers",
+            params=params,
+            json=data,
+            headers=self.get_headers(token=token),
+        )
+        return self.decode(response)
+
+    def get_provider(self, token, provider_id, params):
+        response = self.get(
+            self.PROVIDER_PROFILE_URI.format(provider_id=provider_id),
+            "get_provider",
+            params=params,
+            headers=self.get_headers(token=token),
+        )
+        return self.decode(response)
+
+    def get_contacts(self, token, patient_id):
+        response = self.get(
+            self.CONTACTS_URI.format(patient_id=patient_id),
+            "get_contacts",
+            headers=self.get_headers(token=token),
+        )
+        return self.decode(response)
+
+    def get_conversation(self, token, patient_id, provider_id):
+        response = self.get(
+            self.CONVERSATION_URI.format(
+                patient_id=patient_id, provider_id=provider_id
+            ),
+            "get_conversation",
+            headers=self.get_headers(token=token),
+        )
+        return self.decode(response)
+
+    def create_message(self, token, patient_id, data):
+        response = self.post(
+            self.MESSAGES_URI.format(patient_id=patient_id),
+            "create_message",
+            data=json.dumps(data),
+            headers=self.get_headers(token=token),
+        )
+        return self.decode(response, expected_statuses=(200, 201))
+
+    def mark_message_read(self, token, patient_id, message_id):
+        response = self.put(
+            self.MARK_READ_URI.format(patient_id=patient_id, message_id=message_id),
+            "mark_message_read",
+            headers=self.get_headers(token=token),
+        )
+        if response.status_code != 204:
+            raise ValidationError(
+                f"Error from mdlive: {response.status_code} {response.content}"
+            )
+
+    def request_appointment(self, token, patient_id, data):
+        response = self.post(
+            self.APPOINTMENT_REQUESTS_URI.format(patient_id=patient_id),
+            "request_appointment",
+            data=json.dumps(data),
+            headers=self.get_headers(token=token),
+        )
+        return self.decode(response, expected_statuses=(201,))
+
+    def appointment_request_remind(self, token, patient_id, request_id):
+        response = self.post(
+            self.APPOINTMENT_REQUEST_REMIND_URI.format(
+                patient_id=patient_id, request_id=request_id
+            ),
+            "appointment_request_remind",
+            headers=self.get_headers(token=token),
+        )
+        return self.decode(response)
+
+    def appointment_request_cancel(self, token, patient_id, request_id):
+        response = self.post(
+            self.APPOINTMENT_REQUEST_CANCEL_URI.format(
+                patient_id=patient_id, request_id=request_id
+            ),
+            "appointment_request_cancel",
+            headers=self.get_headers(token=token),
+        )
+        return self.decode(response)
+
+    def create_webhook(self, token, data):
+        response = self.post(
+            self.WEBHOOK_URI,
+            "create_webhook",
+            data=json.dumps(data),
+            headers=self.get_headers(token=token),
+        )
+        return self.decode(response, expected_statuses=(201,))
+
+    def delete_document(self, token, patient_id, document_id):
+        response = self.delete(
+            self.DOCUMENT_URI.format(patient_id=patient_id, document_id=document_id),
+            "delete_document",
+            headers=self.get_headers(token=token),
+        )
+        return self.decode(response, expected_statuses=(200, 204))
+
+    def get_patient(self, token, patient_id):
+        response = self.get(
+            self.PATIENT_URI.format(patient_id=patient_id),
+            "get_patient",
+            headers=self.get_headers(token=token),
+        )
+        response_content = self.get_patient_log_content(response)
+        log.info(
+            f"For MDLive ID: {patient_id}. "
+            + f"Response from MDLive while fetching patient's details: {response_content}"
+        )
+
+        if response.status_code == 200:
+            log.info(
+                f"For MDLive ID: {patient_id}. "
+                + "Patient's details retrieved successfully!"
+            )
+            return json.loads(response.content)
+
+        log.info(
+            f"For MDLive ID: {patient_id}. Failed to retrieve Patient's details."
+            + f" {response_content}"
+        )
+        raise ValidationError(
+            "Error while retrieving patient's details from MDLive:"
+            + f" {response.status_code} {response_content}"
+        )
+
+    def update_patient(self, token, patient_id, data_to_update):
+        headers = self.get_headers(token=token)
+        headers.update({"Accept": "application/json"})
+        data = {"patient": data_to_update}
+        response = self.patch(
+            self.PATIENT_URI.format(patient_id=patient_id),
+            "update_patient",
+            data=json.dumps(data),
+            headers=headers,
+        )
+        response_content = self.get_patient_log_content(response)
+        log.info(
+            f"For MDLive ID: {patient_id} and request data: {data} "
+            + f"Response from MDLive while updating patient's details: {response_content}"
+        )
+        if response.status_code == 200:
+            log.info(
+                f"For MDLive ID: {patient_id}. "
+                + "Patient's details updated successfully on MDLive!"
+            )
+            return json.loads(response.content)
+
+        log.info(
+            f"For MDLive ID: {patient_id}. Failed to update Patient's details."
+            + f" {response_content}"
+        )
+        raise ValidationError(
+            "Error while updating patient's details on MDLive:"
+            + f" {response.status_code} {response_content}"
+        )
+
+    @classmethod
+    def get_patient_log_content(cls, response):
+        response_content = cls.get_error_content(response)
+        # removing "affiliation" because it contains a lot of unnecessary text
+        # like MDLive's Privacy Policy, etc.
+        if isinstance(response_content, dict) and response_content.get(
+            "patient_profile", None
+        ):
+            response_content["patient_profile"].pop("affiliation", None)
+        return response_content
+
+
+def get_mdlive_client():
+    """Return the process wide `MDLiveClient`, so its connections are reused."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = MDLiveClient()
+    return _client
@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 3.2.11 on 2026-10-18 18:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("mdlive", "0015_auto_20210216_1215"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="contact",
+            name="last_synced_message_at",
+            field=models.DateTimeField(
+                blank=True,
+                editable=False,
+                null=True,
+                verbose_name="Last synced message's datetime",
+            ),
+        ),
+        migrations.AddField(
+            model_name="contact",
+            name="last_synced_message_mdlive_id",
+            field=models.PositiveIntegerField(
+                blank=True,
+                editable=False,
+                null=True,
+                verbose_name="Last synced message's mdlive id",
+            ),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 3.2.11 on 2026-10-18 19:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("mdlive", "0016_contact_sync_cursor"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="provider",
+            name="profile_synced_at",
+            field=models.DateTimeField(
+                blank=True,
+                db_index=True,
+                editable=False,
+                null=True,
+                verbose_name="Profile synced at",
+            ),
+        ),
+    ]
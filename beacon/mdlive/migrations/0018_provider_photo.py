@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 3.2.11 on 2026-10-18 19:07
+
+import uuid_upload_path.storage
+import versatileimagefield.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("mdlive", "0017_provider_profile_synced_at"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="provider",
+            name="photo",
+            field=versatileimagefield.fields.VersatileImageField(
+                blank=True,
+                null=True,
+                upload_to=uuid_upload_path.storage.upload_to,
+                verbose_name="Photo",
+            ),
+        ),
+        migrations.AddField(
+            model_name="provider",
+            name="photo_checksum",
+            field=models.CharField(
+                blank=True,
+                editable=False,
+                max_length=64,
+                null=True,
+                verbose_name="Photo checksum",
+            ),
+        ),
+        migrations.AddField(
+            model_name="provider",
+            name="photo_poi",
+            field=versatileimagefield.fields.PPOIField(
+                default="0.5x0.5",
+                editable=False,
+                max_length=20,
+                verbose_name="photo's point of interest",
+            ),
+        ),
+    ]
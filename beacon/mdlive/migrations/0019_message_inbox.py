@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 3.2.11 on 2026-10-18 19:17
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+SET_MESSAGE_PARTICIPANTS_SQL = """
+UPDATE message
+SET user_id = user_message.message_from_id, provider_id = user_message.message_to_id
+FROM user_message
+WHERE user_message.message_id = message.id;
+
+UPDATE message
+SET user_id = provider_message.message_to_id,
+    provider_id = provider_message.message_from_id
+FROM provider_message
+WHERE provider_message.message_id = message.id;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("mdlive", "0018_provider_photo"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="message",
+            name="provider",
+            field=models.ForeignKey(
+                blank=True,
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="inbox_messages",
+                to="mdlive.provider",
+            ),
+        ),
+        migrations.AddField(
+            model_name="message",
+            name="user",
+            field=models.ForeignKey(
+                blank=True,
+                db_index=False,
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="inbox_messages",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.RunSQL(SET_MESSAGE_PARTICIPANTS_SQL, migrations.RunSQL.noop),
+        migrations.AddIndex(
+            model_name="message",
+            index=models.Index(
+                fields=["user", "-datetime"], name="message_user_datetime_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="message",
+            index=models.Index(
+                fields=["user", "is_read"], name="message_user_is_read_idx"
+            ),
+        ),
+    ]
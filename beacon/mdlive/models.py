@@ -4,6 +4,8 @@ from django.contrib.auth import get_user_model
 from django.db import models
 from django.db.models import JSONField
 from django.utils.translation import gettext_lazy as _
+from uuid_upload_path import upload_to
+from versatileimagefield.fields import PPOIField, VersatileImageField
 
 # beacon Stuff
 from beacon.base.models import TimeStampedUUIDModel, UUIDModel
@@ -29,8 +31,20 @@ class Provider(TimeStampedUUIDModel):
     specialities = JSONField(_("Specialities"), null=True, blank=True)
     photo_url = models.CharField(_("Image Url"), max_length=100, null=True, blank=True)
     photo_url_absolute = models.URLField(null=True, blank=True)
+    # Legacy base64 encoded photo, moved to `photo` by `migrate_provider_photos` command
     photo_in_binary_data = models.TextField(null=True, blank=True)
     photo_format = models.CharField(null=True, blank=True, max_length=5)
+    photo = VersatileImageField(
+        _("Photo"), upload_to=upload_to, null=True, blank=True, ppoi_field="photo_poi"
+    )
+    photo_poi = PPOIField(verbose_name="photo's point of interest")
+    # Checksum of the base64 encoded photo from MDLive, to only decode changed photos
+    photo_checksum = models.CharField(
+        _("Photo checksum"), max_length=64, null=True, blank=True, editable=False
+    )
+    profile_synced_at = models.DateTimeField(
+        _("Profile synced at"), null=True, blank=True, editable=False, db_index=True
+    )
 
     class Meta:
         db_table = "provider"
@@ -102,6 +116,25 @@ class Message(UUIDModel):
         UserDocument, related_name="messages", through="MessageDocument"
     )
     reply_allowed = models.BooleanField(_("Reply Allowed"), default=False)
+    # User whose inbox has the message and provider on the other end, denormalized from
+    # `user_message` / `provider_message` so inbox queries don't have to join them
+    user = models.ForeignKey(
+        USER,
+        on_delete=models.CASCADE,
+        related_name="inbox_messages",
+        null=True,
+        blank=True,
+        editable=False,
+        db_index=False,
+    )
+    provider = models.ForeignKey(
+        Provider,
+        on_delete=models.CASCADE,
+        related_name="inbox_messages",
+        null=True,
+        blank=True,
+        editable=False,
+    )
 
     class Meta:
         db_table = "message"
@@ -109,6 +142,12 @@ class Message(UUIDModel):
         ordering = [
             "-datetime",
         ]
+        indexes = [
+            models.Index(
+                fields=["user", "-datetime"], name="message_user_datetime_idx"
+            ),
+            models.Index(fields=["user", "is_read"], name="message_user_is_read_idx"),
+        ]
 
     def __str__(self):
         return f"{self.mdlive_id}-{self.subject}"
@@ -181,6 +220,13 @@ class Contact(TimeStampedUUIDModel):
     provider = models.ForeignKey(
         Provider, on_delete=models.CASCADE, related_name="users"
     )
+    # Cursor of the conversation sync, i.e. latest message synced from MDLive
+    last_synced_message_mdlive_id = models.PositiveIntegerField(
+        _("Last synced message's mdlive id"), null=True, blank=True, editable=False
+    )
+    last_synced_message_at = models.DateTimeField(
+        _("Last synced message's datetime"), null=True, blank=True, editable=False
+    )
 
     class Meta:
         db_table = "contact"
@@ -192,6 +238,13 @@ class Contact(TimeStampedUUIDModel):
     def __str__(self):
         return f"{self.user}-{self.provider}"
 
+    @property
+    def sync_cursor(self):
+        """Position `(datetime, mdlive_id)` of the latest synced message, if any."""
+        if self.last_synced_message_at is None:
+            return None
+        return self.last_synced_message_at, self.last_synced_message_mdlive_id
+
 
 class AppointmentSlotQuery(TimeStampedUUIDModel):
     APPOINTMENT_METHOD_CHOICES = (
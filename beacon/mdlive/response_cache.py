@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""
+Short lived cache of MDLive's provider search and profile responses.
+
+Users paging through providers and refining filters send identical queries within
+seconds. Responses are cached for `PROVIDER_RESPONSE_CACHE_TIMEOUT` seconds, keyed by
+the normalized query and the MDLive token it was sent with, since MDLive's check of the
+token is the only access control of these endpoints. Concurrent identical requests are
+coalesced: only the request holding the query's lock calls MDLive. The others get the
+previous response of the query while it is kept as stale, or else wait for the new one
+at most `PROVIDER_RESPONSE_WAIT_TIMEOUT` seconds. A sample of hits and misses is counted
+per endpoint, see `get_cache_stats`.
+"""
+# Standard Library
+import hashlib
+import json
+import random
+import time
+import uuid
+
+# Third Party Stuff
+from django.core.cache import cache
+from rest_framework.exceptions import ValidationError
+
+from . import constants
+from .mdlive_api import metrics_log
+
+
+def get_response_cache_key(endpoint, query, token):
+    normalized_query = json.dumps(
+        {"query": query, "token": token},
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str,
+    )
+    query_hash = hashlib.sha256(normalized_query.encode()).hexdigest()
+    return constants.PROVIDER_RESPONSE_CACHE_KEY.format(
+        endpoint=endpoint, query_hash=query_hash
+    )
+
+
+def _get_stats_cache_key(endpoint, result):
+    return constants.PROVIDER_RESPONSE_CACHE_STATS_KEY.format(
+        endpoint=endpoint, result=result
+    )
+
+
+def _record(endpoint, result):
+    # Counting every lookup would add a cache write to each of them
+    if random.random() < constants.PROVIDER_RESPONSE_STATS_SAMPLE_RATE:
+        key = _get_stats_cache_key(endpoint, result)
+        if not cache.add(key, 1, timeout=None):
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.add(key, 1, timeout=None)
+    metrics_log.info(
+        "MDLive %s response cache %s",
+        endpoint,
+        result,
+        extra={"endpoint": endpoint, "cache_result": result},
+    )
+
+
+def get_cache_stats(endpoint):
+    """
+    Return sampled counts of hits and misses of an endpoint's responses, and the hit
+    rate.
+    """
+    keys = {
+        result: _get_stats_cache_key(endpoint, result) for result in ("hit", "miss")
+    }
+    counts = cache.get_many(keys.values())
+    hits = counts.get(keys["hit"], 0)
+    misses = counts.get(keys["miss"], 0)
+    total = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": hits / total if total else 0.0,
+    }
+
+
+def get_cached_response(endpoint, query, token, fetch):
+    """
+    Return cached response of the query, calling `fetch` only if no other request is
+    already fetching it.
+    :param endpoint: Name of MDLive endpoint, e.g. `search_providers`
+    :param query: JSON serializable query, everything the response depends on
+    :param token: MDLive token the query is sent with, responses are cached per token
+    :param fetch: Callable returning response of the query from MDLive
+    :return response of the query
+    """
+    key = get_response_cache_key(endpoint, query, token)
+    response = cache.get(key)
+    if response is not None:
+        _record(endpoint, "hit")
+        return response
+
+    lock_key = f"{key}:lock"
+    lock_id = uuid.uuid4().hex
+    stale_key = f"{key}:stale"
+    deadline = time.monotonic() + constants.PROVIDER_RESPONSE_WAIT_TIMEOUT
+    while True:
+        if cache.add(
+            lock_key, lock_id, timeout=constants.PROVIDER_RESPONSE_LOCK_TIMEOUT
+        ):
+            try:
+                # Response could have been cached right before the lock was acquired
+                response = cache.get(key)
+                if response is not None:
+                    _record(endpoint, "hit")
+                    return response
+                _record(endpoint, "miss")
+                response = fetch()
+                cache.set(
+                    key, response, timeout=constants.PROVIDER_RESPONSE_CACHE_TIMEOUT
+                )
+                cache.set(
+                    stale_key,
+                    response,
+                    timeout=constants.PROVIDER_RESPONSE_STALE_TIMEOUT,
+                )
+                return response
+            finally:
+                # Lock could have expired and been acquired by another request
+                if cache.get(lock_key) == lock_id:
+                    cache.delete(lock_key)
+
+        # Another request is fetching the query, don't hold this worker waiting on it
+        # if the previous response is still around, and only briefly otherwise
+        responses = cache.get_many([key, stale_key])
+        response = responses.get(key, responses.get(stale_key))
+        if response is not None:
+            _record(endpoint, "hit")
+            return response
+        if time.monotonic() > deadline:
+            # Request holding the lock is stuck on MDLive, sending this one too would
+            # only pile more requests up
+            raise ValidationError(
+                "MDLive is taking too long to respond, please try again."
+            )
+        time.sleep(constants.PROVIDER_RESPONSE_POLL_INTERVAL)
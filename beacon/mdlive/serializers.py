@@ -2,6 +2,7 @@
 
 # Third Party Stuff
 from rest_framework import serializers
+from versatileimagefield.serializers import VersatileImageFieldSerializer
 
 from .models import AppointmentSlotQuery, Message, Provider, UserDocument
 
@@ -155,29 +156,35 @@ class MessageSerializer(serializers.ModelSerializer):
     def get_unread_status(self, obj):
         return not obj.is_read
 
+    def get_sender_and_recipient(self, obj):
+        if obj.message_type == Message.PROVIDER_MESSAGE:
+            return obj.provider, obj.user
+        return obj.user, obj.provider
+
+    def get_name(self, participant):
+        if isinstance(participant, Provider):
+            return participant.fullname
+        return f"{participant.first_name} {participant.last_name}"
+
     def get_from(self, obj):
-        if hasattr(obj, "provider_message"):
-            return obj.provider_message.message_from.fullname
-        if hasattr(obj, "user_message"):
-            return f"{obj.user_message.message_from.first_name} {obj.user_message.message_from.last_name}"
+        sender, _ = self.get_sender_and_recipient(obj)
+        if sender is not None:
+            return self.get_name(sender)
 
     def get_from_id(self, obj):
-        if hasattr(obj, "provider_message"):
-            return obj.provider_message.message_from.mdlive_id
-        if hasattr(obj, "user_message"):
-            return obj.user_message.message_from.mdlive_id
+        sender, _ = self.get_sender_and_recipient(obj)
+        if sender is not None:
+            return sender.mdlive_id
 
     def get_to(self, obj):
-        if hasattr(obj, "provider_message"):
-            return f"{obj.provider_message.message_to.first_name} {obj.provider_message.message_to.last_name}"
-        if hasattr(obj, "user_message"):
-            return obj.user_message.message_to.fullname
+        _, recipient = self.get_sender_and_recipient(obj)
+        if recipient is not None:
+            return self.get_name(recipient)
 
     def get_to_id(self, obj):
-        if hasattr(obj, "provider_message"):
-            return obj.provider_message.message_to.mdlive_id
-        if hasattr(obj, "user_message"):
-            return obj.user_message.message_to.mdlive_id
+        _, recipient = self.get_sender_and_recipient(obj)
+        if recipient is not None:
+            return recipient.mdlive_id
 
 
 # Adding reserved keyword to match the MDLIVE api
@@ -223,6 +230,7 @@ class UserMessageSerializer(serializers.ModelSerializer):
 
 class ProviderSerializer(serializers.ModelSerializer):
     id = serializers.SerializerMethodField()
+    photo = VersatileImageFieldSerializer(sizes="provider_photo")
 
     class Meta:
         model = Provider
@@ -234,6 +242,7 @@ class ProviderSerializer(serializers.ModelSerializer):
             "speciality",
             "photo_url",
             "photo_url_absolute",
+            "photo",
         )
 
     def get_id(self, obj):
@@ -1,56 +1,43 @@
 # -*- coding: utf-8 -*-
 # Standard Library
+import base64
+import binascii
+import hashlib
 import json
 import logging
 import re
-from copy import deepcopy
+from concurrent.futures import ThreadPoolExecutor
+from copy import copy, deepcopy
+from io import BytesIO
 from typing import Any, Dict, Optional, Union
 
 # Third Party Stuff
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models import F, Q
 from django.utils import timezone
 from django_sites import get_current
 from mail_templated import send_mail
-from pyzipcode import ZipCodeDatabase
-from requests import delete as requests_delete
-from requests import (
-    get as requests_get,  # import get/post func to mock multiple requests in tests
-)
-from requests import patch as requests_patch
-from requests import post as requests_post
-from requests import put as requests_put
+from PIL import Image
+from requests import RequestException
 from rest_framework.exceptions import ValidationError
-from timezonefinder import TimezoneFinder
+from versatileimagefield.image_warmer import VersatileImageFieldWarmer
 
 # beacon Stuff
 from beacon.base.models import SiteConfiguration
-from beacon.users.choices import ALLOWED_TIMEZONES
 from beacon.users.utils import get_relationship_from_user
 
-from . import constants, models
+from . import constants, directory, inbox, models, timezones
+from .mdlive_api import MDLiveClient, get_mdlive_client
 
 log = logging.getLogger(__name__)
 
 
 def get_timezone_from_zip(zip_code):
-    zc = ZipCodeDatabase()
-    try:
-        zip_code_data = zc[zip_code]
-    except KeyError:
-        zip_code_data = None
-    if zip_code_data:
-        tf = TimezoneFinder()
-        try:
-            time_zone = tf.timezone_at(
-                lng=zip_code_data.longitude, lat=zip_code_data.latitude
-            )
-        except ValueError:
-            time_zone = None
-        if time_zone in ALLOWED_TIMEZONES:
-            return time_zone
-    # By Default EST timezone will be returned.
-    return "America/New_York"
+    return timezones.get_timezone_from_zip(zip_code)
 
 
 def get_mdlive_data_from_cognito_data(
@@ -111,10 +98,7 @@ def get_mdlive_data_from_cognito_data(
 
 
 def get_mdlive_headers(token=None):
-    headers = {"Content-type": "application/json"}
-    if token:
-        headers["Authorization"] = "Bearer {}".format(token)
-    return headers
+    return MDLiveClient.get_headers(token=token)
 
 
 def get_mdlive_auth_data():
@@ -145,15 +129,22 @@ def get_mdlive_organisation_data(organisation=None):
 
 
 def get_token_from_keys():
-    url = "{}/auth/auth_token".format(settings.MDLIVE_URL)
-    headers = get_mdlive_headers()
-    data = get_mdlive_auth_data()
-    response = requests_post(url, data=json.dumps(data), headers=headers)
-    if response.status_code == 201:
-        return json.loads(response.content).get("jwt")
-    raise ValidationError(
-        f"Error from mdlive: {response.status_code} {response.content}"
-    )
+    return get_mdlive_client().get_token_from_keys(get_mdlive_auth_data())
+
+
+def get_user_token_request_data(user_data, organisation=None):
+    org_data = get_mdlive_organisation_data(organisation=organisation)
+    api_data = get_mdlive_api_data()
+    data = deepcopy(user_data)
+    data.update(api_data)
+    data.update(org_data)
+
+    # MDLive's `user-tokens` API supports only "M", "F", or "U" as valid values for gender.
+    # See: https://developers.mdlivetechnology.com/#user-tokens
+    valid_gender_choices = ("M", "F", "U")
+    if data["auth"].get("gender") not in valid_gender_choices:
+        data["auth"]["gender"] = "U"
+    return data
 
 
 def get_user_token(user_data, organisation=None):
@@ -175,36 +166,52 @@ def get_user_token(user_data, organisation=None):
               'relationship': 'Self'}}
     :return: jwt token data
     """
-    url = "{}/api/v1/sso_auth/auth_token".format(settings.MDLIVE_URL)
-    headers = get_mdlive_headers()
-    org_data = get_mdlive_organisation_data(organisation=organisation)
-    api_data = get_mdlive_api_data()
-    data = deepcopy(user_data)
-    data.update(api_data)
-    data.update(org_data)
+    data = get_user_token_request_data(user_data, organisation=organisation)
     if data["auth"].get("member_id") is None:
         log.info(f"MDLive Member Id Data: {data}")
+    return get_mdlive_client().get_user_token(data)
 
-    # MDLive's `user-tokens` API supports only "M", "F", or "U" as valid values for gender.
-    # See: https://developers.mdlivetechnology.com/#user-tokens
-    valid_gender_choices = ("M", "F", "U")
-    if data["auth"].get("gender") not in valid_gender_choices:
-        data["auth"]["gender"] = "U"
 
-    response = requests_post(url, data=json.dumps(data), headers=headers)
-    if response.status_code == 200:
-        return json.loads(response.content)
-    log.info(
-        f"Error from MDLive User Token: {response.status_code} {response.content}\nData: {data}"
-    )
+def get_user_token_fingerprint(user_data, organisation=None):
+    """
+    Hash of the data an MDLive SSO token is requested with. Empty values are
+    normalized, so callers building the same profile slightly differently agree.
+    """
+    data = get_user_token_request_data(user_data, organisation=organisation)
+    data["auth"] = {
+        key: "" if value is None else str(value) for key, value in data["auth"].items()
+    }
+    canonical = json.dumps(data, sort_keys=True, default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
 
-    response_content = response.content
-    if hasattr(response, "json") and callable(response.json):
-        response_content = response.json()
 
-    raise ValidationError(
-        f"Error from mdlive: {response.status_code} {response_content}"
-    )
+def get_cached_user_token(user, user_data, organisation=None, refresh=False):
+    """
+    Return MDLive SSO token data of a user, requesting a new token only when the
+    cached one is about to expire or the profile data synced with it changed.
+
+    :param user: users.User object the token is for
+    :param user_data: user auth dict, see `get_user_token`
+    :param refresh: request a new token even if a valid one is cached
+    """
+    cache_key = constants.MDLIVE_USER_TOKEN_CACHE_KEY.format(user_id=user.id)
+    fingerprint = get_user_token_fingerprint(user_data, organisation=organisation)
+    if not refresh:
+        cached = cache.get(cache_key)
+        if cached is not None and cached["fingerprint"] == fingerprint:
+            return cached["token_data"]
+
+    token_data = get_user_token(user_data, organisation=organisation)
+    time_to_live_minutes = (token_data.get("user") or {}).get("time_to_live_minutes")
+    if time_to_live_minutes:
+        timeout = 60 * time_to_live_minutes - constants.MDLIVE_USER_TOKEN_REFRESH_MARGIN
+        if timeout > 0:
+            cache.set(
+                cache_key,
+                {"fingerprint": fingerprint, "token_data": token_data},
+                timeout=timeout,
+            )
+    return token_data
 
 
 def get_fake_user_token(organisation=None):
@@ -231,20 +238,13 @@ def get_timezone_from_mdlive_us_time_zone_id(mdlive_us_timezone_id):
 def get_providers(
     per_page=None, page=None, data=None, mdlive_fake_user_token=None, patient_id=None
 ):
-    url = "{}/api/v2/patients/{}/providers/search".format(
-        settings.MDLIVE_URL, patient_id
-    )
-    headers = get_mdlive_headers(token=mdlive_fake_user_token)
     params = dict()
     if per_page:
         params["per_page"] = per_page
     if page:
         params["page"] = page
-    response = requests_post(url, params=params, json=data, headers=headers)
-    if response.status_code == 200:
-        return json.loads(response.content)
-    raise ValidationError(
-        f"Error from mdlive: {response.status_code} {response.content}"
+    return get_mdlive_client().search_providers(
+        mdlive_fake_user_token, patient_id, params, data
     )
 
 
@@ -260,8 +260,6 @@ def get_provider(
     if not provider_id:
         raise ValidationError("Provider id is required!")
 
-    url = "{}/api/v2/providers/{}/profile".format(settings.MDLIVE_URL, provider_id)
-    headers = get_mdlive_headers(token=mdlive_fake_user_token)
     params = dict()
     if availability_type:
         params["availability_type"] = availability_type
@@ -275,12 +273,7 @@ def get_provider(
         params["show_next_availability"] = (
             False if show_next_availability == "false" else True
         )
-    response = requests_get(url, params=params, headers=headers)
-    if response.status_code == 200:
-        return json.loads(response.content)
-    raise ValidationError(
-        f"Error from mdlive: {response.status_code} {response.content}"
-    )
+    return get_mdlive_client().get_provider(mdlive_fake_user_token, provider_id, params)
 
 
 def extend_user_token_time(token, organisation=None):
@@ -289,18 +282,9 @@ def extend_user_token_time(token, organisation=None):
     :param organisation: beacon.organisations.Organisation object to be used for linking it on mdlive
     :return: extended token
     """
-    url = "{}/api/v1/sso_auth/auth_extend".format(settings.MDLIVE_URL)
-    headers = get_mdlive_headers(token=token)
-    org_data = get_mdlive_organisation_data(organisation=organisation)
-    api_data = get_mdlive_api_data()
-    data = org_data
-    data.update(api_data)
-    response = requests_post(url, data=json.dumps(data), headers=headers)
-    if response.status_code == 200:
-        return json.loads(response.content).get("jwt")
-    raise ValidationError(
-        f"Error from mdlive: {response.status_code} {response.content}"
-    )
+    data = get_mdlive_organisation_data(organisation=organisation)
+    data.update(get_mdlive_api_data())
+    return get_mdlive_client().extend_user_token(token, data)
 
 
 def register_patient_on_mdlive(user_data):
@@ -325,15 +309,203 @@ def register_patient_on_mdlive(user_data):
     :return: list of token returned from MDLive
     """
     token = get_token_from_keys()
-    headers = get_mdlive_headers(token=token)
-    data = deepcopy(user_data)
-    url = "{}/api/v1/patients".format(settings.MDLIVE_URL)
-    response = requests_post(url, data=json.dumps(data), headers=headers)
-    if response.status_code == 200:
-        return json.loads(response.content).get("token")
-    raise ValidationError(
-        f"Error from mdlive: {response.status_code} {response.content}"
+    return get_mdlive_client().register_patient(token, deepcopy(user_data))
+
+
+def map_concurrently(func, items):
+    """
+    Call `func` for each of the items in a bounded pool of threads.
+    Meant for MDLive API calls only, `func` must not touch the database.
+    :return list of results in the order of items
+    """
+    items = list(items)
+    if len(items) <= 1:
+        return [func(item) for item in items]
+    max_workers = min(settings.MDLIVE_SYNC_MAX_WORKERS, len(items))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(func, items))
+
+
+def get_provider_fields_from_contact_data(provider_data):
+    """
+    Return `mdlive.Provider` fields which are only present in contacts api data
+    :param provider_data: Provider data of a contact, or None
+    :return dict of field name to value
+    """
+    fields = dict(speciality=None, prefix=None)
+    if provider_data:
+        fields["speciality"] = provider_data.get("specialty", "SystemBot")
+        fields["prefix"] = provider_data.get("prefix")
+    return fields
+
+
+def get_provider_photo_checksum(photo_in_binary_data):
+    return hashlib.sha256(photo_in_binary_data.encode()).hexdigest()
+
+
+def save_provider_photo(provider, photo_in_binary_data, photo_format=None):
+    """
+    Decode base64 encoded photo of a provider into `Provider.photo` and pre-generate its
+    renditions. Invalid photos are skipped, but their checksum is stored so they aren't
+    decoded again.
+    :param provider: mdlive.Provider object
+    :param photo_in_binary_data: base64 encoded photo from provider card of MDLive
+    :param photo_format: Format of the photo e.g. `jpg`
+    :return True if the photo got saved
+    """
+    provider.photo_checksum = get_provider_photo_checksum(photo_in_binary_data)
+    provider.photo_in_binary_data = None
+    update_fields = ["photo_checksum", "photo_in_binary_data", "modified_at"]
+    try:
+        content = base64.b64decode(photo_in_binary_data, validate=True)
+        Image.open(BytesIO(content)).verify()
+    except (binascii.Error, ValueError, OSError) as e:
+        log.warning(f"Invalid photo of MDLive provider {provider.mdlive_id}: {e}")
+        provider.save(update_fields=update_fields)
+        return False
+
+    if provider.photo:
+        provider.photo.delete_all_created_images()
+        provider.photo.delete(save=False)
+    extension = (photo_format or "jpg").lower()
+    provider.photo.save(
+        f"{provider.mdlive_id}.{extension}", ContentFile(content), save=False
+    )
+    provider.photo_format = photo_format
+    provider.save(update_fields=update_fields + ["photo", "photo_format"])
+    VersatileImageFieldWarmer(
+        instance_or_queryset=provider,
+        rendition_key_set="provider_photo",
+        image_attr="photo",
+    ).warm()
+    return True
+
+
+def get_provider_fields_from_profile(provider_profile):
+    """
+    Return `mdlive.Provider` fields from provider profile api data
+    :param provider_profile: `provider_details` of the provider profile
+    :return dict of field name to value
+    """
+    return dict(
+        fullname=provider_profile.get("fullname") or "",
+        gender=provider_profile.get("gender") or "",
+        specialities=provider_profile.get("specialties"),
+        photo_url=provider_profile.get("photo_url"),
+        photo_url_absolute=provider_profile.get("photo_url_absolute"),
+    )
+
+
+def get_or_create_providers(provider_mdlive_ids, providers_data=None):
+    """
+    Get or create `mdlive.Provider` objects in bulk
+    Providers are looked up through the provider directory and missing ones are created
+    without calling MDLive, with whatever the contact data has. Their profiles are
+    fetched by `refresh_provider_profiles_task` once the transaction commits.
+    :param provider_mdlive_ids: Provider MDLive ids
+    :param providers_data: dict of provider MDLive id to provider data of the contact,
+                           existing providers are updated with the data if it changed
+    :return dict of provider MDLive id to mdlive.Provider object
+    """
+    # Importing internally to avoid circular import
+    from .tasks import refresh_provider_profiles_task
+
+    providers_data = {
+        int(mdlive_id): data for mdlive_id, data in (providers_data or {}).items()
+    }
+    provider_mdlive_ids = {int(mdlive_id) for mdlive_id in provider_mdlive_ids}
+    providers_fields = {
+        mdlive_id: get_provider_fields_from_contact_data(data)
+        for mdlive_id, data in providers_data.items()
+        if data and mdlive_id in provider_mdlive_ids
+    }
+    providers = directory.get_providers(provider_mdlive_ids - set(providers_fields))
+    for mdlive_id in provider_mdlive_ids - set(providers) - set(providers_fields):
+        providers_fields[mdlive_id] = get_provider_fields_from_contact_data(None)
+    if not providers_fields:
+        return providers
+
+    defaults = {
+        mdlive_id: dict(
+            fullname=(providers_data.get(mdlive_id) or {}).get("fullname") or "",
+            gender=(providers_data.get(mdlive_id) or {}).get("gender") or "",
+        )
+        for mdlive_id in providers_fields
+    }
+    upserted_providers, created_mdlive_ids = directory.upsert_providers(
+        providers_fields, defaults=defaults
     )
+    providers.update(upserted_providers)
+
+    providers_with_new_photo = []
+    for mdlive_id in providers_fields:
+        provider_card = (providers_data.get(mdlive_id) or {}).get("provider_card")
+        photo_in_binary_data = (provider_card or {}).get("photo_in_binary_data")
+        if not photo_in_binary_data:
+            continue
+        provider = providers[mdlive_id]
+        if provider.photo_checksum != get_provider_photo_checksum(photo_in_binary_data):
+            # Objects from the directory are shared, so the photo is saved on a copy
+            provider = providers[mdlive_id] = copy(provider)
+            save_provider_photo(
+                provider, photo_in_binary_data, provider_card.get("photo_format")
+            )
+            providers_with_new_photo.append(provider)
+    if providers_with_new_photo:
+        transaction.on_commit(
+            lambda: directory.cache_providers(providers_with_new_photo)
+        )
+
+    if created_mdlive_ids:
+        transaction.on_commit(
+            lambda: refresh_provider_profiles_task.delay(created_mdlive_ids)
+        )
+    return providers
+
+
+def refresh_provider_profiles(mdlive_ids=None):
+    """
+    Refresh profiles of providers from MDLive, fetching them concurrently
+    :param mdlive_ids: MDLive ids of providers to refresh, by default a batch of
+                       providers whose profile is missing or older than
+                       `PROVIDER_PROFILE_MAX_AGE_HOURS` is refreshed
+    :return list of MDLive ids of refreshed providers
+    """
+    if mdlive_ids is None:
+        stale_before = timezone.now() - timezone.timedelta(
+            hours=constants.PROVIDER_PROFILE_MAX_AGE_HOURS
+        )
+        mdlive_ids = (
+            models.Provider.objects.filter(
+                Q(profile_synced_at__isnull=True)
+                | Q(profile_synced_at__lt=stale_before)
+            )
+            .order_by(F("profile_synced_at").asc(nulls_first=True))
+            .values_list("mdlive_id", flat=True)[
+                : constants.PROVIDER_PROFILE_REFRESH_BATCH_SIZE
+            ]
+        )
+    mdlive_ids = sorted({int(mdlive_id) for mdlive_id in mdlive_ids})
+
+    def get_provider_profile(mdlive_id):
+        try:
+            return get_provider(mdlive_id).get("provider_details")
+        except (ValidationError, RequestException) as e:
+            log.warning(f"Failed to fetch profile of MDLive provider {mdlive_id}: {e}")
+            return None
+
+    provider_profiles = map_concurrently(get_provider_profile, mdlive_ids)
+    synced_at = timezone.now()
+    providers_fields = {
+        mdlive_id: dict(
+            get_provider_fields_from_profile(provider_profile),
+            profile_synced_at=synced_at,
+        )
+        for mdlive_id, provider_profile in zip(mdlive_ids, provider_profiles)
+        if provider_profile
+    }
+    directory.upsert_providers(providers_fields)
+    return list(providers_fields)
 
 
 def get_or_create_provider(provider_mdlive_id, provider_data=None):
@@ -345,51 +517,43 @@ def get_or_create_provider(provider_mdlive_id, provider_data=None):
                                          which does not exists in profile api data)
     :return mdlive.Provider object
     """
-    speciality = None
-    prefix = None
-    photo_in_binary_data = None
-    photo_format = None
-    if provider_data:
-        speciality = provider_data.get("specialty", "SystemBot")
-        prefix = provider_data.get("prefix")
-        provider_card = provider_data.get("provider_card")
-        if provider_card:
-            photo_in_binary_data = provider_card.get("photo_in_binary_data")
-            photo_format = provider_card.get("photo_format")
-
-    provider = models.Provider.objects.filter(mdlive_id=provider_mdlive_id).first()
-    if provider:
-        # Update provider data if exists
-        if provider_data:
-            provider.speciality = speciality
-            provider.prefix = prefix
-            provider.photo_in_binary_data = photo_in_binary_data
-            provider.photo_format = provider.photo_format
-            provider.save()
-        return provider
-
-    provider_profile = get_provider(provider_mdlive_id).get("provider_details")
-    provider = models.Provider.objects.create(
-        mdlive_id=provider_mdlive_id,
-        fullname=provider_profile.get("fullname"),
-        gender=provider_profile.get("gender"),
-        speciality=speciality,
-        specialities=provider_profile.get("specialties"),
-        prefix=prefix,
-        photo_url=provider_profile.get("photo_url"),
-        photo_url_absolute=provider_profile.get("photo_url_absolute"),
-        photo_in_binary_data=photo_in_binary_data,
-        photo_format=photo_format,
+    providers_data = {provider_mdlive_id: provider_data} if provider_data else None
+    providers = get_or_create_providers(
+        [provider_mdlive_id], providers_data=providers_data
+    )
+    return providers[int(provider_mdlive_id)]
+
+
+def create_missing_contacts(user, providers):
+    """
+    Create `mdlive.Contact` objects for providers which aren't user's contacts yet
+    :param user: users.User object
+    :param providers: mdlive.Provider objects
+    :return None
+    """
+    providers = list(providers)
+    existing_provider_ids = set(
+        models.Contact.objects.filter(user=user, provider__in=providers).values_list(
+            "provider_id", flat=True
+        )
+    )
+    models.Contact.objects.bulk_create(
+        [
+            models.Contact(user=user, provider=provider)
+            for provider in providers
+            if provider.id not in existing_provider_ids
+        ]
     )
-    return provider
 
 
-def get_mdlive_token_data_for_user(user, data_to_update=None):
+def get_mdlive_token_data_for_user(user, data_to_update=None, refresh=False):
     """
     Get MDLive token for a user
     :param user: users.User object
     :param data_to_update: Specific data that is to be updated with MDLive.
     This will be used if present, else data in user object will be used.
+    :param refresh: Request a new token, syncing the data with MDLive even if it
+    didn't change since the cached token was issued.
     :return MDLive user token data
       e.g. {"jwt":"eyJ0eXAiOiJKV1QiLCJhbGciOiJIUzI1NiJ9.eyJ1c2VyaWQiOjY0MjE5NzkzNSwidXNlcm5hbWUiOiJNRExJVkUtNWU5Y...",
             "user":{"id":642197935,
@@ -409,7 +573,9 @@ def get_mdlive_token_data_for_user(user, data_to_update=None):
         birth_date_str=str(birthdate),
         relationship=relationship,
     )
-    return get_user_token(mdlive_data, organisation=user.organisation)
+    return get_cached_user_token(
+        user, mdlive_data, organisation=user.organisation, refresh=refresh
+    )
 
 
 def get_parsed_datetime_from_message_string(datetime_string):
@@ -444,45 +610,51 @@ def create_providers_message(mdlive_message_data, user):
         is_read=not (mdlive_message_data.get("unread_status")),
         replied_to_message_id=mdlive_message_data.get("replied_to_message_id"),
         reply_allowed=mdlive_message_data.get("reply_allowed", False),
+        user=user,
+        provider=provider,
     )
     message.datetime = dt
     message.save()
     models.ProviderMessage.objects.create(
         message=message, message_from=provider, message_to=user
     )
+    if not message.is_read:
+        inbox.change_unread_messages_count(user.id, 1)
     contact = models.Contact.objects.filter(user=user, provider=provider).first()
     if contact is None:
         models.Contact.objects.create(user=user, provider=provider)
 
 
-def sync_user_contacts(user):
+def sync_user_contacts(user, token=None):
     """
     Fetch list of all available contacts for user from MDLive and store on our end if does not exists
     :param user: users.User object whose messages needs to be synced
+    :param token: MDLive user token, fetched if not given
     :return None
     """
-    token_data = get_mdlive_token_data_for_user(user)
-    token = token_data.get("jwt")
-    headers = get_mdlive_headers(token=token)
-    contacts_url = (
-        f"{settings.MDLIVE_URL}/api/v1/patients/{user.mdlive_id}/messages/contacts"
+    if token is None:
+        token = get_mdlive_token_data_for_user(user).get("jwt")
+    data = get_mdlive_client().get_contacts(token, user.mdlive_id)
+    contacts_data = {
+        int(contact_data["id"]): contact_data
+        for contact_data in data.get("contacts") or []
+        if contact_data.get("id")
+    }
+    existing_mdlive_ids = set(
+        models.Contact.objects.filter(
+            user=user, provider__mdlive_id__in=contacts_data
+        ).values_list("provider__mdlive_id", flat=True)
     )
-    response = requests_get(contacts_url, headers=headers)
-    if response.status_code != 200:
-        raise ValidationError(
-            f"Error from mdlive: {response.status_code} {response.content}"
+    new_contacts_data = {
+        mdlive_id: contact_data
+        for mdlive_id, contact_data in contacts_data.items()
+        if mdlive_id not in existing_mdlive_ids
+    }
+    if new_contacts_data:
+        providers = get_or_create_providers(
+            new_contacts_data, providers_data=new_contacts_data
         )
-    data = json.loads(response.content)
-    contacts_data = data.get("contacts")
-    if contacts_data:
-        for contact_data in contacts_data:
-            provider_mdlive_id = contact_data.get("id")
-            contact = models.Contact.objects.filter(
-                user__mdlive_id=user.mdlive_id, provider__mdlive_id=provider_mdlive_id
-            ).first()
-            if contact is None:
-                provider = get_or_create_provider(provider_mdlive_id, contact_data)
-                models.Contact.objects.create(user=user, provider=provider)
+        create_missing_contacts(user, providers.values())
 
 
 def create_message_on_mdlive(message_data, user):
@@ -493,8 +665,6 @@ def create_message_on_mdlive(message_data, user):
     :return MDLive response
     """
     token_data = get_mdlive_token_data_for_user(user)
-    token = token_data.get("jwt")
-    headers = get_mdlive_headers(token=token)
     data = {
         "message": {
             "message_type": message_data.get("message_type"),
@@ -520,12 +690,8 @@ def create_message_on_mdlive(message_data, user):
         for doc in documents:
             extra_message += f"{doc.document_name}\n"
         data["message"]["message"] += f"\n\n{extra_message}"
-    url = f"{settings.MDLIVE_URL}/api/v1/patients/{user.mdlive_id}/messages"
-    response = requests_post(url, data=json.dumps(data), headers=headers)
-    if response.status_code in [200, 201]:
-        return json.loads(response.content)
-    raise ValidationError(
-        f"Error from mdlive: {response.status_code} {response.content}"
+    return get_mdlive_client().create_message(
+        token_data.get("jwt"), user.mdlive_id, data
     )
 
 
@@ -549,6 +715,8 @@ def create_user_message(mdlive_message_data, user, documents=None):
         replied_to_message_id=mdlive_message_data.get("replied_to_message_id"),
         reply_allowed=mdlive_message_data.get("reply_allowed", False),
         datetime=dt,
+        user=user,
+        provider=provider,
     )
     if documents:
         models.MessageDocument.objects.bulk_create(
@@ -563,38 +731,209 @@ def create_user_message(mdlive_message_data, user, documents=None):
     return message
 
 
-def sync_user_messages(user, provider_id):
+def get_user_conversations(user, provider_ids, token):
+    """
+    Fetch user's conversations with the providers from MDLive concurrently
+    :param user: users.User object whose messages needs to be synced
+    :param provider_ids: mdlive.Provider.mdlive_id of providers
+    :param token: MDLive user token
+    :return dict of provider MDLive id to list of messages data
+    """
+    client = get_mdlive_client()
+
+    def get_conversation(provider_id):
+        data = client.get_conversation(token, user.mdlive_id, provider_id)
+        return data.get("messages") or []
+
+    provider_ids = list(provider_ids)
+    return dict(zip(provider_ids, map_concurrently(get_conversation, provider_ids)))
+
+
+def save_user_conversations(user, conversations):
+    """
+    Store messages of user's conversations which aren't synced yet
+    Messages up to the sync cursor of the user's contact with the provider are skipped,
+    remaining ones are checked against already stored messages with a single query and
+    new `mdlive.Message`, `mdlive.UserMessage`, `mdlive.ProviderMessage` and
+    `mdlive.Contact` objects are created with `bulk_create`. Cursors of the contacts are
+    advanced in the same transaction.
+    :param user: users.User object whose messages needs to be synced
+    :param conversations: dict of provider MDLive id to list of messages data
+    :return list of created mdlive.Message objects
+    """
+    user_mdlive_id = int(user.mdlive_id)
+    sync_cursors = {
+        contact.provider_mdlive_id: contact.sync_cursor
+        for contact in models.Contact.objects.filter(
+            user=user, provider__mdlive_id__in=conversations
+        ).annotate(provider_mdlive_id=F("provider__mdlive_id"))
+    }
+    latest_positions = {}
+    messages_data = {}
+    for provider_id, conversation in conversations.items():
+        provider_id = int(provider_id)
+        sync_cursor = sync_cursors.get(provider_id)
+        for message_data in conversation:
+            mdlive_id = int(message_data["id"])
+            dt = get_parsed_datetime_from_message_string(message_data["date_time"])
+            position = (dt, mdlive_id)
+            if (
+                provider_id not in latest_positions
+                or position > latest_positions[provider_id]
+            ):
+                latest_positions[provider_id] = position
+            if sync_cursor is not None and position <= sync_cursor:
+                continue
+
+            from_id = int(message_data.get("from_id"))
+            if from_id == user_mdlive_id:
+                message_type = models.Message.USER_MESSAGE
+                provider_mdlive_id = int(message_data.get("to_id"))
+            elif from_id == provider_id:
+                message_type = models.Message.PROVIDER_MESSAGE
+                provider_mdlive_id = from_id
+            else:
+                continue
+            messages_data.setdefault(
+                mdlive_id, (message_type, provider_mdlive_id, message_data, dt)
+            )
+
+    new_messages_data = []
+    if messages_data:
+        existing_mdlive_ids = set(
+            models.Message.objects.filter(mdlive_id__in=messages_data).values_list(
+                "mdlive_id", flat=True
+            )
+        )
+        new_messages_data = [
+            messages_data[mdlive_id]
+            for mdlive_id in sorted(messages_data)
+            if mdlive_id not in existing_mdlive_ids
+        ]
+    cursors_to_advance = {
+        provider_id: position
+        for provider_id, position in latest_positions.items()
+        if sync_cursors.get(provider_id) is None or position > sync_cursors[provider_id]
+    }
+    if not new_messages_data:
+        with transaction.atomic():
+            advance_contacts_sync_cursors(user, cursors_to_advance)
+        return []
+
+    providers = get_or_create_providers(
+        {provider_mdlive_id for _, provider_mdlive_id, _, _ in new_messages_data}
+    )
+    messages, datetimes, user_messages, provider_messages = [], [], [], []
+    for message_type, provider_mdlive_id, message_data, dt in new_messages_data:
+        provider = providers[provider_mdlive_id]
+        message = models.Message(
+            message_type=message_type,
+            subject=message_data.get("subject"),
+            message=message_data.get("message"),
+            mdlive_id=message_data["id"],
+            is_read=not (message_data.get("unread_status")),
+            replied_to_message_id=message_data.get("replied_to_message_id"),
+            reply_allowed=message_data.get("reply_allowed", False),
+            user=user,
+            provider=provider,
+        )
+        messages.append(message)
+        datetimes.append(dt)
+        if message_type == models.Message.USER_MESSAGE:
+            user_messages.append(
+                models.UserMessage(
+                    message=message, message_from=user, message_to=provider
+                )
+            )
+        else:
+            provider_messages.append(
+                models.ProviderMessage(
+                    message=message, message_from=provider, message_to=user
+                )
+            )
+
+    with transaction.atomic():
+        models.Message.objects.bulk_create(messages)
+        # `Message.datetime` is set on insert, so MDLive's datetime is updated afterwards
+        for message, dt in zip(messages, datetimes):
+            message.datetime = dt
+        models.Message.objects.bulk_update(messages, ["datetime"])
+        models.UserMessage.objects.bulk_create(user_messages)
+        models.ProviderMessage.objects.bulk_create(provider_messages)
+        inbox.change_unread_messages_count(
+            user.id,
+            sum(
+                not provider_message.message.is_read
+                for provider_message in provider_messages
+            ),
+        )
+        create_missing_contacts(user, providers.values())
+        advance_contacts_sync_cursors(user, cursors_to_advance)
+    return messages
+
+
+def advance_contacts_sync_cursors(user, positions):
+    """
+    Move sync cursors of user's contacts forward, never backwards
+    Contacts are locked, so concurrent syncs of the same user can't move a cursor back.
+    :param user: users.User object
+    :param positions: dict of provider MDLive id to `(datetime, mdlive_id)` of the
+                      latest synced message
+    :return None
+    """
+    if not positions:
+        return
+    contacts = (
+        models.Contact.objects.select_for_update(of=("self",))
+        .filter(user=user, provider__mdlive_id__in=positions)
+        .annotate(provider_mdlive_id=F("provider__mdlive_id"))
+    )
+    contacts_to_update = []
+    for contact in contacts:
+        position = positions[contact.provider_mdlive_id]
+        if contact.sync_cursor is None or position > contact.sync_cursor:
+            (
+                contact.last_synced_message_at,
+                contact.last_synced_message_mdlive_id,
+            ) = position
+            contacts_to_update.append(contact)
+    models.Contact.objects.bulk_update(
+        contacts_to_update, ["last_synced_message_at", "last_synced_message_mdlive_id"]
+    )
+
+
+def sync_user_messages(user, provider_id, token=None):
     """
     Fetch list of all available messages between user and provider from MDLive
      and store on our end if does not exists
     :param user: users.User object whose messages needs to be synced
     :param provider_id: mdlive.Provider.mdlive_id of provider with whom user messages needs to be synced
-    :return None
+    :param token: MDLive user token, fetched if not given
+    :return list of created mdlive.Message objects
     """
-    token_data = get_mdlive_token_data_for_user(user)
-    token = token_data.get("jwt")
-    headers = get_mdlive_headers(token=token)
-    conversation_url = f"{settings.MDLIVE_URL}/api/v1/patients/{user.mdlive_id}/providers/{provider_id}/conversation"
-    response = requests_get(conversation_url, headers=headers)
-    if response.status_code != 200:
-        raise ValidationError(
-            f"Error from mdlive: {response.status_code} {response.content}"
+    if token is None:
+        token = get_mdlive_token_data_for_user(user).get("jwt")
+    conversations = get_user_conversations(user, [provider_id], token)
+    return save_user_conversations(user, conversations)
+
+
+def sync_user_contacts_and_messages(user):
+    """
+    Sync user's contacts and then messages with all of the contacts from MDLive
+    A single MDLive token is used for all the requests, and conversations with the
+    contacts are fetched concurrently.
+    :param user: users.User object whose messages needs to be synced
+    :return list of created mdlive.Message objects
+    """
+    token = get_mdlive_token_data_for_user(user).get("jwt")
+    sync_user_contacts(user, token=token)
+    provider_ids = set(
+        models.Contact.objects.filter(user=user).values_list(
+            "provider__mdlive_id", flat=True
         )
-    data = json.loads(response.content)
-    messages_data = data.get("messages")
-    if messages_data:
-        for message_data in messages_data:
-            message = models.Message.objects.filter(
-                mdlive_id=message_data.get("id")
-            ).first()
-            # if message exists that means this message and further messages are already synced
-            if message:
-                break
-            from_id = message_data.get("from_id")
-            if int(from_id) == int(user.mdlive_id):
-                create_user_message(message_data, user)
-            if int(from_id) == int(provider_id):
-                create_providers_message(message_data, user)
+    )
+    conversations = get_user_conversations(user, provider_ids, token)
+    return save_user_conversations(user, conversations)
 
 
 def mark_message_read(user, message):
@@ -604,16 +943,15 @@ def mark_message_read(user, message):
     :return None
     """
     token_data = get_mdlive_token_data_for_user(user)
-    token = token_data.get("jwt")
-    headers = get_mdlive_headers(token=token)
-    mark_read_url = f"{settings.MDLIVE_URL}/api/v1/patients/{user.mdlive_id}/messages/{message.mdlive_id}/mark_read"
-    response = requests_put(mark_read_url, headers=headers)
-    if response.status_code != 204:
-        raise ValidationError(
-            f"Error from mdlive: {response.status_code} {response.content}"
-        )
+    get_mdlive_client().mark_message_read(
+        token_data.get("jwt"), user.mdlive_id, message.mdlive_id
+    )
+    marked_count = models.Message.objects.filter(pk=message.pk, is_read=False).update(
+        is_read=True, modified_at=timezone.now()
+    )
     message.is_read = True
-    message.save()
+    if marked_count and message.message_type == models.Message.PROVIDER_MESSAGE:
+        inbox.change_unread_messages_count(message.user_id, -marked_count)
 
 
 def request_appointment(
@@ -641,11 +979,6 @@ def request_appointment(
     :return mdlive response
     """
     token_data = get_mdlive_token_data_for_user(user)
-    token = token_data.get("jwt")
-    headers = get_mdlive_headers(token=token)
-    request_appointment_url = (
-        f"{settings.MDLIVE_URL}/api/v2/patients/{user.mdlive_id}/appointment_requests"
-    )
     data = {
         "appointment_request": {
             "provider_id": provider_id,
@@ -662,14 +995,9 @@ def request_appointment(
         ] = chief_complaint_comments
     if appointment_request_state:
         data["appointment_request"]["state_abbrev"] = appointment_request_state
-    response = requests_post(
-        request_appointment_url, data=json.dumps(data), headers=headers
+    return get_mdlive_client().request_appointment(
+        token_data.get("jwt"), user.mdlive_id, data
     )
-    if response.status_code != 201:
-        raise ValidationError(
-            f"Error from mdlive: {response.status_code} {response.content}"
-        )
-    return json.loads(response.content)
 
 
 def appointment_request_remind(user, appointment_request_id):
@@ -678,18 +1006,9 @@ def appointment_request_remind(user, appointment_request_id):
     :param appointment_request_id: mdlive_id of appointment request
     """
     token_data = get_mdlive_token_data_for_user(user)
-    token = token_data.get("jwt")
-    headers = get_mdlive_headers(token=token)
-    appointment_requests_remind_url = (
-        f"{settings.MDLIVE_URL}/api/v2/patients/{user.mdlive_id}/appointment_requests/"
-        f"{appointment_request_id}/remind"
+    return get_mdlive_client().appointment_request_remind(
+        token_data.get("jwt"), user.mdlive_id, appointment_request_id
     )
-    response = requests_post(appointment_requests_remind_url, headers=headers)
-    if response.status_code != 200:
-        raise ValidationError(
-            f"Error from mdlive: {response.status_code} {response.content}"
-        )
-    return json.loads(response.content)
 
 
 def appointment_request_cancel(user, appointment_request_id):
@@ -698,18 +1017,9 @@ def appointment_request_cancel(user, appointment_request_id):
     :param appointment_request_id: mdlive_id of appointment request
     """
     token_data = get_mdlive_token_data_for_user(user)
-    token = token_data.get("jwt")
-    headers = get_mdlive_headers(token=token)
-    appointment_requests_remind_url = (
-        f"{settings.MDLIVE_URL}/api/v2/patients/{user.mdlive_id}/appointment_requests/"
-        f"{appointment_request_id}/cancel"
+    return get_mdlive_client().appointment_request_cancel(
+        token_data.get("jwt"), user.mdlive_id, appointment_request_id
     )
-    response = requests_post(appointment_requests_remind_url, headers=headers)
-    if response.status_code != 200:
-        raise ValidationError(
-            f"Error from mdlive: {response.status_code} {response.content}"
-        )
-    return json.loads(response.content)
 
 
 def create_webhook():
@@ -717,16 +1027,9 @@ def create_webhook():
     Setup webhook on mdlive based on url defined in settings
     """
     token = get_token_from_keys()
-    headers = get_mdlive_headers(token=token)
     url = f"{settings.MDLIVE_WEBHOOK_BASE_URL}{settings.MDLIVE_WEBHOOK_URL}"
     data = {"webhook": {"url": url}}
-    url = f"{settings.MDLIVE_URL}/api/v1/webhook"
-    response = requests_post(url, data=json.dumps(data), headers=headers)
-    if response.status_code == 201:
-        return json.loads(response.content)
-    raise ValidationError(
-        f"Error from mdlive: {response.status_code} {response.content}"
-    )
+    return get_mdlive_client().create_webhook(token, data)
 
 
 def delete_user_document(user_document):
@@ -737,15 +1040,9 @@ def delete_user_document(user_document):
     if user_document and user_document.mdlive_id:
         user = user_document.user
         token_data = get_mdlive_token_data_for_user(user)
-        token = token_data.get("jwt")
-        headers = get_mdlive_headers(token=token)
-        document_url = f"{settings.MDLIVE_URL}/api/v1/patients/{user.mdlive_id}/documents/{user_document.mdlive_id}"
-        response = requests_delete(document_url, headers=headers)
-        if response.status_code not in [200, 204]:
-            raise ValidationError(
-                f"Error from mdlive: {response.status_code} {response.content}"
-            )
-        return json.loads(response.content)
+        return get_mdlive_client().delete_document(
+            token_data.get("jwt"), user.mdlive_id, user_document.mdlive_id
+        )
     # If it does not exists on MDLive we can delete directly on our end
     return True
 
@@ -779,37 +1076,7 @@ def get_patient_from_mdlive(patient_id, token):
     :param token: Patient specific JWT Auth token for MDLive APIs
     :return: response data from MDLive
     """
-    url = f"{settings.MDLIVE_URL}/api/v2/patients/{patient_id}"
-    headers = get_mdlive_headers(token=token)
-    response = requests_get(url=url, headers=headers)
-
-    response_content = response.content
-    if response_content and hasattr(response, "json") and callable(response.json):
-        response_content = response.json()
-        # removing "affiliation" because it contains a lot of unnecessary text
-        # like MDLive's Privacy Policy, etc.
-        if response_content.get("patient_profile", None):
-            response_content["patient_profile"].pop("affiliation", None)
-    log.info(
-        f"For MDLive ID: {patient_id}. "
-        + f"Response from MDLive while fetching patient's details: {response_content}"
-    )
-
-    if response.status_code == 200:
-        log.info(
-            f"For MDLive ID: {patient_id}. "
-            + "Patient's details retrieved successfully!"
-        )
-        return json.loads(response.content)
-
-    log.info(
-        f"For MDLive ID: {patient_id}. Failed to retrieve Patient's details."
-        + f" {response_content}"
-    )
-    raise ValidationError(
-        "Error while retrieving patient's details from MDLive:"
-        + f" {response.status_code} {response_content}"
-    )
+    return get_mdlive_client().get_patient(token, patient_id)
 
 
 def update_patient_on_mdlive(patient_id, data_to_update, token):
@@ -822,35 +1089,4 @@ def update_patient_on_mdlive(patient_id, data_to_update, token):
     :param token: Patient specific JWT Authorization token for MDLive APIs
     :return: updated patient resource from MDLive
     """
-    url = f"{settings.MDLIVE_URL}/api/v2/patients/{patient_id}"
-    headers = get_mdlive_headers(token=token)
-    headers.update({"Accept": "application/json"})
-    data = {"patient": data_to_update}
-    response = requests_patch(url=url, data=json.dumps(data), headers=headers)
-
-    response_content = response.content
-    if response_content and hasattr(response, "json") and callable(response.json):
-        response_content = response.json()
-        # removing "affiliation" because it contains a lot of unnecessary text
-        # like MDLive's Privacy Policy, etc.
-        if response_content.get("patient_profile", None):
-            response_content["patient_profile"].pop("affiliation", None)
-    log.info(
-        f"For MDLive ID: {patient_id} and request data: {data} "
-        + f"Response from MDLive while updating patient's details: {response_content}"
-    )
-    if response.status_code == 200:
-        log.info(
-            f"For MDLive ID: {patient_id}. "
-            + "Patient's details updated successfully on MDLive!"
-        )
-        return json.loads(response.content)
-
-    log.info(
-        f"For MDLive ID: {patient_id}. Failed to update Patient's details."
-        + f" {response_content}"
-    )
-    raise ValidationError(
-        "Error while updating patient's details on MDLive:"
-        + f" {response.status_code} {response_content}"
-    )
+    return get_mdlive_client().update_patient(token, patient_id, data_to_update)
@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+# Standard Library
+from copy import copy
+
+# Third Party Stuff
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .directory import cache_providers, uncache_providers
+from .models import Provider
+
+
+@receiver(post_save, sender=Provider)
+def recache_provider(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    # Cached objects are shared, so a copy is cached once the row is visible to other
+    # connections
+    provider = copy(instance)
+    transaction.on_commit(lambda: cache_providers([provider]))
+
+
+@receiver(post_delete, sender=Provider)
+def uncache_provider(sender, instance, **kwargs):
+    mdlive_id = instance.mdlive_id
+    transaction.on_commit(lambda: uncache_providers([mdlive_id]))
@@ -4,7 +4,11 @@
 from celery import shared_task
 from requests import ConnectionError, RequestException, Timeout
 
-from .services import get_patient_from_mdlive, update_patient_on_mdlive
+from .services import (
+    get_patient_from_mdlive,
+    refresh_provider_profiles,
+    update_patient_on_mdlive,
+)
 
 
 @shared_task(
@@ -34,3 +38,14 @@ def sync_user_timezone_with_mdlive_timezone_id_task(
             data_to_update=data_to_update,
             token=token,
         )
+
+
+@shared_task(bind=True)
+def refresh_provider_profiles_task(self, mdlive_ids=None):
+    """
+    Task to refresh profiles of providers from MDLive. Runs periodically to refresh
+    a batch of stale profiles, and for providers created while syncing messages.
+
+    :param mdlive_ids: MDLive IDs of the providers, stale ones are picked if not given
+    """
+    refresh_provider_profiles(mdlive_ids=mdlive_ids)
@@ -25,11 +25,27 @@ def create_contact(*args, **kwargs):
 
 
 def create_user_message(*args, **kwargs):
-    return G(UserMessage, **kwargs)
+    user_message = G(UserMessage, **kwargs)
+    set_message_participants(
+        user_message.message, user_message.message_from, user_message.message_to
+    )
+    return user_message
 
 
 def create_provider_message(*args, **kwargs):
-    return G(ProviderMessage, **kwargs)
+    provider_message = G(ProviderMessage, **kwargs)
+    set_message_participants(
+        provider_message.message,
+        provider_message.message_to,
+        provider_message.message_from,
+    )
+    return provider_message
+
+
+def set_message_participants(message, user, provider):
+    message.user = user
+    message.provider = provider
+    message.save(update_fields=["user", "provider"])
 
 
 def get_mocked_mdlive_token_response():
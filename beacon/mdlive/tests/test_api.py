@@ -5,7 +5,6 @@ from collections import namedtuple
 
 # Third Party Stuff
 import pytest
-from django.conf import settings
 from django.urls import reverse
 from django_dynamic_fixture import G
 
@@ -13,6 +12,7 @@ from django_dynamic_fixture import G
 from beacon.answers.services import get_token_for_user_response
 from beacon.answers.tests import factories as answers_f
 from beacon.base.models import SiteConfiguration
+from beacon.mdlive import response_cache
 from beacon.mdlive import services as mdlive_services
 from beacon.users.tests import factories as users_f
 
@@ -26,7 +26,9 @@ def test_fake_user_token(client, mocker):
     url = reverse("mdlive-fake-user-token")
     user_response = answers_f.create_user_response()
     answer_token = get_token_for_user_response(user_response, "authentication")
-    mocked_mdlive_user_token = mocker.patch("beacon.mdlive.services.requests_post")
+    mocked_mdlive_user_token = mocker.patch(
+        "beacon.mdlive.mdlive_api.MDLiveClient.post"
+    )
     mocked_mdlive_user_token.return_value = f.get_mocked_mdlive_token_response()
 
     # should require answer auth
@@ -46,7 +48,9 @@ def test_search_providers(client, mocker):
 
     user_response = answers_f.create_user_response()
     answer_token = get_token_for_user_response(user_response, "authentication")
-    mocked_mdlive_search_provider = mocker.patch("beacon.mdlive.services.requests_post")
+    mocked_mdlive_search_provider = mocker.patch(
+        "beacon.mdlive.mdlive_api.MDLiveClient.post"
+    )
     mocked_mdlive_search_provider.return_value = (
         f.get_mocked_mdlive_providers_search_response()
     )
@@ -80,18 +84,57 @@ def test_search_providers(client, mocker):
     assert response.data.get("providers")[0].get("id") == 642183606
 
 
+def test_search_providers_responses_are_cached(client, mocker):
+    mocker.patch.object(
+        response_cache.constants, "PROVIDER_RESPONSE_STATS_SAMPLE_RATE", 1
+    )
+    url = reverse("mdlive-search-providers")
+    user_response = answers_f.create_user_response()
+    answer_token = get_token_for_user_response(user_response, "authentication")
+    mocked_mdlive_search_provider = mocker.patch(
+        "beacon.mdlive.mdlive_api.MDLiveClient.post"
+    )
+    mocked_mdlive_search_provider.return_value = (
+        f.get_mocked_mdlive_providers_search_response()
+    )
+
+    # Responses are cached per MDLive token, as MDLive checks the token
+    for page, mdlive_token in [
+        (1, "dummy-token"),
+        (1, "dummy-token"),
+        (1, "other-token"),
+        (2, "dummy-token"),
+    ]:
+        response = client.json.post(
+            f"{url}?patient_id=999999&page={page}&mdlive_token={mdlive_token}",
+            data=json.dumps({"state_abbrev": "FL"}),
+            HTTP_AUTHORIZATION="Token {}".format(answer_token),
+        )
+        assert response.status_code == 200
+        assert response.data.get("providers")[0].get("id") == 642183606
+
+    assert mocked_mdlive_search_provider.call_count == 3
+    assert response_cache.get_cache_stats("search_providers") == {
+        "hits": 1,
+        "misses": 3,
+        "hit_rate": 1 / 4,
+    }
+
+
 def test_providers_profile(client, mocker):
     url = reverse("mdlive-providers-profile")
 
     user_response = answers_f.create_user_response()
     answer_token = get_token_for_user_response(user_response, "authentication")
 
-    mocked_mdlive_user_token = mocker.patch("beacon.mdlive.services.requests_post")
+    mocked_mdlive_user_token = mocker.patch(
+        "beacon.mdlive.mdlive_api.MDLiveClient.post"
+    )
     mocked_mdlive_user_token.return_value = f.get_mocked_mdlive_token_response()
 
     data = dict(id=4)
     mocked_mdlive_providers_profile = mocker.patch(
-        "beacon.mdlive.services.requests_get"
+        "beacon.mdlive.mdlive_api.MDLiveClient.get"
     )
     mocked_mdlive_providers_profile.return_value = (
         f.get_mocked_mdlive_provider_profile_response(data)
@@ -129,7 +172,9 @@ def test_user_token(client, mocker):
     user, mdlive_res, cognito_res = users_f.create_user_with_mocked_values()
     mocked_cognito = mocker.patch("beacon.cognito.services.Cognito")
     mocked_cognito.return_value = cognito_res
-    mocked_mdlive_user_token = mocker.patch("beacon.mdlive.services.requests_post")
+    mocked_mdlive_user_token = mocker.patch(
+        "beacon.mdlive.mdlive_api.MDLiveClient.post"
+    )
     mocked_mdlive_user_token.return_value = mdlive_res
 
     # should require auth
@@ -146,7 +191,9 @@ def test_user_token(client, mocker):
 def test_extend_token(client, mocker):
     url = reverse("mdlive-extend-token")
     mocked_data = f.get_mocked_mdlive_token_response()
-    mocked_mdlive_user_token = mocker.patch("beacon.mdlive.services.requests_post")
+    mocked_mdlive_user_token = mocker.patch(
+        "beacon.mdlive.mdlive_api.MDLiveClient.post"
+    )
     mocked_mdlive_user_token.return_value = mocked_data
     user = users_f.create_user()
 
@@ -358,7 +405,7 @@ def test_get_contacts_api(client):
     assert response.data[1].get("id") == provider.mdlive_id
 
 
-def test_message_mark_read(client, mocker):
+def test_message_mark_read(client, mocker, django_capture_on_commit_callbacks):
     user = users_f.create_user()
     provider = f.create_provider()
     provider2 = f.create_provider()
@@ -373,12 +420,14 @@ def test_message_mark_read(client, mocker):
 
     url = reverse("messages-mark-read", kwargs={"mdlive_id": message2.mdlive_id})
     unread_message_count_url = reverse("messages-unread-messages-count")
-    mocked_mdlive_user_token = mocker.patch("beacon.mdlive.services.requests_post")
+    mocked_mdlive_user_token = mocker.patch(
+        "beacon.mdlive.mdlive_api.MDLiveClient.post"
+    )
     mocked_mdlive_user_token.return_value = f.get_mocked_mdlive_token_response()
     mdlive_response = namedtuple("mdlive_response", ["status_code", "content"])
     mdlive_res = mdlive_response(204, None)
     mocked_mdlive_message_mark_read = mocker.patch(
-        "beacon.mdlive.services.requests_put"
+        "beacon.mdlive.mdlive_api.MDLiveClient.put"
     )
     mocked_mdlive_message_mark_read.return_value = mdlive_res
 
@@ -391,7 +440,8 @@ def test_message_mark_read(client, mocker):
     assert response.status_code == 200
     assert response.data.get("count") == 2
 
-    response = client.json.put(url)
+    with django_capture_on_commit_callbacks(execute=True):
+        response = client.json.put(url)
     message2.refresh_from_db()
     assert response.status_code == 204
     assert mocked_mdlive_message_mark_read.called
@@ -414,15 +464,12 @@ def test_create_message(client, mocker):
     ) = f.get_mocked_mdlive_create_messages_response(user, data)
 
     def my_side_effect(*args, **kwargs):
-        if (
-            args[0]
-            == f"{settings.MDLIVE_URL}/api/v1/patients/{user.mdlive_id}/messages"
-        ):
+        if args[0] == f"/api/v1/patients/{user.mdlive_id}/messages":
             return create_message_res
-        elif args[0] == f"{settings.MDLIVE_URL}/api/v1/sso_auth/auth_token":
+        elif args[0] == "/api/v1/sso_auth/auth_token":
             return f.get_mocked_mdlive_token_response()
 
-    mocked_mdlive = mocker.patch("beacon.mdlive.services.requests_post")
+    mocked_mdlive = mocker.patch("beacon.mdlive.mdlive_api.MDLiveClient.post")
     mocked_mdlive.side_effect = my_side_effect
 
     message_data = {
@@ -466,7 +513,7 @@ def test_webhook(client, mocker):
     url = reverse("messages-webhook")
     user = users_f.create_user()
     mocked_sync_user_messages = mocker.patch(
-        "beacon.mdlive.api.sync_user_mdlive_messages.delay"
+        "beacon.mdlive.api.schedule_user_mdlive_messages_sync"
     )
     data = {
         "event": {
@@ -496,19 +543,21 @@ def test_webhook(client, mocker):
 def test_sync_user_messages_service(client, mocker):
     user = users_f.create_user()
     provider_id = 642183606
-    mocked_mdlive_user_token = mocker.patch("beacon.mdlive.services.requests_post")
+    mocked_mdlive_user_token = mocker.patch(
+        "beacon.mdlive.mdlive_api.MDLiveClient.post"
+    )
     mocked_mdlive_user_token.return_value = f.get_mocked_mdlive_token_response()
 
     def my_side_effect(*args, **kwargs):
         if (
             args[0]
-            == f"{settings.MDLIVE_URL}/api/v1/patients/{user.mdlive_id}/providers/{provider_id}/conversation"
+            == f"/api/v1/patients/{user.mdlive_id}/providers/{provider_id}/conversation"
         ):
             return f.get_mocked_mdlive_messages_response(user)
-        elif args[0] == f"{settings.MDLIVE_URL}/api/v2/providers/{provider_id}/profile":
+        elif args[0] == f"/api/v2/providers/{provider_id}/profile":
             return f.get_mocked_mdlive_provider_profile_response()
 
-    mocked_mdlive = mocker.patch("beacon.mdlive.services.requests_get")
+    mocked_mdlive = mocker.patch("beacon.mdlive.mdlive_api.MDLiveClient.get")
     mocked_mdlive.side_effect = my_side_effect
     G(SiteConfiguration, fake_patient={"first_name": "User01"})
 
@@ -519,7 +568,8 @@ def test_sync_user_messages_service(client, mocker):
 
     mdlive_services.sync_user_messages(user, provider_id)
     assert mocked_mdlive_user_token.called
-    assert mocked_mdlive.call_count == 2
+    # Provider's profile isn't fetched while syncing
+    assert mocked_mdlive.call_count == 1
     assert Message.objects.first() is not None
     assert Contact.objects.first() is not None
     assert Provider.objects.first() is not None
@@ -529,20 +579,19 @@ def test_sync_user_messages_service(client, mocker):
 def test_sync_contacts_service(client, mocker):
     user = users_f.create_user()
     provider_id = 642183606
-    mocked_mdlive_user_token = mocker.patch("beacon.mdlive.services.requests_post")
+    mocked_mdlive_user_token = mocker.patch(
+        "beacon.mdlive.mdlive_api.MDLiveClient.post"
+    )
     mocked_mdlive_user_token.return_value = f.get_mocked_mdlive_token_response()
 
     def my_side_effect(*args, **kwargs):
-        if (
-            args[0]
-            == f"{settings.MDLIVE_URL}/api/v1/patients/{user.mdlive_id}/messages/contacts"
-        ):
+        if args[0] == f"/api/v1/patients/{user.mdlive_id}/messages/contacts":
             return f.get_mocked_mdlive_contacts_response()
-        elif args[0] == f"{settings.MDLIVE_URL}/api/v2/providers/{provider_id}/profile":
+        elif args[0] == f"/api/v2/providers/{provider_id}/profile":
             data = {"id": provider_id}
             return f.get_mocked_mdlive_provider_profile_response(data)
 
-    mocked_mdlive = mocker.patch("beacon.mdlive.services.requests_get")
+    mocked_mdlive = mocker.patch("beacon.mdlive.mdlive_api.MDLiveClient.get")
     mocked_mdlive.side_effect = my_side_effect
 
     assert Contact.objects.first() is None
@@ -550,7 +599,7 @@ def test_sync_contacts_service(client, mocker):
 
     mdlive_services.sync_user_contacts(user)
     assert mocked_mdlive_user_token.called
-    assert mocked_mdlive.call_count == 2
+    assert mocked_mdlive.call_count == 1
     assert Contact.objects.first() is not None
     assert Provider.objects.first() is not None
 
@@ -566,7 +615,7 @@ def test_create_appointment_slot_queries(client, mocker):
         "appointment_request": {"id": 123456}
     }
     patched_mdlive_task = mocker.patch(
-        "beacon.mdlive.api.sync_user_mdlive_messages.delay"
+        "beacon.mdlive.api.schedule_user_mdlive_messages_sync"
     )
     patched_send_user_data_to_scc = mocker.patch(
         "beacon.mdlive.api.send_user_data_to_scc_if_non_f2f"
@@ -1,24 +1,36 @@
 # -*- coding: utf-8 -*-
 
 # Standard Library
+import base64
 import json
+import threading
+import time
+from io import BytesIO
 from unittest.mock import Mock
 
 # Third Party Stuff
 import pytest
 from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.utils import timezone
+from PIL import Image
+from rest_framework.exceptions import ValidationError
 
 # beacon Stuff
 from beacon.users.tests import factories as users_f
 
-from .. import services, tasks
+from .. import directory, inbox, response_cache, services, tasks, timezones
+from ..mdlive_api import MDLiveClient
+from ..models import Contact, Message, Provider, ProviderMessage, UserMessage
+from . import factories as f
 
 pytestmark = pytest.mark.django_db
 
 
 def test_sync_timezone_id_with_mdlive_if_different(client, mocker):
-    mocked_requests_get = mocker.patch("beacon.mdlive.services.requests_get")
-    mocked_requests_patch = mocker.patch("beacon.mdlive.services.requests_patch")
+    mocked_requests_get = mocker.patch("beacon.mdlive.mdlive_api.MDLiveClient.get")
+    mocked_requests_patch = mocker.patch("beacon.mdlive.mdlive_api.MDLiveClient.patch")
     response_content = {"patient_profile": {"us_time_zone_id": 1}}
     mocked_response = Mock(
         status_code=200,
@@ -43,26 +55,27 @@ def test_sync_timezone_id_with_mdlive_if_different(client, mocker):
         token=md_live_token,
     )
 
-    url = f"{settings.MDLIVE_URL}/api/v2/patients/{patient_id}"
+    uri = f"/api/v2/patients/{patient_id}"
     request_headers = services.get_mdlive_headers(token=md_live_token)
     patch_request_data = json.dumps(
         {"patient": {"us_time_zone_id": timezone_id_to_update}}
     )
 
-    mocked_requests_get.assert_called_with(url=url, headers=request_headers)
+    mocked_requests_get.assert_called_with(uri, "get_patient", headers=request_headers)
     # Since AZT and EST are different, MDLive's PATCH API will be called to
     # update patient on MDLive.
     request_headers.update({"Accept": "application/json"})
     mocked_requests_patch.assert_called_with(
-        url=url,
+        uri,
+        "update_patient",
         headers=request_headers,
         data=patch_request_data,
     )
 
 
 def test_do_not_sync_timezone_id_with_mdlive_if_same(client, mocker):
-    mocked_requests_get = mocker.patch("beacon.mdlive.services.requests_get")
-    mocked_requests_patch = mocker.patch("beacon.mdlive.services.requests_patch")
+    mocked_requests_get = mocker.patch("beacon.mdlive.mdlive_api.MDLiveClient.get")
+    mocked_requests_patch = mocker.patch("beacon.mdlive.mdlive_api.MDLiveClient.patch")
     response_content = {"patient_profile": {"us_time_zone_id": 1}}
     mocked_response = Mock(
         status_code=200,
@@ -87,9 +100,407 @@ def test_do_not_sync_timezone_id_with_mdlive_if_same(client, mocker):
         token=md_live_token,
     )
 
-    url = f"{settings.MDLIVE_URL}/api/v2/patients/{patient_id}"
+    uri = f"/api/v2/patients/{patient_id}"
     request_headers = services.get_mdlive_headers(token=md_live_token)
 
-    mocked_requests_get.assert_called_with(url=url, headers=request_headers)
+    mocked_requests_get.assert_called_with(uri, "get_patient", headers=request_headers)
     # Since timezone ID to update is same `1`, so no need to update on MDLive
     mocked_requests_patch.assert_not_called()
+
+
+def test_mdlive_user_token_is_cached_until_profile_changes(mocker):
+    mocked_requests_post = mocker.patch("beacon.mdlive.mdlive_api.MDLiveClient.post")
+    mocked_requests_post.return_value = Mock(
+        status_code=200,
+        content=b'{"jwt": "token", "user": {"id": 1, "time_to_live_minutes": 60}}',
+    )
+    user = users_f.create_user()
+
+    token_data = services.get_mdlive_token_data_for_user(user)
+    assert token_data["jwt"] == "token"
+    assert services.get_mdlive_token_data_for_user(user) == token_data
+    assert mocked_requests_post.call_count == 1
+
+    # Changes in the synced profile data request a new token
+    user.city = "New City"
+    services.get_mdlive_token_data_for_user(user)
+    assert mocked_requests_post.call_count == 2
+    assert json.loads(mocked_requests_post.call_args[1]["data"])["auth"]["city"] == (
+        "New City"
+    )
+
+    services.get_mdlive_token_data_for_user(user, refresh=True)
+    assert mocked_requests_post.call_count == 3
+
+
+def test_mdlive_client_uses_timeouts_and_decodes_responses(mocker):
+    metrics_log = mocker.patch("beacon.mdlive.mdlive_api.metrics_log")
+    session = Mock()
+    session.request.return_value = Mock(status_code=200, content=b'{"contacts": []}')
+    client = MDLiveClient(base_url="https://mdlive.test", session=session)
+
+    assert client.get_contacts("token", 1) == {"contacts": []}
+    session.request.assert_called_once_with(
+        "GET",
+        "https://mdlive.test/api/v1/patients/1/messages/contacts",
+        headers=client.get_headers(token="token"),
+        timeout=(settings.MDLIVE_CONNECT_TIMEOUT, settings.MDLIVE_READ_TIMEOUT),
+    )
+    metrics = metrics_log.info.call_args[1]["extra"]
+    assert metrics["endpoint"] == "get_contacts"
+    assert metrics["status_code"] == 200
+
+    session.request.return_value = Mock(status_code=500, content=b"error")
+    with pytest.raises(ValidationError):
+        client.get_contacts("token", 1)
+
+
+def test_mdlive_client_session_retries_only_idempotent_requests():
+    session = MDLiveClient.get_session()
+    retry = session.get_adapter("https://mdlive.test").max_retries
+    assert retry.total == settings.MDLIVE_MAX_RETRIES
+    assert retry.is_retry("GET", 503)
+    assert not retry.is_retry("POST", 503)
+
+
+def test_sync_user_contacts_and_messages_in_bulk(mocker):
+    user = users_f.create_user()
+    provider_ids = [642183606, 642183607]
+    existing_provider = Provider.objects.create(
+        mdlive_id=provider_ids[0], fullname="Travis Stork"
+    )
+    Message.objects.create(
+        mdlive_id=1, message_type=Message.PROVIDER_MESSAGE, subject="Synced"
+    )
+    mocked_post = mocker.patch("beacon.mdlive.mdlive_api.MDLiveClient.post")
+    mocked_post.return_value = f.get_mocked_mdlive_token_response()
+
+    def get_message(message_id, from_id, to_id):
+        return {
+            "id": message_id,
+            "date_time": "2019-12-11T08:48:12-05:00",
+            "from_id": from_id,
+            "to_id": to_id,
+            "subject": "Hello",
+            "message": "Hello!",
+            "unread_status": True,
+        }
+
+    conversations = {
+        provider_ids[0]: [
+            get_message(3, provider_ids[0], user.mdlive_id),
+            get_message(2, user.mdlive_id, provider_ids[0]),
+            get_message(1, provider_ids[0], user.mdlive_id),
+        ],
+        provider_ids[1]: [get_message(4, provider_ids[1], user.mdlive_id)],
+    }
+
+    def my_side_effect(*args, **kwargs):
+        if args[0] == f"/api/v1/patients/{user.mdlive_id}/messages/contacts":
+            return f.get_mocked_mdlive_contacts_response(
+                [{"id": provider_id} for provider_id in provider_ids]
+            )
+        for provider_id in provider_ids:
+            if args[0] == (
+                f"/api/v1/patients/{user.mdlive_id}/providers/{provider_id}/conversation"
+            ):
+                return f.get_mocked_mdlive_messages_response(
+                    user, conversations[provider_id]
+                )
+            if args[0] == f"/api/v2/providers/{provider_id}/profile":
+                return f.get_mocked_mdlive_provider_profile_response()
+
+    mocked_get = mocker.patch("beacon.mdlive.mdlive_api.MDLiveClient.get")
+    mocked_get.side_effect = my_side_effect
+
+    messages = services.sync_user_contacts_and_messages(user)
+
+    # One token, contacts and two conversations
+    assert mocked_post.call_count == 1
+    assert mocked_get.call_count == 3
+    assert sorted(message.mdlive_id for message in messages) == [2, 3, 4]
+    assert Provider.objects.count() == 2
+    assert Contact.objects.filter(user=user).count() == 2
+    assert UserMessage.objects.get(message__mdlive_id=2).message_to == existing_provider
+    assert ProviderMessage.objects.filter(message_to=user).count() == 2
+    message = Message.objects.get(mdlive_id=4)
+    assert message.datetime.isoformat() == "2019-12-11T13:48:12+00:00"
+
+    contact = Contact.objects.get(user=user, provider=existing_provider)
+    assert contact.last_synced_message_mdlive_id == 3
+
+    # Nothing is created when messages are already synced
+    assert services.sync_user_contacts_and_messages(user) == []
+    assert Message.objects.count() == 4
+
+
+def test_sync_user_messages_skips_messages_up_to_contact_sync_cursor(mocker):
+    user = users_f.create_user()
+    provider = Provider.objects.create(mdlive_id=642183606, fullname="Travis Stork")
+    cursor_at = services.get_parsed_datetime_from_message_string(
+        "2019-12-11T08:48:12-05:00"
+    )
+    contact = Contact.objects.create(
+        user=user,
+        provider=provider,
+        last_synced_message_mdlive_id=3,
+        last_synced_message_at=cursor_at,
+    )
+    mocked_post = mocker.patch("beacon.mdlive.mdlive_api.MDLiveClient.post")
+    mocked_post.return_value = f.get_mocked_mdlive_token_response()
+    mocked_get = mocker.patch("beacon.mdlive.mdlive_api.MDLiveClient.get")
+    mocked_get.return_value = f.get_mocked_mdlive_messages_response(
+        user,
+        [
+            {
+                "id": message_id,
+                "date_time": date_time,
+                "from_id": provider.mdlive_id,
+                "to_id": user.mdlive_id,
+                "subject": "Hello",
+                "message": "Hello!",
+                "unread_status": True,
+            }
+            for message_id, date_time in [
+                (5, "2019-12-12T08:48:12-05:00"),
+                (3, "2019-12-11T08:48:12-05:00"),
+                (1, "2019-12-10T08:48:12-05:00"),
+            ]
+        ],
+    )
+
+    messages = services.sync_user_messages(user, provider.mdlive_id)
+
+    # Messages up to the cursor are neither looked up nor created
+    assert [message.mdlive_id for message in messages] == [5]
+    assert not Message.objects.filter(mdlive_id=1).exists()
+    contact.refresh_from_db()
+    assert contact.last_synced_message_mdlive_id == 5
+    assert contact.last_synced_message_at > cursor_at
+
+
+def test_unread_messages_count_is_kept_up_to_date(
+    mocker, django_assert_num_queries, django_capture_on_commit_callbacks
+):
+    user = users_f.create_user()
+    provider = Provider.objects.create(mdlive_id=642183606, fullname="Travis Stork")
+    mocked_post = mocker.patch("beacon.mdlive.mdlive_api.MDLiveClient.post")
+    mocked_post.return_value = f.get_mocked_mdlive_token_response()
+    mocked_get = mocker.patch("beacon.mdlive.mdlive_api.MDLiveClient.get")
+    mocked_get.return_value = f.get_mocked_mdlive_messages_response(
+        user,
+        [
+            {
+                "id": message_id,
+                "date_time": "2019-12-12T08:48:12-05:00",
+                "from_id": provider.mdlive_id,
+                "to_id": user.mdlive_id,
+                "subject": "Hello",
+                "message": "Hello!",
+                "unread_status": unread_status,
+            }
+            for message_id, unread_status in [(1, True), (2, True), (3, False)]
+        ],
+    )
+    assert inbox.get_unread_messages_count(user.id) == 0
+
+    with django_capture_on_commit_callbacks(execute=True):
+        messages = services.sync_user_messages(user, provider.mdlive_id)
+    assert {(message.user, message.provider) for message in messages} == {
+        (user, provider)
+    }
+    with django_assert_num_queries(0):
+        assert inbox.get_unread_messages_count(user.id) == 2
+
+    mocked_put = mocker.patch("beacon.mdlive.mdlive_api.MDLiveClient.put")
+    mocked_put.return_value = Mock(status_code=204)
+    message = Message.objects.get(mdlive_id=1)
+    with django_capture_on_commit_callbacks(execute=True):
+        services.mark_message_read(user, message)
+        # Marking an already read message doesn't change the count
+        services.mark_message_read(user, message)
+    with django_assert_num_queries(0):
+        assert inbox.get_unread_messages_count(user.id) == 1
+    assert inbox.count_unread_messages(user.id) == 1
+
+
+def test_provider_directory_caches_lookups_and_skips_unchanged_upserts(
+    django_assert_num_queries,
+):
+    provider = Provider.objects.create(
+        mdlive_id=642183606, fullname="Travis Stork", speciality="Psychiatry"
+    )
+    assert directory.get_providers([provider.mdlive_id]) == {
+        provider.mdlive_id: provider
+    }
+    with django_assert_num_queries(0):
+        directory.get_providers([provider.mdlive_id])
+        directory.upsert_providers({provider.mdlive_id: {"speciality": "Psychiatry"}})
+
+    directory.local_providers.clear()
+    with django_assert_num_queries(1):
+        providers, created_mdlive_ids = directory.upsert_providers(
+            {provider.mdlive_id: {"speciality": "Therapy"}}
+        )
+    assert created_mdlive_ids == []
+    provider.refresh_from_db()
+    assert provider.speciality == "Therapy"
+
+
+def test_provider_directory_follows_saved_and_deleted_providers(
+    django_capture_on_commit_callbacks,
+):
+    provider = Provider.objects.create(
+        mdlive_id=642183606, fullname="Travis Stork", speciality="Psychiatry"
+    )
+    directory.get_providers([provider.mdlive_id])
+
+    # Edits made through the admin
+    provider.speciality = "Therapy"
+    with django_capture_on_commit_callbacks(execute=True):
+        provider.save()
+    cached = directory.get_providers([provider.mdlive_id])[provider.mdlive_id]
+    assert cached.speciality == "Therapy"
+    directory.local_providers.clear()
+    cached = directory.get_providers([provider.mdlive_id])[provider.mdlive_id]
+    assert cached.speciality == "Therapy"
+
+    with django_capture_on_commit_callbacks(execute=True):
+        provider.delete()
+    assert directory.get_providers([642183606]) == {}
+
+
+def test_refresh_provider_profiles_of_stale_providers(mocker):
+    stale_provider = Provider.objects.create(mdlive_id=642183606, fullname="")
+    Provider.objects.create(
+        mdlive_id=642183607, fullname="Jane Doe", profile_synced_at=timezone.now()
+    )
+    mocked_get = mocker.patch("beacon.mdlive.mdlive_api.MDLiveClient.get")
+    mocked_get.return_value = f.get_mocked_mdlive_provider_profile_response()
+
+    assert services.refresh_provider_profiles() == [stale_provider.mdlive_id]
+    assert mocked_get.call_count == 1
+    stale_provider.refresh_from_db()
+    assert stale_provider.fullname == "Travis Stork"
+    assert stale_provider.profile_synced_at is not None
+
+
+def get_base64_photo(color="red"):
+    photo = BytesIO()
+    Image.new("RGB", (400, 400), color=color).save(photo, format="JPEG")
+    return base64.b64encode(photo.getvalue()).decode()
+
+
+def test_contact_photos_are_saved_to_storage_once(mocker):
+    photo = get_base64_photo()
+    contact_data = {
+        "id": 642183606,
+        "fullname": "Travis Stork",
+        "specialty": "General Practice",
+        "provider_card": {"photo_in_binary_data": photo, "photo_format": "jpg"},
+    }
+    mocked_save_photo = mocker.spy(services, "save_provider_photo")
+
+    provider = services.get_or_create_provider(642183606, contact_data)
+    provider.refresh_from_db()
+    assert provider.photo.name.endswith(".jpg")
+    assert provider.photo_in_binary_data is None
+    assert services.get_or_create_provider(642183606, contact_data) == provider
+    assert mocked_save_photo.call_count == 1
+
+
+def test_migrate_provider_photos_command():
+    provider = Provider.objects.create(
+        mdlive_id=642183606,
+        fullname="Travis Stork",
+        photo_in_binary_data=get_base64_photo(),
+        photo_format="jpg",
+    )
+    invalid_provider = Provider.objects.create(
+        mdlive_id=642183607, fullname="Jane Doe", photo_in_binary_data="invalid...."
+    )
+
+    call_command("migrate_provider_photos", chunk_size=1)
+
+    provider.refresh_from_db()
+    invalid_provider.refresh_from_db()
+    assert provider.photo and provider.photo_in_binary_data is None
+    assert not invalid_provider.photo and invalid_provider.photo_checksum
+    assert not Provider.objects.filter(photo_in_binary_data__isnull=False).exists()
+
+
+def test_concurrent_identical_queries_are_coalesced(mocker):
+    mocker.patch.object(
+        response_cache.constants, "PROVIDER_RESPONSE_STATS_SAMPLE_RATE", 1
+    )
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        time.sleep(0.2)
+        return {"providers": []}
+
+    responses = []
+    threads = [
+        threading.Thread(
+            target=lambda: responses.append(
+                response_cache.get_cached_response(
+                    "search_providers", {"page": 1}, "token", fetch
+                )
+            )
+        )
+        for _ in range(3)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert responses == [{"providers": []}] * 3
+    assert response_cache.get_cache_stats("search_providers")["hits"] == 2
+
+
+def test_queries_being_fetched_return_stale_response_or_fail(mocker):
+    mocker.patch.object(response_cache.constants, "PROVIDER_RESPONSE_WAIT_TIMEOUT", 0.1)
+    fetch = mocker.Mock(return_value={"providers": []})
+    key = response_cache.get_response_cache_key("search_providers", {}, "token")
+    cache.add(f"{key}:lock", 1)
+
+    # Request fetching the query is stuck, others don't call MDLive as well
+    with pytest.raises(ValidationError):
+        response_cache.get_cached_response("search_providers", {}, "token", fetch)
+    assert not fetch.called
+
+    cache.set(f"{key}:stale", {"providers": [1]})
+    assert response_cache.get_cached_response(
+        "search_providers", {}, "token", fetch
+    ) == {"providers": [1]}
+    assert not fetch.called
+
+
+def test_expired_query_lock_of_another_request_is_kept():
+    key = response_cache.get_response_cache_key("search_providers", {}, "token")
+
+    def fetch():
+        # Lock expired while fetching and another request acquired it
+        cache.set(f"{key}:lock", "other-request")
+        return {"providers": []}
+
+    response_cache.get_cached_response("search_providers", {}, "token", fetch)
+    assert cache.get(f"{key}:lock") == "other-request"
+
+
+@pytest.mark.parametrize(
+    "zip_code, time_zone",
+    [
+        ("99501", "America/Anchorage"),
+        ("60601", "America/Chicago"),
+        (85001, "America/Phoenix"),
+        ("10001", "America/New_York"),
+        ("00000", "America/New_York"),
+    ],
+)
+def test_timezone_from_zip_matches_resolved_timezone(zip_code, time_zone):
+    assert services.get_timezone_from_zip(zip_code) == time_zone
+    assert timezones.resolve_timezone_from_zip(zip_code) == time_zone
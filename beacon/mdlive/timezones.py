@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""
+Zip code to timezone resolution.
+
+Looking up a zip code's coordinates in `pyzipcode` and then the timezone at those
+coordinates with `TimezoneFinder` is slow, and constructing a `TimezoneFinder` loads
+its polygon data. Instead, the timezone of every zip code is precomputed with those
+libraries by `build_zip_timezones` command into `data/zip_timezones.json`, which is
+loaded once per process. Only zip codes with an allowed timezone other than the
+default one are stored, so a lookup is a single dictionary hit.
+"""
+# Standard Library
+import json
+import os
+import threading
+
+# Third Party Stuff
+from pyzipcode import ZipCodeDatabase
+from timezonefinder import TimezoneFinder
+
+# beacon Stuff
+from beacon.users.choices import ALLOWED_TIMEZONES
+
+DEFAULT_TIMEZONE = "America/New_York"
+ZIP_TIMEZONES_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "data", "zip_timezones.json"
+)
+
+_zip_timezones_lock = threading.Lock()
+_zip_timezones = None
+
+
+def normalize_zip_code(zip_code):
+    return str(zip_code).strip()
+
+
+def resolve_timezone_from_zip(zip_code, zip_code_db=None, timezone_finder=None):
+    """
+    Return allowed timezone at the zip code's location, using `pyzipcode` and
+    `TimezoneFinder` directly. Used to build the precomputed table.
+    """
+    zip_code_db = zip_code_db or ZipCodeDatabase()
+    try:
+        zip_code_data = zip_code_db[normalize_zip_code(zip_code)]
+    except KeyError:
+        zip_code_data = None
+    if zip_code_data:
+        timezone_finder = timezone_finder or TimezoneFinder()
+        try:
+            time_zone = timezone_finder.timezone_at(
+                lng=zip_code_data.longitude, lat=zip_code_data.latitude
+            )
+        except ValueError:
+            time_zone = None
+        if time_zone in ALLOWED_TIMEZONES:
+            return time_zone
+    return DEFAULT_TIMEZONE
+
+
+def build_zip_timezones():
+    """Return mapping of timezone to sorted zip codes, for non default timezones."""
+    zip_code_db = ZipCodeDatabase()
+    timezone_finder = TimezoneFinder()
+    zip_timezones = {}
+    for zip_code, _ in zip_code_db.items():
+        time_zone = resolve_timezone_from_zip(
+            zip_code, zip_code_db=zip_code_db, timezone_finder=timezone_finder
+        )
+        if time_zone != DEFAULT_TIMEZONE:
+            zip_timezones.setdefault(time_zone, []).append(zip_code)
+    return {
+        time_zone: sorted(zip_codes)
+        for time_zone, zip_codes in sorted(zip_timezones.items())
+    }
+
+
+def load_zip_timezones(path=ZIP_TIMEZONES_PATH):
+    """Return mapping of zip code to timezone from the precomputed table."""
+    with open(path) as f:
+        data = json.load(f)
+    return {
+        zip_code: time_zone
+        for time_zone, zip_codes in data.items()
+        for zip_code in zip_codes
+    }
+
+
+def get_zip_timezones():
+    """Return the process wide zip code to timezone mapping, loading it if needed."""
+    global _zip_timezones
+    if _zip_timezones is None:
+        with _zip_timezones_lock:
+            if _zip_timezones is None:
+                _zip_timezones = load_zip_timezones()
+    return _zip_timezones
+
+
+def get_timezone_from_zip(zip_code):
+    # By Default EST timezone will be returned.
+    return get_zip_timezones().get(normalize_zip_code(zip_code), DEFAULT_TIMEZONE)
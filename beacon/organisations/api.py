@@ -20,7 +20,7 @@ from .models import (
     HomepageNavSubCategory,
     Organisation,
 )
-from .services import get_organisation,get_organisation_new
+from .services import get_organisation, get_organisation_new
 
 
 class OrganisationsViewset(ListModelMixin, GenericViewSet):
@@ -30,15 +30,23 @@ class OrganisationsViewset(ListModelMixin, GenericViewSet):
     authentication_classes = ()
     permission_classes = ()
 
-    def filter_queryset(self, queryset):
-        organisation_qs = super().filter_queryset(queryset)
-        if self.action == "list":
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in ["list", "typeahead"]:
             # Beacon team adds "DO NOT USE" in the title of Parent Organisation that
             # has any valid children. This org title then becomes visible on FE
             # webpage as the org title. So they asked us to not return parent
             # organisations if they have children.
-            return organisation_qs.exclude(children__isnull=False)
-        return organisation_qs
+            return queryset.filter(has_children=False)
+        return queryset
+
+    @action(methods=["GET"], detail=False, url_path="typeahead")
+    def typeahead(self, request):
+        """Ranked organisations matching a partially typed `search_term`, unpaginated."""
+        queryset = filters.TypeaheadSearchFilter().filter_queryset(
+            request, self.get_queryset(), self
+        )
+        return response.Ok(self.get_serializer(queryset, many=True).data)
 
 
 class OrganisationConfigurationView(GenericAPIView):
@@ -51,7 +59,7 @@ class OrganisationConfigurationView(GenericAPIView):
         :param request:
         :return:
         """
-        organisation, domain = get_organisation(request, queryset=self.get_queryset())
+        organisation, domain = get_organisation(request)
         if organisation:
             return response.Ok(self.get_serializer(organisation).data)
         raise ValidationError('No organisation exists for "{}"!'.format(domain))
@@ -114,6 +122,8 @@ class HomepageNavViewSet(MultipleSerializerMixin, ListModelMixin, GenericViewSet
         return response.Ok(
             serializer_class(categories, many=True, context=context).data
         )
+
+
 class OrganisationConfigurationView2(GenericAPIView):
     permission_classes = (AllowAny,)
     serializer_class = serializers.OrganisationSerializer
@@ -125,11 +135,9 @@ class OrganisationConfigurationView2(GenericAPIView):
         :return:
         """
 
-
-        organisation, domain = get_organisation_new(request,
-                                                    queryset=self.get_queryset().filter(
-                                                        domain__regex=request.GET.get('domain')),
-                                                    domain=request.GET.get('domain'))
+        organisation, domain = get_organisation_new(
+            request, queryset=self.get_queryset(), domain=request.GET.get("domain")
+        )
 
         if organisation:
             return response.Ok(self.get_serializer(organisation).data)
@@ -9,3 +9,10 @@ ORG_DEACTIVATION_CHOICES = Choices(
     ("DUPLICATED_ORG", "duplicate_org", "Duplicate org"),
     ("REGISTERED_IN_ERROR", "registered_in_error", "Registered in error"),
 )
+
+# Ordered by precedence of the lookup, see `services.get_organisation_by_domain_alias`
+DOMAIN_ALIAS_KIND_CHOICES = Choices(
+    ("DOMAIN", 0, "Domain"),
+    ("SLUG", 1, "Slug"),
+    ("PATH", 2, "Path"),
+)
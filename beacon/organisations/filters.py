@@ -6,6 +6,8 @@ from django.contrib.postgres.search import SearchQuery
 from rest_framework import filters
 from rest_framework.exceptions import ValidationError
 
+from .search import typeahead_search
+
 
 class FullTextSearchFilter(filters.BaseFilterBackend):
     """
@@ -23,3 +25,25 @@ class FullTextSearchFilter(filters.BaseFilterBackend):
         search_term = unquote(search_term)
         search_query = SearchQuery(value=search_term, config="pg_catalog.english")
         return queryset.filter(search_vector=search_query)
+
+
+class TypeaheadSearchFilter(filters.BaseFilterBackend):
+    """
+    Query best matches of partially typed `search_term`, at most `limit` of them
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        search_term = request.query_params.get("search_term", None)
+        if search_term is None:
+            raise ValidationError("Query parameter search_term is required.")
+        search_term = unquote(search_term).strip()
+        if len(search_term) < settings.ORG_TYPEAHEAD_SEARCH_TERM_CHAR_LIMIT:
+            raise ValidationError(
+                f"search_term should be at least {settings.ORG_TYPEAHEAD_SEARCH_TERM_CHAR_LIMIT} char(s) long."
+            )
+        limit = settings.ORG_TYPEAHEAD_RESULT_LIMIT
+        try:
+            limit = min(int(request.query_params.get("limit", limit)), limit)
+        except ValueError:
+            raise ValidationError("Query parameter limit should be a number.")
+        return typeahead_search(queryset, search_term, max(limit, 1))
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+# Standard Library
+import random
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from beacon.organisations.models import Organisation
+from beacon.organisations.search import typeahead_search
+
+WORDS = [
+    "acme",
+    "beacon",
+    "care",
+    "county",
+    "global",
+    "health",
+    "holdings",
+    "industries",
+    "logistics",
+    "medical",
+    "partners",
+    "school",
+    "services",
+    "systems",
+    "university",
+    "wellbeing",
+]
+CITIES = ["Boston", "Chicago", "Denver", "Houston", "London", "Miami", "New York"]
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure latency of the typeahead organisation search against generated "
+        "organisations, which are rolled back afterwards"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--count",
+            type=int,
+            default=50000,
+            help="Number of organisations to generate",
+        )
+        parser.add_argument(
+            "--queries",
+            type=int,
+            default=500,
+            help="Number of search terms to measure",
+        )
+
+    def handle(self, *args, **options):
+        rng = random.Random(0)
+        with transaction.atomic():
+            titles = self.create_organisations(options["count"], rng)
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE organisation")
+
+            queryset = Organisation.objects.filter(is_active=True, has_children=False)
+            durations = []
+            for _ in range(options["queries"]):
+                title = rng.choice(titles)
+                search_term = title[: rng.randint(2, len(title))]
+                started_at = time.perf_counter()
+                list(
+                    typeahead_search(
+                        queryset, search_term, settings.ORG_TYPEAHEAD_RESULT_LIMIT
+                    )
+                )
+                durations.append(time.perf_counter() - started_at)
+            transaction.set_rollback(True)
+
+        durations_ms = sorted(duration * 1000 for duration in durations)
+        p95 = durations_ms[int(0.95 * (len(durations_ms) - 1))]
+        self.stdout.write(
+            f"{options['queries']} searches over {options['count']} organisations: "
+            f"median {statistics.median(durations_ms):.1f}ms, p95 {p95:.1f}ms, "
+            f"max {durations_ms[-1]:.1f}ms"
+        )
+
+    def create_organisations(self, count, rng):
+        titles = [
+            " ".join(rng.sample(WORDS, rng.randint(1, 3))).title() + f" {number}"
+            for number in range(count)
+        ]
+        Organisation.objects.bulk_create(
+            [
+                Organisation(
+                    title=title,
+                    location=rng.choice(CITIES),
+                    username=f"benchmark{number}",
+                    domain=f"benchmark{number}.example.com",
+                    phone="",
+                    parent_code=f"BM{number}",
+                    alternate_names=[],
+                )
+                for number, title in enumerate(titles)
+            ],
+            batch_size=1000,
+        )
+        return titles
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+from django.core.management.base import BaseCommand, CommandError
+
+from beacon.organisations.search import (
+    get_stale_search_vector_ids,
+    rebuild_search_vectors,
+)
+
+
+class Command(BaseCommand):
+    help = "Recompute stale search vectors of organisations"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=1000,
+            help="Number of organisations to update per query",
+        )
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Only report organisations with stale search vectors, and exit with "
+            "a non-zero status if there are any",
+        )
+
+    def handle(self, *args, **options):
+        if options["check"]:
+            stale_ids = get_stale_search_vector_ids(chunk_size=options["chunk_size"])
+            if stale_ids:
+                raise CommandError(
+                    f"{len(stale_ids)} organisations have stale search vectors: "
+                    + ", ".join(str(stale_id) for stale_id in stale_ids)
+                )
+            self.stdout.write(
+                self.style.SUCCESS(
+                    "Search vectors of all organisations are up to date!"
+                )
+            )
+            return
+
+        updated_count = rebuild_search_vectors(chunk_size=options["chunk_size"])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Successfully rebuilt search vectors of {updated_count} organisations!"
+            )
+        )
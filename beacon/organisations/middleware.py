@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+# Standard Library
+from copy import copy
+
+from .services import resolve_organisation
+
+
+class OrganisationMiddleware:
+    """
+    Resolve the organisation of the request's host once, and set it onto the request
+    as `request.organisation` and `request.organisation_domain`.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        organisation, domain = resolve_organisation(request)
+        if organisation is not None:
+            # Organisations are shared by all requests of the process, so each request
+            # gets its own copy to change
+            organisation = copy(organisation)
+        request.organisation = organisation
+        request.organisation_domain = domain
+        return self.get_response(request)
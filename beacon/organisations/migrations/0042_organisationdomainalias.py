@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 3.2.11 on 2026-10-18 19:26
+
+import uuid
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Kinds of `OrganisationDomainAlias`, frozen as of this migration
+DOMAIN, SLUG, PATH = 0, 1, 2
+
+
+def get_domain_aliases(domain):
+    """Frozen copy of `organisations.utils.get_domain_aliases`."""
+    domain = (domain or "").strip().strip("/").lower()
+    if not domain:
+        return set()
+    aliases = {(domain, DOMAIN)}
+    start = domain.find(".my")
+    while start > 0:
+        aliases.add((domain[:start], SLUG))
+        start = domain.find(".my", start + 1)
+    start = domain.find("com/")
+    while start != -1:
+        path = domain[start + len("com/") :]
+        if path:
+            aliases.add((path, PATH))
+        start = domain.find("com/", start + 1)
+    return aliases
+
+
+def create_domain_aliases(apps, schema_editor):
+    organisation_model = apps.get_model("organisations", "Organisation")
+    domain_alias_model = apps.get_model("organisations", "OrganisationDomainAlias")
+    domain_aliases = [
+        domain_alias_model(organisation_id=organisation_id, alias=alias, kind=kind)
+        for organisation_id, domain in organisation_model.objects.values_list(
+            "id", "domain"
+        ).iterator()
+        for alias, kind in get_domain_aliases(domain)
+    ]
+    domain_alias_model.objects.bulk_create(domain_aliases, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("organisations", "0041_alter_organisation_dfd_client"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="OrganisationDomainAlias",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("modified_at", models.DateTimeField(auto_now=True)),
+                ("alias", models.CharField(max_length=50, verbose_name="alias")),
+                (
+                    "kind",
+                    models.PositiveSmallIntegerField(
+                        choices=[(0, "Domain"), (1, "Slug"), (2, "Path")],
+                        verbose_name="kind",
+                    ),
+                ),
+                (
+                    "organisation",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="domain_aliases",
+                        to="organisations.organisation",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "organisation domain alias",
+                "verbose_name_plural": "organisation domain aliases",
+                "db_table": "organisation_domain_alias",
+                "ordering": ["kind", "alias"],
+            },
+        ),
+        migrations.AddIndex(
+            model_name="organisationdomainalias",
+            index=models.Index(
+                fields=["alias", "kind"], name="organisatio_alias_a5ea14_idx"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="organisationdomainalias",
+            constraint=models.UniqueConstraint(
+                fields=("organisation", "alias", "kind"),
+                name="unique_organisation_domain_alias",
+            ),
+        ),
+        migrations.RunPython(create_domain_aliases, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("organisations", "0042_organisationdomainalias"),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql="""
+            DROP TRIGGER IF EXISTS search_vector_trigger ON organisation;
+            DROP FUNCTION IF EXISTS update_trigger();
+
+            CREATE FUNCTION organisation_search_vector(
+                title varchar, location varchar, username varchar, alternate_names varchar[]
+            ) RETURNS tsvector AS $$
+                SELECT
+                    setweight(to_tsvector('pg_catalog.english', coalesce(title, '')), 'A') ||
+                    setweight(to_tsvector('pg_catalog.english', coalesce(location, '')), 'A') ||
+                    setweight(to_tsvector('pg_catalog.english', coalesce(username, '')), 'A') ||
+                    setweight(to_tsvector('pg_catalog.english', coalesce(array_to_string(alternate_names, ' '), '')), 'A');
+            $$ LANGUAGE sql STABLE;
+
+            CREATE FUNCTION organisation_search_vector_trigger() RETURNS trigger AS $$
+            BEGIN
+                NEW.search_vector := organisation_search_vector(
+                    NEW.title, NEW.location, NEW.username, NEW.alternate_names
+                );
+                RETURN NEW;
+            END
+            $$ LANGUAGE plpgsql;
+
+            CREATE TRIGGER organisation_search_vector_trigger
+            BEFORE INSERT OR UPDATE OF title, location, username, alternate_names
+            ON organisation
+            FOR EACH ROW EXECUTE PROCEDURE organisation_search_vector_trigger();
+
+            UPDATE organisation SET search_vector = organisation_search_vector(
+                title, location, username, alternate_names
+            );
+            """,
+            reverse_sql="""
+            DROP TRIGGER IF EXISTS organisation_search_vector_trigger ON organisation;
+            DROP FUNCTION IF EXISTS organisation_search_vector_trigger();
+            DROP FUNCTION IF EXISTS organisation_search_vector(
+                varchar, varchar, varchar, varchar[]
+            );
+
+            CREATE FUNCTION update_trigger() RETURNS trigger AS $$
+            begin
+            new.search_vector :=
+                setweight(to_tsvector('pg_catalog.english', coalesce(new.title,'')), 'A') ||
+                setweight(to_tsvector('pg_catalog.english', coalesce(new.location,'')), 'A') ||
+                setweight(to_tsvector('pg_catalog.english', coalesce(array_to_string(new.alternate_names,' '), '')), 'A');
+            return new;
+            end
+            $$ LANGUAGE plpgsql;
+            CREATE TRIGGER search_vector_trigger
+            BEFORE INSERT OR UPDATE
+            ON organisation
+            FOR EACH ROW EXECUTE PROCEDURE
+            update_trigger();
+            """,
+        ),
+    ]
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 3.2.11 on 2026-10-18 19:32
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("organisations", "0043_organisation_search_vector_trigger"),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name="organisation",
+            name="has_children",
+            field=models.BooleanField(
+                default=False, editable=False, verbose_name="Has children"
+            ),
+        ),
+        migrations.AddField(
+            model_name="organisation",
+            name="search_text",
+            field=models.TextField(
+                blank=True, editable=False, verbose_name="Search text"
+            ),
+        ),
+        migrations.RunSQL(
+            sql="""
+            CREATE FUNCTION organisation_search_text(
+                title varchar, location varchar, username varchar, alternate_names varchar[]
+            ) RETURNS text AS $$
+                SELECT lower(concat_ws(' ', title, location, username, array_to_string(alternate_names, ' ')));
+            $$ LANGUAGE sql STABLE;
+
+            CREATE OR REPLACE FUNCTION organisation_search_vector_trigger() RETURNS trigger AS $$
+            BEGIN
+                NEW.search_vector := organisation_search_vector(
+                    NEW.title, NEW.location, NEW.username, NEW.alternate_names
+                );
+                NEW.search_text := organisation_search_text(
+                    NEW.title, NEW.location, NEW.username, NEW.alternate_names
+                );
+                RETURN NEW;
+            END
+            $$ LANGUAGE plpgsql;
+
+            -- Whatever is written to `has_children`, it is set from the actual children
+            CREATE FUNCTION organisation_has_children_trigger() RETURNS trigger AS $$
+            BEGIN
+                NEW.has_children := EXISTS (
+                    SELECT 1 FROM organisation WHERE parent_id = NEW.id
+                );
+                RETURN NEW;
+            END
+            $$ LANGUAGE plpgsql;
+
+            CREATE TRIGGER organisation_has_children_trigger
+            BEFORE INSERT OR UPDATE OF has_children
+            ON organisation
+            FOR EACH ROW EXECUTE PROCEDURE organisation_has_children_trigger();
+
+            -- Parents are updated when children are added, moved or deleted
+            CREATE FUNCTION organisation_parent_has_children_trigger() RETURNS trigger AS $$
+            BEGIN
+                IF TG_OP = 'UPDATE' AND OLD.parent_id IS NOT DISTINCT FROM NEW.parent_id THEN
+                    RETURN NULL;
+                END IF;
+                -- Written value is replaced by `organisation_has_children_trigger`
+                IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.parent_id IS NOT NULL THEN
+                    UPDATE organisation SET has_children = TRUE WHERE id = OLD.parent_id;
+                END IF;
+                IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.parent_id IS NOT NULL THEN
+                    UPDATE organisation SET has_children = TRUE WHERE id = NEW.parent_id;
+                END IF;
+                RETURN NULL;
+            END
+            $$ LANGUAGE plpgsql;
+
+            CREATE TRIGGER organisation_parent_has_children_trigger
+            AFTER INSERT OR UPDATE OF parent_id OR DELETE
+            ON organisation
+            FOR EACH ROW EXECUTE PROCEDURE organisation_parent_has_children_trigger();
+
+            -- `has_children` is set by `organisation_has_children_trigger`
+            UPDATE organisation SET
+                search_text = organisation_search_text(
+                    title, location, username, alternate_names
+                ),
+                has_children = FALSE;
+            """,
+            reverse_sql="""
+            DROP TRIGGER IF EXISTS organisation_parent_has_children_trigger ON organisation;
+            DROP FUNCTION IF EXISTS organisation_parent_has_children_trigger();
+            DROP TRIGGER IF EXISTS organisation_has_children_trigger ON organisation;
+            DROP FUNCTION IF EXISTS organisation_has_children_trigger();
+
+            CREATE OR REPLACE FUNCTION organisation_search_vector_trigger() RETURNS trigger AS $$
+            BEGIN
+                NEW.search_vector := organisation_search_vector(
+                    NEW.title, NEW.location, NEW.username, NEW.alternate_names
+                );
+                RETURN NEW;
+            END
+            $$ LANGUAGE plpgsql;
+
+            DROP FUNCTION IF EXISTS organisation_search_text(
+                varchar, varchar, varchar, varchar[]
+            );
+            """,
+        ),
+        migrations.AddIndex(
+            model_name="organisation",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["search_text"],
+                name="organisation_search_text_trgm",
+                opclasses=["gin_trgm_ops"],
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="organisation",
+            index=django.contrib.postgres.indexes.GinIndex(
+                django.contrib.postgres.search.SearchVector(
+                    "search_text", config="simple"
+                ),
+                name="organisation_search_text_words",
+            ),
+        ),
+    ]
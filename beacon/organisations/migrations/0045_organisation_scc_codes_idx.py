@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 3.2.11 on 2026-10-18 19:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("organisations", "0044_organisation_typeahead"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="organisation",
+            index=models.Index(
+                fields=["parent_code", "group_number", "benefit_package"],
+                name="organisation_scc_codes_idx",
+            ),
+        ),
+    ]
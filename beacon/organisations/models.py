@@ -3,7 +3,7 @@
 from django.contrib.auth.validators import UnicodeUsernameValidator
 from django.contrib.postgres.fields import ArrayField
 from django.contrib.postgres.indexes import GinIndex
-from django.contrib.postgres.search import SearchVectorField
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from django.core.validators import MaxValueValidator, ValidationError
 from django.db import models
 from django.utils.translation import gettext_lazy as _
@@ -166,7 +166,10 @@ class Organisation(TimeStampedUUIDModel):
     benefit_package = models.CharField(
         _("Benefit Package"), null=False, blank=True, max_length=4
     )
+    # Maintained by database triggers, see `organisations.search`
     search_vector = SearchVectorField(null=True)
+    search_text = models.TextField(_("Search text"), blank=True, editable=False)
+    has_children = models.BooleanField(_("Has children"), default=False, editable=False)
 
     class Meta:
         db_table = "organisation"
@@ -177,7 +180,23 @@ class Organisation(TimeStampedUUIDModel):
             "username",
             "-created_at",
         ]
-        indexes = (GinIndex(fields=["search_vector"]),)
+        indexes = (
+            GinIndex(fields=["search_vector"]),
+            GinIndex(
+                fields=["search_text"],
+                name="organisation_search_text_trgm",
+                opclasses=["gin_trgm_ops"],
+            ),
+            GinIndex(
+                SearchVector("search_text", config="simple"),
+                name="organisation_search_text_words",
+            ),
+            # Organisations of SCC users, see `services.find_scc_organisation`
+            models.Index(
+                fields=["parent_code", "group_number", "benefit_package"],
+                name="organisation_scc_codes_idx",
+            ),
+        )
 
     def clean(self):
         if self.parent is None:
@@ -223,6 +242,37 @@ class Organisation(TimeStampedUUIDModel):
         return f"{parent_code} - {self.username} - {self.title} - {self.location}"
 
 
+class OrganisationDomainAlias(TimeStampedUUIDModel):
+    """Normalized alias of an organisation's domain, maintained on organisation save"""
+
+    organisation = models.ForeignKey(
+        Organisation, on_delete=models.CASCADE, related_name="domain_aliases"
+    )
+    alias = models.CharField(_("alias"), max_length=50)
+    kind = models.PositiveSmallIntegerField(
+        _("kind"), choices=choices.DOMAIN_ALIAS_KIND_CHOICES
+    )
+
+    class Meta:
+        db_table = "organisation_domain_alias"
+        verbose_name = _("organisation domain alias")
+        verbose_name_plural = _("organisation domain aliases")
+        ordering = [
+            "kind",
+            "alias",
+        ]
+        indexes = (models.Index(fields=["alias", "kind"]),)
+        constraints = (
+            models.UniqueConstraint(
+                fields=["organisation", "alias", "kind"],
+                name="unique_organisation_domain_alias",
+            ),
+        )
+
+    def __str__(self):
+        return f"{self.organisation} - {self.alias}"
+
+
 class HomepageNav(TimeStampedUUIDModel):
     label = models.CharField(_("label"), max_length=250)
     url = models.CharField(_("url"), max_length=250)
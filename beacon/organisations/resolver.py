@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""
+Process wide map of hosts to their root organisations.
+
+Every request of the intake flow needs the organisation of the host it was sent to.
+Active root organisations are loaded once per process into `OrganisationHosts` and
+reused until the organisations version stored in the cache is bumped (see
+`bump_organisations_version`), which happens whenever an organisation is saved or
+deleted. `OrganisationMiddleware` resolves the organisation of
+each request from this map.
+"""
+# Standard Library
+import threading
+import uuid
+
+# Third Party Stuff
+from django.core.cache import cache
+
+from .models import Organisation
+
+ORGANISATIONS_VERSION_CACHE_KEY = "organisations:version"
+
+_hosts_lock = threading.Lock()
+_hosts = None
+
+
+class OrganisationHosts:
+    """Active root organisations keyed by their domain and id."""
+
+    def __init__(self, version, organisations):
+        self.version = version
+        self.by_domain = {}
+        self.by_id = {}
+        # Organisations are in their default ordering, so the first organisation seen
+        # for a domain is the same one `queryset.filter(domain=...).first()` returns.
+        for organisation in organisations:
+            self.by_domain.setdefault(organisation.domain, organisation)
+            self.by_id[str(organisation.id)] = organisation
+
+    def get_by_domain(self, domain):
+        return self.by_domain.get(domain)
+
+    def get_by_id(self, organisation_id):
+        return self.by_id.get(str(organisation_id))
+
+
+def _generate_version():
+    return uuid.uuid4().hex
+
+
+def get_organisations_version():
+    version = cache.get(ORGANISATIONS_VERSION_CACHE_KEY)
+    if version is None:
+        cache.add(ORGANISATIONS_VERSION_CACHE_KEY, _generate_version(), timeout=None)
+        version = cache.get(ORGANISATIONS_VERSION_CACHE_KEY)
+    return version
+
+
+def bump_organisations_version():
+    cache.set(ORGANISATIONS_VERSION_CACHE_KEY, _generate_version(), timeout=None)
+
+
+def get_organisation_hosts():
+    """Return the process wide map of hosts, reloading it if it is outdated."""
+    global _hosts
+
+    # Version is read before loading organisations, so any edit made while the map is
+    # being loaded bumps the version again and triggers another reload.
+    version = get_organisations_version()
+    hosts = _hosts
+    if hosts is not None and hosts.version == version:
+        return hosts
+
+    with _hosts_lock:
+        hosts = _hosts
+        if hosts is None or hosts.version != version:
+            organisations = Organisation.objects.filter(
+                is_active=True, parent__isnull=True
+            )
+            hosts = OrganisationHosts(version, organisations)
+            _hosts = hosts
+    return hosts
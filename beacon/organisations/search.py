@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""
+Organisation search.
+
+`Organisation.search_vector` (full-text) and `Organisation.search_text`
+(typeahead) of title, location, username and alternate names are computed by the
+`organisation_search_vector` and `organisation_search_text` database functions, and
+kept up to date by a trigger whenever any of those columns is written (see migrations
+`0043_organisation_search_vector_trigger` and `0044_organisation_typeahead`). Rows
+written while the trigger was missing or defined differently are found with
+`get_stale_search_vector_ids`, and fixed with `rebuild_search_vectors`.
+"""
+# Standard Library
+import re
+
+# Third Party Stuff
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchVector,
+    TrigramSimilarity,
+)
+from django.db import connection
+from django.db.models import Q
+from django.db.models.functions import Length, Lower
+
+from .models import Organisation
+
+SEARCH_VECTOR_SQL = (
+    "organisation_search_vector(title, location, username, alternate_names)"
+)
+SEARCH_TEXT_SQL = "organisation_search_text(title, location, username, alternate_names)"
+TRIGRAM_LENGTH = 3
+# Number of prefix matches ranked by the typeahead search
+TYPEAHEAD_CANDIDATE_LIMIT = 200
+STALE_SQL = (
+    f"(search_vector IS DISTINCT FROM {SEARCH_VECTOR_SQL} "
+    f"OR search_text IS DISTINCT FROM {SEARCH_TEXT_SQL})"
+)
+
+
+def _chunked_ids(chunk_size):
+    ids = Organisation.objects.order_by("id").values_list("id", flat=True)
+    chunk = []
+    for organisation_id in ids.iterator(chunk_size=chunk_size):
+        chunk.append(organisation_id)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def get_stale_search_vector_ids(chunk_size=1000):
+    """Return ids of organisations whose search columns don't match their fields."""
+    stale_ids = []
+    with connection.cursor() as cursor:
+        for ids in _chunked_ids(chunk_size):
+            cursor.execute(
+                f"SELECT id FROM organisation WHERE id = ANY(%s) AND {STALE_SQL}",
+                [ids],
+            )
+            stale_ids.extend(row[0] for row in cursor.fetchall())
+    return stale_ids
+
+
+def rebuild_search_vectors(chunk_size=1000):
+    """
+    Recompute stale search columns of all organisations, a chunk per query
+    :param chunk_size: Number of organisations to update per query
+    :return: Number of organisations whose search columns were updated
+    """
+    updated_count = 0
+    with connection.cursor() as cursor:
+        for ids in _chunked_ids(chunk_size):
+            cursor.execute(
+                f"UPDATE organisation SET search_vector = {SEARCH_VECTOR_SQL}, "
+                f"search_text = {SEARCH_TEXT_SQL} WHERE id = ANY(%s) AND {STALE_SQL}",
+                [ids],
+            )
+            updated_count += cursor.rowcount
+    return updated_count
+
+
+def get_prefix_search_query(search_term):
+    """Return query matching all words of the term as prefixes of words, if any."""
+    words = re.findall(r"\w+", search_term.lower())
+    if not words:
+        return None
+    return SearchQuery(
+        " & ".join(f"{word}:*" for word in words), config="simple", search_type="raw"
+    )
+
+
+def typeahead_search(queryset, search_term, limit):
+    """
+    Return best matches of a partially typed search term
+    Organisations having all words of the term as prefixes of words of their search
+    text are looked up through the `organisation_search_text_words` index. Words
+    aren't stemmed there, as stems of partially typed words rarely match. Of those,
+    `TYPEAHEAD_CANDIDATE_LIMIT` ones with the shortest titles, which are the closest
+    to a prefix, are ranked by trigram similarity of their title and search text.
+    Only when there are none, e.g. the term has a typo, organisations whose search
+    text contains the term or is similar to it are looked up through the trigram index.
+
+    :param queryset: Organisations to search in
+    :param search_term: Search term typed so far
+    :param limit: Maximum number of organisations to return
+    :return: list of organisations annotated with `rank`
+    """
+    search_text = " ".join(search_term.lower().split())
+    rank = TrigramSimilarity(Lower("title"), search_text) + TrigramSimilarity(
+        "search_text", search_text
+    )
+    prefix_query = get_prefix_search_query(search_term)
+    if prefix_query is not None:
+        candidates = (
+            queryset.annotate(words=SearchVector("search_text", config="simple"))
+            .filter(words=prefix_query)
+            .order_by(Length("title"), "id")
+            .values("id")[:TYPEAHEAD_CANDIDATE_LIMIT]
+        )
+        organisations = list(
+            queryset.filter(id__in=candidates)
+            .annotate(rank=rank)
+            .order_by("-rank", "title", "id")[:limit]
+        )
+        if organisations or len(search_text) < TRIGRAM_LENGTH:
+            return organisations
+
+    matches = Q(search_text__contains=search_text) | Q(
+        search_text__trigram_similar=search_text
+    )
+    return list(
+        queryset.filter(matches)
+        .annotate(rank=rank)
+        .order_by("-rank", "title", "id")[:limit]
+    )
@@ -1,20 +1,52 @@
 # -*- coding: utf-8 -*-
 # Third party Stuff
+import hashlib
+import json
 from urllib.parse import urlparse
 
 from django.apps import apps
 from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Case, Count, IntegerField, Q, Sum, When, Window
 from rest_framework.exceptions import ValidationError
 
-from .models import Organisation
+from .models import Organisation, OrganisationDomainAlias
+from .resolver import get_organisation_hosts, get_organisations_version
+from .utils import get_domain_aliases, normalize_domain
+
+SCC_ORGANISATION_CACHE_KEY = "organisations:{version}:scc:{codes_hash}"
+SCC_ORGANISATION_CACHE_TIMEOUT = 24 * 60 * 60
+
+
+def get_request_domain(request):
+    origin = request.META.get("HTTP_ORIGIN")
+    return urlparse(origin).hostname if origin else request.get_host()
+
+
+def resolve_organisation(request):
+    """
+    Return active root organisation of the request's host, and the host
+    Organisations are looked up in the process wide map of hosts, see
+    `organisations.resolver`.
+    """
+    domain = get_request_domain(request)
+    organisation = None
+    if domain:
+        hosts = get_organisation_hosts()
+        if settings.DEFAULT_ORG_FOR_TESTING is not None:
+            organisation = hosts.get_by_id(settings.DEFAULT_ORG_FOR_TESTING)
+        else:
+            organisation = hosts.get_by_domain(domain)
+    return organisation, domain
 
 
 def get_organisation(request, queryset=None):
     if queryset is None:
-        org_model = apps.get_model("organisations", "Organisation")
-        queryset = org_model.objects.filter(is_active=True, parent__isnull=True)
-    origin = request.META.get("HTTP_ORIGIN")
-    domain = urlparse(origin).hostname if origin else request.get_host()
+        # Resolved once per request by `OrganisationMiddleware`
+        if hasattr(request, "organisation"):
+            return request.organisation, request.organisation_domain
+        return resolve_organisation(request)
+    domain = get_request_domain(request)
     default_org_for_testing = settings.DEFAULT_ORG_FOR_TESTING
     organisation = None
     if domain:
@@ -24,55 +56,128 @@ def get_organisation(request, queryset=None):
             organisation = queryset.filter(domain=domain).first()
     return organisation, domain
 
-def get_organisation_new(request, queryset=None,domain=None):
+
+def get_organisation_new(request, queryset=None, domain=None):
     if queryset is None:
         org_model = apps.get_model("organisations", "Organisation")
         queryset = org_model.objects.filter(is_active=True, parent__isnull=True)
-    origin = request.META.get("HTTP_ORIGIN")
-
-    # domain = urlparse(domain).hostname if origin else request.get_host()
-
     default_org_for_testing = settings.DEFAULT_ORG_FOR_TESTING
     organisation = None
-    organisation = queryset.filter(domain=domain).first()
-    if domain and not organisation:
-        if default_org_for_testing is not None:
+    if domain:
+        organisation = get_organisation_by_domain_alias(domain, queryset=queryset)
+        if not organisation and default_org_for_testing is not None:
             organisation = queryset.filter(id=default_org_for_testing).first()
-        else:
-            organisation = queryset.filter(domain__startswith=domain+'.my').first()
-            if not organisation:
-                organisation = queryset.filter(domain__endswith='com/'+ domain).first()
     return organisation, domain
 
 
+def get_organisation_by_domain_alias(domain, queryset=None):
+    """
+    Return organisation whose domain, slug or path matches the given domain
+    Exact domain matches take precedence over slugs, and slugs over paths.
+
+    :param domain: Domain, e.g. `client.mybeaconwellbeing.com`, or just `client`
+    :param queryset: Organisations to search in, active root organisations by default
+    :return: organisations.Organisation object or None
+    """
+    if queryset is None:
+        queryset = Organisation.objects.filter(is_active=True, parent__isnull=True)
+    return (
+        queryset.filter(domain_aliases__alias=normalize_domain(domain))
+        .order_by("domain_aliases__kind", *Organisation._meta.ordering)
+        .first()
+    )
+
+
+def update_organisation_domain_aliases(organisation):
+    """Create missing and delete outdated domain aliases of the organisation."""
+    aliases = get_domain_aliases(organisation.domain)
+    existing_aliases = {
+        (domain_alias.alias, domain_alias.kind): domain_alias.id
+        for domain_alias in organisation.domain_aliases.all()
+    }
+    outdated_alias_ids = [
+        alias_id for alias, alias_id in existing_aliases.items() if alias not in aliases
+    ]
+    if outdated_alias_ids:
+        OrganisationDomainAlias.objects.filter(id__in=outdated_alias_ids).delete()
+    OrganisationDomainAlias.objects.bulk_create(
+        [
+            OrganisationDomainAlias(organisation=organisation, alias=alias, kind=kind)
+            for alias, kind in sorted(aliases - set(existing_aliases))
+        ]
+    )
+
+
+def get_scc_organisation_cache_key(parent_code, group_number, benefit_package):
+    codes = json.dumps([parent_code, group_number, benefit_package])
+    return SCC_ORGANISATION_CACHE_KEY.format(
+        version=get_organisations_version(),
+        codes_hash=hashlib.sha256(codes.encode()).hexdigest(),
+    )
+
+
+def find_scc_organisation(parent_code, group_number, benefit_package):
+    """
+    Return active organisation matching SCC codes, in a single query
+    Organisations are narrowed down by parent code, then group number, then benefit
+    package, as long as more than one organisation matches. Number of matches at each
+    level is counted with window functions, and matches of the narrowest level come
+    first.
+
+    :return: tuple of organisations.Organisation object or None, and whether it is
+             the only match
+    """
+    group_matches = Q(group_number=group_number)
+    package_matches = group_matches & Q(benefit_package=benefit_package)
+    organisation = (
+        Organisation.objects.filter(is_active=True, parent_code=parent_code)
+        .annotate(
+            group_match=Case(
+                When(group_matches, then=1), default=0, output_field=IntegerField()
+            ),
+            package_match=Case(
+                When(package_matches, then=1), default=0, output_field=IntegerField()
+            ),
+        )
+        .annotate(
+            code_count=Window(Count("id")),
+            group_count=Window(Sum("group_match")),
+            package_count=Window(Sum("package_match")),
+        )
+        .order_by("-package_match", "-group_match", *Organisation._meta.ordering)
+        .first()
+    )
+    if organisation is None:
+        return None, False
+    if organisation.code_count == 1 or organisation.group_count == 1:
+        return organisation, True
+    if organisation.group_count > 1 and organisation.package_count:
+        return organisation, organisation.package_count == 1
+    return None, False
+
+
 def search_organisation(
     parent_code, group_number, benefit_package, raise_exception=False
 ):
-    organisation_qs = Organisation.objects.filter(is_active=True)
-    organisation_qs = organisation_qs.filter(parent_code=parent_code)
-    organisation_qs_count = organisation_qs.count()
-    if organisation_qs_count > 1:
-        organisation_qs = organisation_qs.filter(group_number=group_number)
-        organisation_qs_count = organisation_qs.count()
-        if organisation_qs_count > 1:
-            organisation_qs = organisation_qs.filter(benefit_package=benefit_package)
-            organisation_qs_count = organisation_qs.count()
-            if organisation_qs_count == 1:
-                return organisation_qs.first()
-        elif organisation_qs_count == 1:
-            # Single organisation found with combination of
-            # parent code and group number
-            return organisation_qs.first()
-    elif organisation_qs_count == 1:
-        # Single Organisation found with just parent code match
-        return organisation_qs.first()
-
-    if raise_exception:
-        if organisation_qs_count == 0 or organisation_qs_count > 1:
-            # American-English spelling specifically requested
-            # for this message on SCC.
-            raise ValidationError(
-                "We cannot find this organization within BWB. Please register this user manually within BWB admin"
-            )
-
-    return organisation_qs.first()
+    """
+    Return organisation matching SCC codes, see `find_scc_organisation`
+    Results are cached per codes until organisations change.
+
+    :param raise_exception: Whether to raise ValidationError when there is no match
+                            or more than one
+    :return: organisations.Organisation object or None
+    """
+    key = get_scc_organisation_cache_key(parent_code, group_number, benefit_package)
+    result = cache.get(key)
+    if result is None:
+        result = find_scc_organisation(parent_code, group_number, benefit_package)
+        cache.set(key, result, timeout=SCC_ORGANISATION_CACHE_TIMEOUT)
+    organisation, is_unique = result
+
+    if raise_exception and not is_unique:
+        # American-English spelling specifically requested
+        # for this message on SCC.
+        raise ValidationError(
+            "We cannot find this organization within BWB. Please register this user manually within BWB admin"
+        )
+    return organisation
@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+# Third Party Stuff
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Organisation
+from .resolver import bump_organisations_version
+from .services import update_organisation_domain_aliases
+
+
+@receiver(post_save, sender=Organisation)
+@receiver(post_delete, sender=Organisation)
+def invalidate_organisation_hosts(sender, **kwargs):
+    # Bump right away so this process sees the change, and again after commit so other
+    # processes can't keep a map reloaded from the not yet committed data.
+    bump_organisations_version()
+    transaction.on_commit(bump_organisations_version)
+
+
+@receiver(post_save, sender=Organisation)
+def update_domain_aliases(sender, instance, raw=False, **kwargs):
+    if not raw:
+        update_organisation_domain_aliases(instance)
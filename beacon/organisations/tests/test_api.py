@@ -144,6 +144,61 @@ def test_organisation_search_do_not_return_parent_org_if_all_children_inactive(c
     assert response.data["count"] == 0
 
 
+def test_organisation_typeahead_search(client, settings):
+    settings.ORG_TYPEAHEAD_RESULT_LIMIT = 2
+    url = reverse("organisations-typeahead")
+    fld = f.create_organisation(
+        domain="fldnyc.example.com",
+        parent=None,
+        title="Fueled",
+        location="New York",
+        alternate_names=[],
+    )
+    fld_lnd = f.create_organisation(
+        domain="fldlnd.example.com",
+        parent=None,
+        title="Fueled London",
+        location="London",
+        alternate_names=[],
+    )
+    f.create_organisation(
+        domain="beacon.example.com",
+        parent=None,
+        title="Beacon",
+        location="Boston",
+        alternate_names=["bwb"],
+    )
+    response = client.json.get(url + "?search_term=f")
+    assert response.status_code == 400
+
+    # Prefixes match, closest matches first
+    response = client.json.get(url + "?search_term=fue")
+    assert response.status_code == 200
+    assert [org["title"] for org in response.data] == [fld.title, fld_lnd.title]
+    response = client.json.get(url + "?search_term=fueled lon")
+    assert [org["title"] for org in response.data][0] == fld_lnd.title
+
+    # Misspellings match too
+    response = client.json.get(url + "?search_term=fueld london")
+    assert [org["title"] for org in response.data] == [fld_lnd.title]
+
+    # Results are limited
+    response = client.json.get(url + "?search_term=o&limit=1")
+    assert response.status_code == 400
+    response = client.json.get(url + "?search_term=fu&limit=1")
+    assert len(response.data) == 1
+
+    # Parents with children aren't returned, until their children are removed
+    child = f.create_organisation(
+        domain="child.example.com", parent=fld, title="Child", alternate_names=[]
+    )
+    response = client.json.get(url + "?search_term=fueled")
+    assert [org["title"] for org in response.data] == [fld_lnd.title]
+    child.delete()
+    response = client.json.get(url + "?search_term=fueled")
+    assert [org["title"] for org in response.data] == [fld.title, fld_lnd.title]
+
+
 def test_get_organisation(client):
     url = reverse("org-config")
     nav = f.create_homepage_nav(is_emergency_nav=True, is_active=True, is_global=True)
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+# Third Party Stuff
+import pytest
+
+from beacon.organisations.choices import DOMAIN_ALIAS_KIND_CHOICES
+from beacon.organisations.services import get_organisation_by_domain_alias
+from beacon.organisations.tests import factories as f
+from beacon.organisations.utils import get_domain_aliases
+
+pytestmark = pytest.mark.django_db
+
+
+def test_get_domain_aliases():
+    assert get_domain_aliases(" Client.MyBeaconWellbeing.com/ ") == {
+        ("client.mybeaconwellbeing.com", DOMAIN_ALIAS_KIND_CHOICES.DOMAIN),
+        ("client", DOMAIN_ALIAS_KIND_CHOICES.SLUG),
+    }
+    assert get_domain_aliases("beaconwellbeing.com/client") == {
+        ("beaconwellbeing.com/client", DOMAIN_ALIAS_KIND_CHOICES.DOMAIN),
+        ("client", DOMAIN_ALIAS_KIND_CHOICES.PATH),
+    }
+    assert get_domain_aliases(None) == set()
+
+
+def test_organisation_is_looked_up_by_domain_alias(django_assert_num_queries):
+    path_org = f.create_organisation(
+        domain="beaconwellbeing.com/client", parent=None, is_active=True
+    )
+    slug_org = f.create_organisation(
+        domain="client.mybeaconwellbeing.com", parent=None, is_active=True
+    )
+
+    # Slugs take precedence over paths
+    with django_assert_num_queries(1):
+        assert get_organisation_by_domain_alias("client") == slug_org
+    assert get_organisation_by_domain_alias("client.mybeaconwellbeing.com") == (
+        slug_org
+    )
+    assert get_organisation_by_domain_alias("cli") is None
+
+    # Aliases follow changes of the domain
+    slug_org.domain = "other.mybeaconwellbeing.com"
+    slug_org.save()
+    assert get_organisation_by_domain_alias("client") == path_org
+    assert get_organisation_by_domain_alias("other") == slug_org
@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+# Third Party Stuff
+import pytest
+from django.test import RequestFactory
+
+from beacon.organisations.middleware import OrganisationMiddleware
+from beacon.organisations.services import resolve_organisation
+from beacon.organisations.tests import factories as f
+from beacon.questionnaire.tests import factories as questionnaire_f
+
+pytestmark = pytest.mark.django_db
+
+
+def test_organisation_is_resolved_from_cached_hosts(django_assert_num_queries):
+    template = questionnaire_f.create_template()
+    organisation = f.create_organisation(
+        domain="test.example.com", parent=None, template=template
+    )
+    request = RequestFactory().get("/", HTTP_ORIGIN="https://test.example.com")
+    assert resolve_organisation(request) == (organisation, "test.example.com")
+
+    middleware = OrganisationMiddleware(lambda request: None)
+    with django_assert_num_queries(0):
+        middleware(request)
+    assert request.organisation == organisation
+    assert request.organisation_domain == "test.example.com"
+
+    # Saving an organisation reloads the hosts
+    organisation.is_active = False
+    organisation.save()
+    assert resolve_organisation(request) == (None, "test.example.com")
@@ -96,3 +96,47 @@ def test_organisation_search_for_scc_sync():
         raise_exception=False,
     )
     assert searched_org is None
+
+
+def test_organisation_search_for_scc_sync_is_one_cached_query(
+    django_assert_num_queries,
+):
+    org1 = f.create_organisation(
+        parent_code="FLD", group_number="gp1", benefit_package="bp1"
+    )
+    f.create_organisation(parent_code="FLD", group_number="gp1", benefit_package="bp1")
+
+    # Ambiguous matches
+    with django_assert_num_queries(1):
+        with pytest.raises(ValidationError):
+            search_organisation(
+                parent_code="FLD",
+                group_number="gp1",
+                benefit_package="bp1",
+                raise_exception=True,
+            )
+    with django_assert_num_queries(0):
+        searched_org = search_organisation(
+            parent_code="FLD", group_number="gp1", benefit_package="bp1"
+        )
+    assert searched_org is not None
+
+    # Saving an organisation invalidates cached results
+    org1.benefit_package = "bp2"
+    org1.save()
+    with django_assert_num_queries(1):
+        searched_org = search_organisation(
+            parent_code="FLD",
+            group_number="gp1",
+            benefit_package="bp2",
+            raise_exception=True,
+        )
+    assert searched_org.id == org1.id
+    with django_assert_num_queries(0):
+        searched_org = search_organisation(
+            parent_code="FLD",
+            group_number="gp1",
+            benefit_package="bp2",
+            raise_exception=True,
+        )
+    assert searched_org.id == org1.id
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+# Third Party Stuff
+import pytest
+from django.core.management import CommandError, call_command
+from django.db import connection
+
+from beacon.organisations.models import Organisation
+from beacon.organisations.search import (
+    get_stale_search_vector_ids,
+    rebuild_search_vectors,
+)
+from beacon.organisations.tests import factories as f
+
+pytestmark = pytest.mark.django_db
+
+
+def test_search_vector_is_maintained_and_rebuilt():
+    organisation = f.create_organisation(
+        title="Fueled", location="New York", username="fldnyc", alternate_names=[]
+    )
+    assert Organisation.objects.filter(search_vector="fldnyc").get() == organisation
+
+    organisation.alternate_names = ["Acme"]
+    organisation.save()
+    assert Organisation.objects.filter(search_vector="acme").get() == organisation
+    assert get_stale_search_vector_ids() == []
+
+    # Vectors written without the trigger are flagged and rebuilt
+    with connection.cursor() as cursor:
+        cursor.execute("UPDATE organisation SET search_vector = NULL")
+    assert get_stale_search_vector_ids() == [organisation.id]
+    with pytest.raises(CommandError):
+        call_command("rebuild_organisation_search_vectors", "--check")
+
+    assert rebuild_search_vectors(chunk_size=1) == 1
+    assert get_stale_search_vector_ids() == []
+    assert Organisation.objects.filter(search_vector="fueled").get() == organisation
+    call_command("rebuild_organisation_search_vectors", "--check")
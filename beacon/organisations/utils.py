@@ -3,6 +3,8 @@
 # Beacon stuff
 from beacon.users.tasks import sync_users_active_status_with_organisation_task
 
+from .choices import DOMAIN_ALIAS_KIND_CHOICES
+
 
 def sync_child_org_active_status_with_parent_org(
     child_org,
@@ -37,3 +39,34 @@ def sync_child_org_active_status_with_parent_org(
             org_id=child_org.id,
             is_active=child_org.is_active,
         )
+
+
+def normalize_domain(domain):
+    return (domain or "").strip().strip("/").lower()
+
+
+def get_domain_aliases(domain):
+    """
+    Return aliases an organisation can be looked up with, derived from its domain
+
+    :param domain: Organisation's domain, e.g. `client.mybeaconwellbeing.com` or
+                   `beaconwellbeing.com/client`
+    :return: set of `(alias, kind)` tuples, e.g. `("client", DOMAIN_ALIAS_KIND_CHOICES.SLUG)`
+    """
+    domain = normalize_domain(domain)
+    if not domain:
+        return set()
+    aliases = {(domain, DOMAIN_ALIAS_KIND_CHOICES.DOMAIN)}
+    # Slugs before ".my", e.g. `client` of `client.mybeaconwellbeing.com`
+    start = domain.find(".my")
+    while start > 0:
+        aliases.add((domain[:start], DOMAIN_ALIAS_KIND_CHOICES.SLUG))
+        start = domain.find(".my", start + 1)
+    # Paths after "com/", e.g. `client` of `beaconwellbeing.com/client`
+    start = domain.find("com/")
+    while start != -1:
+        path = domain[start + len("com/") :]
+        if path:
+            aliases.add((path, DOMAIN_ALIAS_KIND_CHOICES.PATH))
+        start = domain.find("com/", start + 1)
+    return aliases
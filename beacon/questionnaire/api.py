@@ -1,6 +1,9 @@
 # -*- coding: utf-8 -*-
 # Third Party Stuff
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.http import Http404
+from django.utils.cache import patch_cache_control, patch_vary_headers
 from rest_framework.decorators import action
 from rest_framework.mixins import ListModelMixin, RetrieveModelMixin
 from rest_framework.permissions import AllowAny
@@ -11,11 +14,15 @@ from rest_framework.viewsets import GenericViewSet
 from beacon.answers.permissions import LoggedInUserResponseAccess
 from beacon.base import response
 from beacon.organisations.services import get_organisation
+from beacon.questionnaire.index import get_questionnaire_index
 
 from . import models, serializers, services
 
 User = get_user_model()
 
+TEMPLATE_BUNDLE_CACHE_KEY = "questionnaire:template-bundle:{version}"
+TEMPLATE_BUNDLE_CACHE_TIMEOUT = 60 * 60
+
 
 class QuestionViewSet(ListModelMixin, RetrieveModelMixin, GenericViewSet):
     permission_classes = (AllowAny,)
@@ -65,31 +72,80 @@ class QuestionViewSet(ListModelMixin, RetrieveModelMixin, GenericViewSet):
             ).data
         )
 
-    def get_template_from_organisation(self, request):
+    @action(methods=["GET"], detail=False, url_path="template-bundle")
+    def template_bundle(self, request):
+        """
+        Whole intake template with its questions and mapping edges, so that clients can
+        navigate without calling next/previous question for every answer.
+        """
+        organisation, _ = get_organisation(request)
+        questionnaire_index = get_questionnaire_index()
+        template_flow = questionnaire_index.get_template_flow(
+            organisation.template_id if organisation else None
+        )
+        if template_flow is None:
+            return response.NoContent()
+
+        version = services.get_template_bundle_version(
+            questionnaire_index, template_flow, organisation
+        )
+        cache_key = TEMPLATE_BUNDLE_CACHE_KEY.format(version=version)
+        bundle = cache.get(cache_key)
+        if bundle is None:
+            context = {"request": request, "organisation": organisation}
+            data = {
+                "template": serializers.IntakeQuestionTemplateSerializer(
+                    template_flow.template
+                ).data,
+                "questions": serializers.QuestionSerializer(
+                    services.get_template_questions(questionnaire_index, template_flow),
+                    many=True,
+                    context=context,
+                ).data,
+                "mappings": serializers.TemplateQuestionMappingSerializer(
+                    template_flow.get_mappings(), many=True
+                ).data,
+            }
+            bundle = (services.get_template_bundle_etag(data), data)
+            cache.set(cache_key, bundle, timeout=TEMPLATE_BUNDLE_CACHE_TIMEOUT)
+        etag, data = bundle
+
+        if services.etag_matches(etag, request.META.get("HTTP_IF_NONE_MATCH")):
+            bundle_response = response.NotModified()
+        else:
+            bundle_response = response.Ok(data)
+
+        bundle_response["ETag"] = etag
+        patch_cache_control(bundle_response, public=True, no_cache=True)
+        patch_vary_headers(bundle_response, ["Origin"])
+        return bundle_response
+
+    def get_template_flow_from_organisation(self, request):
         organisation, _ = get_organisation(self.request)
-        template = None
-        if organisation:
-            template = organisation.template
-        if template is None:
-            template = models.IntakeQuestionTemplate.objects.filter(
-                is_default=True
-            ).first()
-        return template
+        template_id = organisation.template_id if organisation else None
+        return get_questionnaire_index().get_template_flow(template_id)
+
+    def get_indexed_object(self):
+        """Return active, non follower question from the questionnaire index."""
+        question = get_questionnaire_index().get_question(self.kwargs["pk"])
+        if question is None or not question.is_active or question.leader_question_id:
+            raise Http404
+        return question
 
     @action(methods=["GET"], detail=True, url_path="next-question")
     def get_next_question(self, request, pk):
-        template = self.get_template_from_organisation(request)
-        instance = self.get_object()
+        template_flow = self.get_template_flow_from_organisation(request)
+        instance = self.get_indexed_object()
         next_question = services.get_next_question_service(
-            template, instance, request.user_response
+            template_flow, instance, request.user_response
         )
         return response.Ok(self.get_serializer(next_question).data)
 
     @action(methods=["GET"], detail=True, url_path="previous-question")
     def get_previous_question(self, request, pk):
-        template = self.get_template_from_organisation(request)
-        instance = self.get_object()
+        template_flow = self.get_template_flow_from_organisation(request)
+        instance = self.get_indexed_object()
         next_question = services.get_previous_question_service(
-            template, instance, request.user_response
+            template_flow, instance, request.user_response
         )
         return response.Ok(self.get_serializer(next_question).data)
@@ -0,0 +1,10 @@
+# -*- coding: utf-8 -*-
+# Third Party Stuff
+from django.apps import AppConfig
+
+
+class QuestionnaireConfig(AppConfig):
+    name = "beacon.questionnaire"
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+"""
+Compiled, versioned in-memory index of the questionnaire.
+
+Questions, their choices and the intake templates wiring them together change only
+when admins edit them, but they are read on every answer submission and navigation.
+The index is built once per process and reused until the questionnaire version stored
+in the cache is bumped (see `bump_questionnaire_version`), so validating answers and
+moving through a template flow do not need any database round-trip in the common case.
+"""
+# Standard Library
+import threading
+import uuid
+
+# Third Party Stuff
+from django.core.cache import cache
+
+from .models import IntakeQuestionTemplate, Question, TemplateQuestionMapping
+
+QUESTIONNAIRE_VERSION_CACHE_KEY = "questionnaire:version"
+
+_index_lock = threading.Lock()
+_index = None
+
+
+class TemplateFlowNode:
+    """Outgoing edges of a question in an intake template.
+
+    `mappings` keeps every `TemplateQuestionMapping` of the question in creation order,
+    while `edges` maps the `text_mapped_value` of the mapping's option to the first
+    mapping created for it.
+    """
+
+    def __init__(self, question):
+        self.question = question
+        self.mappings = []
+        self.edges = {}
+
+    def add_mapping(self, mapping, text_mapped_value=None):
+        self.mappings.append(mapping)
+        if text_mapped_value is not None:
+            self.edges.setdefault(text_mapped_value, mapping)
+
+
+class TemplateFlow:
+    """State machine of an `IntakeQuestionTemplate`, keyed by question id."""
+
+    def __init__(self, template):
+        self.template = template
+        self.nodes = {}
+
+    def get_node(self, question):
+        return self.nodes.get(str(question.id))
+
+    def get_mappings(self):
+        return [mapping for node in self.nodes.values() for mapping in node.mappings]
+
+
+class QuestionnaireIndex:
+    """Lookup tables built from a single snapshot of the questionnaire."""
+
+    def __init__(self, version, questions, templates=(), mappings=()):
+        self.version = version
+        self.questions = {}
+        self.response_attribute_questions = {}
+        self.appointment_attribute_questions = {}
+        self.choice_values = {}
+        self.choice_texts = {}
+        self.options = {}
+        self.template_flows = {}
+        self.default_template_flow = None
+
+        # Questions are ordered by `-created_at`, so the first question seen for an
+        # attribute is the same one `Question.objects.filter(...).first()` returns.
+        questions = list(questions)
+        for question in questions:
+            question_id = str(question.id)
+            self.questions[question_id] = question
+            if question.user_response_attribute:
+                self.response_attribute_questions.setdefault(
+                    question.user_response_attribute, question
+                )
+            if question.user_appointment_attribute:
+                self.appointment_attribute_questions.setdefault(
+                    question.user_appointment_attribute, question
+                )
+            choice_values = {}
+            choice_texts = {}
+            for option in question.choices.all():
+                self.options[option.id] = option
+                choice_values.setdefault(option.text, option.text_mapped_value)
+                if option.text_mapped_value is not None:
+                    choice_texts.setdefault(option.text_mapped_value, option.text)
+            self.choice_values[question_id] = choice_values
+            self.choice_texts[question_id] = choice_texts
+
+        # Point self referencing relations to indexed objects, so following them never
+        # hits the database.
+        for question in questions:
+            question.nested_question = self._get_related(question.nested_question_id)
+            question.leader_question = self._get_related(question.leader_question_id)
+
+        # Templates are ordered by `created_at`, so the first default template wins just
+        # like `IntakeQuestionTemplate.objects.filter(is_default=True).first()`.
+        for template in templates:
+            flow = TemplateFlow(template)
+            self.template_flows[template.id] = flow
+            if template.is_default and self.default_template_flow is None:
+                self.default_template_flow = flow
+
+        for mapping in mappings:
+            flow = self.template_flows.get(mapping.template_id)
+            question = self._get_related(mapping.question_id)
+            if flow is None or question is None:
+                continue
+            mapping.question = question
+            mapping.next_question = self._get_related(mapping.next_question_id)
+            mapping.previous_question = self._get_related(mapping.previous_question_id)
+            option = self.options.get(mapping.option_id)
+            mapping.option = option
+            node = flow.nodes.get(str(question.id))
+            if node is None:
+                node = flow.nodes[str(question.id)] = TemplateFlowNode(question)
+            node.add_mapping(
+                mapping, text_mapped_value=option.text_mapped_value if option else None
+            )
+
+    def _get_related(self, question_id):
+        if question_id is None:
+            return None
+        return self.questions.get(str(question_id))
+
+    def get_question(self, question_id):
+        if not isinstance(question_id, str):
+            return None
+        return self.questions.get(question_id)
+
+    def get_root_questions(self):
+        """Return published questions which aren't followers of another question."""
+        return [
+            question
+            for question in self.questions.values()
+            if question.is_active and question.leader_question_id is None
+        ]
+
+    def get_template_questions(self, template_flow, question_ids=()):
+        """
+        Return published root questions reachable in a template flow: the starting
+        questions, and the questions its mappings lead from and to.
+        :param question_ids: Ids of other questions the flow leads to, e.g. through
+                             question services of its mappings
+        """
+        question_ids = {str(question_id) for question_id in question_ids}
+        for mapping in template_flow.get_mappings():
+            for question_id in (
+                mapping.question_id,
+                mapping.next_question_id,
+                mapping.previous_question_id,
+            ):
+                if question_id is not None:
+                    question_ids.add(str(question_id))
+
+        questions = []
+        start_flags = {"is_start", "is_appointment_start"}
+        for question in self.get_root_questions():
+            # Only the first starting question is served, like `Question.objects
+            # .filter(is_start=True).first()` does.
+            is_first_start = any(getattr(question, flag) for flag in start_flags)
+            start_flags -= {flag for flag in start_flags if getattr(question, flag)}
+            if is_first_start or str(question.id) in question_ids:
+                questions.append(question)
+        return questions
+
+    def get_question_for_response_attribute(self, attribute):
+        return self.response_attribute_questions.get(attribute)
+
+    def get_question_for_appointment_attribute(self, attribute):
+        return self.appointment_attribute_questions.get(attribute)
+
+    def get_choice_values(self, question):
+        """Return mapping of choice text to its `text_mapped_value` for a question."""
+        return self.choice_values.get(str(question.id), {})
+
+    def get_choice_text(self, question, text_mapped_value):
+        """Return text of the question's choice having given `text_mapped_value`."""
+        if text_mapped_value is None:
+            return None
+        choice_texts = self.choice_texts.get(str(question.id), {})
+        return choice_texts.get(str(text_mapped_value))
+
+    def get_template_flow(self, template_id=None):
+        """Return flow of the given template, falling back to the default template."""
+        flow = None
+        if template_id is not None:
+            flow = self.template_flows.get(template_id)
+        if flow is None:
+            flow = self.default_template_flow
+        return flow
+
+
+def _generate_version():
+    return uuid.uuid4().hex
+
+
+def get_questionnaire_version():
+    version = cache.get(QUESTIONNAIRE_VERSION_CACHE_KEY)
+    if version is None:
+        cache.add(QUESTIONNAIRE_VERSION_CACHE_KEY, _generate_version(), timeout=None)
+        version = cache.get(QUESTIONNAIRE_VERSION_CACHE_KEY)
+    return version
+
+
+def bump_questionnaire_version():
+    cache.set(QUESTIONNAIRE_VERSION_CACHE_KEY, _generate_version(), timeout=None)
+
+
+def get_questionnaire_index():
+    """Return the process wide questionnaire index, rebuilding it if it is outdated."""
+    global _index
+
+    # Version is read before loading questions, so any edit made while the index is
+    # being built bumps the version again and triggers another rebuild.
+    version = get_questionnaire_version()
+    index = _index
+    if index is not None and index.version == version:
+        return index
+
+    with _index_lock:
+        index = _index
+        if index is None or index.version != version:
+            questions = Question.objects.prefetch_related(
+                "choices", "follower_questions__choices"
+            ).all()
+            index = QuestionnaireIndex(
+                version,
+                questions,
+                templates=IntakeQuestionTemplate.objects.all(),
+                mappings=TemplateQuestionMapping.objects.all(),
+            )
+            _index = index
+    return index
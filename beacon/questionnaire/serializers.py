@@ -2,7 +2,7 @@
 # Third Party Stuff
 from rest_framework import serializers
 
-from .models import Option, Question
+from .models import IntakeQuestionTemplate, Option, Question, TemplateQuestionMapping
 
 
 class OptionSerializer(serializers.ModelSerializer):
@@ -102,3 +102,33 @@ class NestedQuestionSerializer(QuestionSerializer):
         fields = super().get_fields()
         fields["nested_question"] = NestedQuestionSerializer()
         return fields
+
+
+class IntakeQuestionTemplateSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = IntakeQuestionTemplate
+        fields = ("id", "name", "show_safety_screen")
+        read_only_fields = fields
+
+
+class TemplateQuestionMappingSerializer(serializers.ModelSerializer):
+    text_mapped_value = serializers.SerializerMethodField()
+
+    class Meta:
+        model = TemplateQuestionMapping
+        fields = (
+            "id",
+            "question",
+            "option",
+            "text_mapped_value",
+            "next_question",
+            "previous_question",
+            "next_question_service",
+            "previous_question_service",
+        )
+        read_only_fields = fields
+
+    def get_text_mapped_value(self, obj):
+        if obj.option_id is None:
+            return None
+        return obj.option.text_mapped_value
@@ -1,37 +1,47 @@
 # -*- coding: utf-8 -*-
+# Standard Library
+import hashlib
+import json
+
+# Third Party Stuff
+from django.utils.http import parse_etags
+
 # beacon Stuff
 from beacon.answers import constants
-from beacon.questionnaire.models import Question, TemplateQuestionMapping
+from beacon.organisations.resolver import get_organisations_version
+from beacon.questionnaire.index import get_questionnaire_index
+
+
+def get_question_for_response_attribute(attribute):
+    return get_questionnaire_index().get_question_for_response_attribute(attribute)
+
 
+def get_question_for_appointment_attribute(attribute):
+    return get_questionnaire_index().get_question_for_appointment_attribute(attribute)
 
-def starting_question_next_service(user_response):
+
+def starting_question_next_service(user_response, appointment=None):
     if (
         user_response.chief_complaint1 == constants.ALCOHOL
         or user_response.chief_complaint2 == constants.ALCOHOL
     ):
         # if template.show_safety_screen is True and user_response.is_employee is True:
-        #     return Question.objects.filter(user_response_attribute=constants.SAFETY_SENSITIVE_POSITION).first()
-        return Question.objects.filter(
-            user_response_attribute=constants.FELT_CUT_DOWN_DRINKING
-        ).first()
+        #     return get_question_for_response_attribute(constants.SAFETY_SENSITIVE_POSITION)
+        return get_question_for_response_attribute(constants.FELT_CUT_DOWN_DRINKING)
     if user_response.chief_complaint1 in [constants.ANXIETY, constants.STRESS]:
-        return Question.objects.filter(
-            user_response_attribute=constants.HOW_OFTEN_NERVOUS
-        ).first()
-    return Question.objects.filter(
-        user_response_attribute=constants.HOW_OFTEN_LESS_INTEREST_IN_THINGS
-    ).first()
+        return get_question_for_response_attribute(constants.HOW_OFTEN_NERVOUS)
+    return get_question_for_response_attribute(
+        constants.HOW_OFTEN_LESS_INTEREST_IN_THINGS
+    )
 
 
-def is_employee_question_next_service(user_response):
+def is_employee_question_next_service(user_response, appointment=None):
     if (
         user_response.chief_complaint1 == constants.ALCOHOL
         or user_response.chief_complaint2 == constants.ALCOHOL
     ):
-        return Question.objects.filter(
-            user_response_attribute=constants.SAFETY_SENSITIVE_POSITION
-        ).first()
-    return starting_question_next_service(user_response)
+        return get_question_for_response_attribute(constants.SAFETY_SENSITIVE_POSITION)
+    return starting_question_next_service(user_response, appointment)
 
 
 #
@@ -40,217 +50,296 @@ def is_employee_question_next_service(user_response):
 #     if user_response.chief_complaint1 == constants.ALCOHOL or user_response.chief_complaint2 == constants.ALCOHOL:
 #         return starting_question_next_service(user_response)
 #     if user_response.is_employee is True and user_response.felt_cut_down_drinking is None:
-#         return Question.objects.filter(user_response_attribute=constants.FELT_CUT_DOWN_DRINKING).first()
+#         return get_question_for_response_attribute(constants.FELT_CUT_DOWN_DRINKING)
 #     if (user_response.is_employee is True and user_response.felt_cut_down_drinking is True and
 #             user_response.difficulty_in_keeping_drinking_limit is None):
-#         return Question.objects.filter(user_response_attribute=constants.DIFFICULTY_IN_KEEPING_DRINKING_LIMIT).first()
-#     return Question.objects.filter(user_response_attribute=constants.HOW_EMOTIONALLY_DOING).first()
+#         return get_question_for_response_attribute(constants.DIFFICULTY_IN_KEEPING_DRINKING_LIMIT)
+#     return get_question_for_response_attribute(constants.HOW_EMOTIONALLY_DOING)
 
 
-def safety_screen_felt_cut_down_drinking_question_next_service(user_response):
+def safety_screen_felt_cut_down_drinking_question_next_service(
+    user_response, appointment=None
+):
     if (
         user_response.safety_sensitive_position is None
         and user_response.is_employee is True
         and user_response.felt_cut_down_drinking is True
     ):
-        return Question.objects.filter(
-            user_response_attribute=constants.SAFETY_SENSITIVE_POSITION
-        ).first()
-    return Question.objects.filter(
-        user_response_attribute=constants.DIFFICULTY_IN_KEEPING_DRINKING_LIMIT
-    ).first()
+        return get_question_for_response_attribute(constants.SAFETY_SENSITIVE_POSITION)
+    return get_question_for_response_attribute(
+        constants.DIFFICULTY_IN_KEEPING_DRINKING_LIMIT
+    )
 
 
 def safety_screen_difficulty_in_keeping_drinking_limit_question_next_service(
-    user_response,
+    user_response, appointment=None
 ):
     if (
         user_response.safety_sensitive_position is None
         and user_response.is_employee is True
         and user_response.difficulty_in_keeping_drinking_limit is True
     ):
-        return Question.objects.filter(
-            user_response_attribute=constants.SAFETY_SENSITIVE_POSITION
-        ).first()
-    return Question.objects.filter(
-        user_response_attribute=constants.HOW_EMOTIONALLY_DOING
-    ).first()
+        return get_question_for_response_attribute(constants.SAFETY_SENSITIVE_POSITION)
+    return get_question_for_response_attribute(constants.HOW_EMOTIONALLY_DOING)
 
 
-def starting_question_previous_service(user_response):
+def starting_question_previous_service(user_response, appointment=None):
     if user_response.is_employee is False:
-        follower_question = Question.objects.filter(
-            user_response_attribute=constants.EMPLOYEE_NAME
-        ).first()
+        follower_question = get_question_for_response_attribute(constants.EMPLOYEE_NAME)
         if follower_question:
             return follower_question.leader_question
     if user_response.is_employee is True:
         if user_response.safety_sensitive_position is True:
-            return Question.objects.filter(
-                user_response_attribute=constants.SAFETY_SENSITIVE_POSITION
-            ).first()
-    return Question.objects.filter(
-        user_response_attribute=constants.EMOTIONAL_SUPPORT_FOR
-    ).first()
+            return get_question_for_response_attribute(
+                constants.SAFETY_SENSITIVE_POSITION
+            )
+    return get_question_for_response_attribute(constants.EMOTIONAL_SUPPORT_FOR)
 
 
-def f2f_search_address_previous_service(user_response):
-    appointment = user_response.appointments.first()
+def f2f_search_address_previous_service(user_response, appointment=None):
     if appointment:
         if appointment.f2f_counselor_search_address == constants.F2F_OTHER_ADDRESS:
-            follower_question = Question.objects.filter(
-                user_appointment_attribute=constants.F2F_ADDRESS1
-            ).first()
+            follower_question = get_question_for_appointment_attribute(
+                constants.F2F_ADDRESS1
+            )
             if follower_question:
                 return follower_question.leader_question
-    return Question.objects.filter(
-        user_appointment_attribute=constants.F2F_COUNSELOR_SEARCH_ADDRESS
+    return get_question_for_appointment_attribute(
+        constants.F2F_COUNSELOR_SEARCH_ADDRESS
     )
 
 
-def f2f_counselor_notes_previous_service(user_response):
-    appointment = user_response.appointments.first()
+def f2f_counselor_notes_previous_service(user_response, appointment=None):
     if appointment:
         if appointment.f2f_preferred_contact == constants.F2F_PHONE:
-            return Question.objects.filter(
-                user_appointment_attribute=constants.F2F_OKAY_TO_LEAVE_VOICEMAIL
-            ).first()
-    return Question.objects.filter(
-        user_appointment_attribute=constants.F2F_PREFERRED_CONTACT
-    ).first()
-
-
-def get_next_question_from_template_question_mapping(instance, user_response):
-    services = {
-        "starting_question_next_service": starting_question_next_service,
-        # "safety_screen_starting_question_next_service": safety_screen_question_next_service,
-        "safety_screen_felt_cut_down_drinking_question_next_service": safety_screen_felt_cut_down_drinking_question_next_service,
-        "safety_screen_difficulty_in_keeping_drinking_limit_question_next_service": safety_screen_difficulty_in_keeping_drinking_limit_question_next_service,
-        "is_employee_question_next_service": is_employee_question_next_service,
-    }
+            return get_question_for_appointment_attribute(
+                constants.F2F_OKAY_TO_LEAVE_VOICEMAIL
+            )
+    return get_question_for_appointment_attribute(constants.F2F_PREFERRED_CONTACT)
+
+
+NEXT_QUESTION_SERVICES = {
+    "starting_question_next_service": starting_question_next_service,
+    # "safety_screen_starting_question_next_service": safety_screen_question_next_service,
+    "safety_screen_felt_cut_down_drinking_question_next_service": safety_screen_felt_cut_down_drinking_question_next_service,
+    "safety_screen_difficulty_in_keeping_drinking_limit_question_next_service": safety_screen_difficulty_in_keeping_drinking_limit_question_next_service,
+    "is_employee_question_next_service": is_employee_question_next_service,
+}
+
+PREVIOUS_QUESTION_SERVICES = {
+    "starting_question_previous_service": starting_question_previous_service,
+    "f2f_search_address_previous_service": f2f_search_address_previous_service,
+    "f2f_counselor_notes_previous_service": f2f_counselor_notes_previous_service,
+}
+
+# Questions each of the services above may lead to, by the attribute of the user
+# response or appointment they ask for. Followers stand for their leader question.
+QUESTION_SERVICE_TARGETS = {
+    "starting_question_next_service": (
+        ("user_response", constants.FELT_CUT_DOWN_DRINKING),
+        ("user_response", constants.HOW_OFTEN_NERVOUS),
+        ("user_response", constants.HOW_OFTEN_LESS_INTEREST_IN_THINGS),
+    ),
+    "safety_screen_felt_cut_down_drinking_question_next_service": (
+        ("user_response", constants.SAFETY_SENSITIVE_POSITION),
+        ("user_response", constants.DIFFICULTY_IN_KEEPING_DRINKING_LIMIT),
+    ),
+    "safety_screen_difficulty_in_keeping_drinking_limit_question_next_service": (
+        ("user_response", constants.SAFETY_SENSITIVE_POSITION),
+        ("user_response", constants.HOW_EMOTIONALLY_DOING),
+    ),
+    "is_employee_question_next_service": (
+        ("user_response", constants.SAFETY_SENSITIVE_POSITION),
+        ("user_response", constants.FELT_CUT_DOWN_DRINKING),
+        ("user_response", constants.HOW_OFTEN_NERVOUS),
+        ("user_response", constants.HOW_OFTEN_LESS_INTEREST_IN_THINGS),
+    ),
+    "starting_question_previous_service": (
+        ("user_response", constants.EMPLOYEE_NAME),
+        ("user_response", constants.SAFETY_SENSITIVE_POSITION),
+        ("user_response", constants.EMOTIONAL_SUPPORT_FOR),
+    ),
+    "f2f_search_address_previous_service": (
+        ("user_appointment", constants.F2F_ADDRESS1),
+        ("user_appointment", constants.F2F_COUNSELOR_SEARCH_ADDRESS),
+    ),
+    "f2f_counselor_notes_previous_service": (
+        ("user_appointment", constants.F2F_OKAY_TO_LEAVE_VOICEMAIL),
+        ("user_appointment", constants.F2F_PREFERRED_CONTACT),
+    ),
+}
+
+# Services that branch on the user's latest appointment
+APPOINTMENT_QUESTION_SERVICES = (
+    "f2f_search_address_previous_service",
+    "f2f_counselor_notes_previous_service",
+)
+
+
+def get_next_question_from_template_question_mapping(
+    instance, user_response, appointment=None
+):
     if instance.next_question_service is None:
         return instance.next_question
-    if instance.next_question_service in services:
-        return services[instance.next_question_service](user_response)
+    if instance.next_question_service in NEXT_QUESTION_SERVICES:
+        return NEXT_QUESTION_SERVICES[instance.next_question_service](
+            user_response, appointment
+        )
     return None
 
 
-def get_previous_question_from_template_question_mapping(instance, user_response):
-    services = {
-        "starting_question_previous_service": starting_question_previous_service,
-        "f2f_search_address_previous_service": f2f_search_address_previous_service,
-        "f2f_counselor_notes_previous_service": f2f_counselor_notes_previous_service,
-    }
+def get_previous_question_from_template_question_mapping(
+    instance, user_response, appointment=None
+):
     if instance.previous_question_service is None:
         return instance.previous_question
-    if instance.previous_question_service in services:
-        return services[instance.previous_question_service](user_response)
+    if instance.previous_question_service in PREVIOUS_QUESTION_SERVICES:
+        return PREVIOUS_QUESTION_SERVICES[instance.previous_question_service](
+            user_response, appointment
+        )
     return None
 
 
-def get_next_question_service(template, question, user_response):
-    appointment = user_response.appointments.first()
-    appointment_value = None
-    if appointment is not None and question.user_appointment_attribute is not None:
-        appointment_value = getattr(
-            appointment, question.user_appointment_attribute, None
-        )
-    mapping = list(
-        TemplateQuestionMapping.objects.select_related("option", "question").filter(
-            question=question, template=template
-        )
+def get_latest_appointment_for_node(node, user_response):
+    """Fetch user's latest appointment only if the flow node branches on it."""
+    needs_appointment = node.question.user_appointment_attribute is not None or any(
+        mapping.next_question_service in APPOINTMENT_QUESTION_SERVICES
+        or mapping.previous_question_service in APPOINTMENT_QUESTION_SERVICES
+        for mapping in node.mappings
     )
-    if mapping:
-        if len(mapping) == 1:
-            return get_next_question_from_template_question_mapping(
-                mapping[0], user_response
-            )
+    if needs_appointment:
+        return user_response.appointments.first()
+    return None
 
-        if question.user_response_attribute is not None:
-            user_response_value = getattr(
-                user_response, question.user_response_attribute, None
-            )
-            if user_response_value is not None:
-                instance = next(
-                    (
-                        x
-                        for x in mapping
-                        if x.option.text_mapped_value == str(user_response_value)
-                    ),
-                    None,
-                )
-                if instance is None:
-                    return None
-                return get_next_question_from_template_question_mapping(
-                    instance, user_response
-                )
-
-        if appointment_value is not None:
-            instance = next(
-                (
-                    x
-                    for x in mapping
-                    if x.option.text_mapped_value == str(appointment_value)
-                ),
-                None,
-            )
+
+def get_next_question_service(template_flow, question, user_response):
+    node = template_flow.get_node(question) if template_flow else None
+    if node is None:
+        return None
+
+    appointment = get_latest_appointment_for_node(node, user_response)
+    if len(node.mappings) == 1:
+        return get_next_question_from_template_question_mapping(
+            node.mappings[0], user_response, appointment
+        )
+
+    if question.user_response_attribute is not None:
+        user_response_value = getattr(
+            user_response, question.user_response_attribute, None
+        )
+        if user_response_value is not None:
+            instance = node.edges.get(str(user_response_value))
             if instance is None:
                 return None
             return get_next_question_from_template_question_mapping(
-                instance, user_response
+                instance, user_response, appointment
             )
 
+    appointment_value = None
+    if appointment is not None and question.user_appointment_attribute is not None:
+        appointment_value = getattr(
+            appointment, question.user_appointment_attribute, None
+        )
+    if appointment_value is not None:
+        instance = node.edges.get(str(appointment_value))
+        if instance is None:
+            return None
+        return get_next_question_from_template_question_mapping(
+            instance, user_response, appointment
+        )
+
     return None
 
 
-def get_previous_question_service(template, question, user_response):
-    appointment = user_response.appointments.first()
+def get_previous_question_service(template_flow, question, user_response):
+    node = template_flow.get_node(question) if template_flow else None
+    if node is None:
+        return None
+
+    appointment = get_latest_appointment_for_node(node, user_response)
     appointment_value = None
     if appointment is not None and question.user_appointment_attribute is not None:
         appointment_value = getattr(
             appointment, question.user_appointment_attribute, None
         )
-
-    mapping = list(
-        TemplateQuestionMapping.objects.select_related("option", "question").filter(
-            question=question, template=template
-        )
-    )
-    if mapping:
+    user_response_value = None
+    if question.user_response_attribute is not None:
         user_response_value = getattr(
             user_response, question.user_response_attribute, None
         )
-        if len(mapping) == 1 or (
-            user_response_value is None and appointment_value is None
-        ):
-            return get_previous_question_from_template_question_mapping(
-                mapping[0], user_response
-            )
 
-        if user_response_value is not None:
-            instance = next(
-                (
-                    x
-                    for x in mapping
-                    if x.option.text_mapped_value == user_response_value
-                ),
-                None,
-            )
-            if instance is None:
-                return None
-            return get_previous_question_from_template_question_mapping(
-                instance, user_response
-            )
+    if len(node.mappings) == 1 or (
+        user_response_value is None and appointment_value is None
+    ):
+        return get_previous_question_from_template_question_mapping(
+            node.mappings[0], user_response, appointment
+        )
 
-        if appointment_value is not None:
-            instance = next(
-                (x for x in mapping if x.option.text_mapped_value == appointment_value),
-                None,
-            )
+    # Stored values are matched as is (without casting to string) against mapped values
+    for value in (user_response_value, appointment_value):
+        if value is not None:
+            instance = node.edges.get(value) if isinstance(value, str) else None
             if instance is None:
                 return None
             return get_previous_question_from_template_question_mapping(
-                instance, user_response
+                instance, user_response, appointment
             )
 
     return None
+
+
+def get_template_questions(questionnaire_index, template_flow):
+    """
+    Return questions of a template flow, including the ones only reachable through
+    question services of its mappings.
+    """
+    lookups = {
+        "user_response": questionnaire_index.get_question_for_response_attribute,
+        "user_appointment": questionnaire_index.get_question_for_appointment_attribute,
+    }
+    question_ids = set()
+    for mapping in template_flow.get_mappings():
+        for service in (
+            mapping.next_question_service,
+            mapping.previous_question_service,
+        ):
+            for kind, attribute in QUESTION_SERVICE_TARGETS.get(service, ()):
+                question = lookups[kind](attribute)
+                if question is not None and question.leader_question is not None:
+                    question = question.leader_question
+                if question is not None:
+                    question_ids.add(question.id)
+    return questionnaire_index.get_template_questions(template_flow, question_ids)
+
+
+def get_template_bundle_version(questionnaire_index, template_flow, organisation=None):
+    """
+    Return version of a template bundle rendered for the given organisation.
+
+    Bundle is rendered again whenever the questionnaire version is bumped, or when
+    the organisations version is bumped, i.e. organisation (or one of its child
+    organisations listed in organisation type questions) changes.
+    """
+    parts = [questionnaire_index.version, str(template_flow.template.id)]
+    if organisation is not None:
+        parts += [str(organisation.id), get_organisations_version()]
+    return hashlib.sha1(":".join(parts).encode()).hexdigest()
+
+
+def get_template_bundle_etag(data):
+    """
+    Return strong ETag of a rendered template bundle. It is derived from the content,
+    so it stays the same when changes of other templates bump the questionnaire version.
+    """
+    content = json.dumps(data, sort_keys=True, separators=(",", ":"), default=str)
+    return '"{}"'.format(hashlib.sha1(content.encode()).hexdigest())
+
+
+def etag_matches(etag, if_none_match):
+    """Weak comparison of an ETag against value of `If-None-Match` header."""
+    if not if_none_match:
+        return False
+    etags = parse_etags(if_none_match)
+    if "*" in etags:
+        return True
+    return etag in (e[2:] if e.startswith("W/") else e for e in etags)
@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+# Third Party Stuff
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .index import bump_questionnaire_version
+from .models import IntakeQuestionTemplate, Option, Question, TemplateQuestionMapping
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+@receiver(post_save, sender=Option)
+@receiver(post_delete, sender=Option)
+@receiver(post_save, sender=IntakeQuestionTemplate)
+@receiver(post_delete, sender=IntakeQuestionTemplate)
+@receiver(post_save, sender=TemplateQuestionMapping)
+@receiver(post_delete, sender=TemplateQuestionMapping)
+def invalidate_questionnaire_index(sender, **kwargs):
+    # Bump right away so this process sees the change, and again after commit so other
+    # processes can't keep an index rebuilt from the not yet committed data.
+    bump_questionnaire_version()
+    transaction.on_commit(bump_questionnaire_version)
@@ -5,7 +5,7 @@ from django_dynamic_fixture import G
 
 from beacon.answers import constants
 
-from ..models import Option, Question
+from ..models import IntakeQuestionTemplate, Option, Question, TemplateQuestionMapping
 
 
 def create_option(**kwargs):
@@ -26,6 +26,14 @@ def question(*args, **kwargs):
     return create_question()
 
 
+def create_template(**kwargs):
+    return G(IntakeQuestionTemplate, **kwargs)
+
+
+def create_template_question_mapping(**kwargs):
+    return G(TemplateQuestionMapping, **kwargs)
+
+
 def create_question_number_of_days_missed_work(**kwargs):
     data = {
         "kind": kwargs.get("kind", Question.NUMBER),
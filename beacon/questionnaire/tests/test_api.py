@@ -4,7 +4,13 @@ import pytest
 from django.urls import reverse
 
 # beacon Stuff
-from beacon.questionnaire.models import Question
+from beacon.answers import constants
+from beacon.answers.services import get_token_for_user_response
+from beacon.answers.tests import factories as answers_f
+from beacon.organisations.tests import factories as org_f
+from beacon.questionnaire import services
+from beacon.questionnaire.index import get_questionnaire_index
+from beacon.questionnaire.models import Question, TemplateQuestionMapping
 
 from . import factories as f
 
@@ -218,3 +224,190 @@ def test_get_appointment_start_questions(client):
 #     assert response.data.get('id') == str(question1.id)
 #     assert response.data.get('choices')[0].get('id') == str(option.id)
 #     assert response.data.get('choices')[0].get('next_question') == question3.id
+
+
+def _create_template_flow():
+    template = f.create_template(is_default=True)
+    question = f.create_question(
+        kind=Question.DROPDOWN,
+        user_response_attribute=constants.CHIEF_COMPLAINT1,
+        nested_question=None,
+        leader_question=None,
+    )
+    stress_question = f.create_question(nested_question=None, leader_question=None)
+    other_question = f.create_question(nested_question=None, leader_question=None)
+    stress_option = f.create_option(question=question, text_mapped_value="stress")
+    other_option = f.create_option(question=question, text_mapped_value="other")
+    f.create_template_question_mapping(
+        template=template,
+        question=question,
+        option=stress_option,
+        next_question=stress_question,
+        previous_question=None,
+        next_question_service=None,
+        previous_question_service=None,
+    )
+    f.create_template_question_mapping(
+        template=template,
+        question=question,
+        option=other_option,
+        next_question=other_question,
+        previous_question=other_question,
+        next_question_service=None,
+        previous_question_service=None,
+    )
+    return question, stress_question, other_question
+
+
+def test_get_next_question_from_template_flow(client, django_assert_max_num_queries):
+    question, stress_question, other_question = _create_template_flow()
+    user_response = answers_f.create_user_response(
+        response=[], chief_complaint1="stress", user=None
+    )
+    token = get_token_for_user_response(user_response, "authentication")
+    url = reverse("questions-get-next-question", kwargs={"pk": question.id})
+
+    response = client.json.get(url, HTTP_AUTHORIZATION=f"Token {token}")
+    assert response.status_code == 200
+    assert response.data["id"] == str(stress_question.id)
+
+    # Flow is compiled and organisations are loaded once, afterwards only the request
+    # savepoint and user response queries remain
+    with django_assert_max_num_queries(3):
+        response = client.json.get(url, HTTP_AUTHORIZATION=f"Token {token}")
+    assert response.data["id"] == str(stress_question.id)
+
+    user_response.chief_complaint1 = "other"
+    user_response.save()
+    response = client.json.get(url, HTTP_AUTHORIZATION=f"Token {token}")
+    assert response.data["id"] == str(other_question.id)
+
+    url = reverse("questions-get-previous-question", kwargs={"pk": question.id})
+    response = client.json.get(url, HTTP_AUTHORIZATION=f"Token {token}")
+    assert response.data["id"] == str(other_question.id)
+
+
+def test_template_flow_is_rebuilt_on_mapping_change(client):
+    question, stress_question, other_question = _create_template_flow()
+    user_response = answers_f.create_user_response(
+        response=[], chief_complaint1="stress", user=None
+    )
+    token = get_token_for_user_response(user_response, "authentication")
+    url = reverse("questions-get-next-question", kwargs={"pk": question.id})
+    response = client.json.get(url, HTTP_AUTHORIZATION=f"Token {token}")
+    assert response.data["id"] == str(stress_question.id)
+
+    mapping = TemplateQuestionMapping.objects.get(
+        question=question, option__text_mapped_value="stress"
+    )
+    mapping.next_question = other_question
+    mapping.save()
+
+    response = client.json.get(url, HTTP_AUTHORIZATION=f"Token {token}")
+    assert response.data["id"] == str(other_question.id)
+
+
+def test_get_template_bundle_with_etag(client):
+    question, stress_question, other_question = _create_template_flow()
+    start_question = f.create_question(
+        is_start=True, nested_question=None, leader_question=None
+    )
+    unrelated_question = f.create_question(nested_question=None, leader_question=None)
+    url = reverse("questions-template-bundle")
+
+    response = client.json.get(url)
+    assert response.status_code == 200
+    etag = response["ETag"]
+    assert etag.startswith('"')
+    question_ids = [q["id"] for q in response.data["questions"]]
+    assert set(question_ids) == {
+        str(question.id),
+        str(stress_question.id),
+        str(other_question.id),
+        str(start_question.id),
+    }
+    edges = {m["text_mapped_value"]: m for m in response.data["mappings"]}
+    assert edges["stress"]["next_question"] == stress_question.id
+    assert edges["other"]["next_question"] == other_question.id
+
+    response = client.json.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 304
+    assert response["ETag"] == etag
+
+    # Questions outside of the template flow don't change the bundle
+    unrelated_question.text = "Updated text"
+    unrelated_question.save()
+    response = client.json.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 304
+    assert response["ETag"] == etag
+
+    stress_question.text = "Updated text"
+    stress_question.save()
+    response = client.json.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response["ETag"] != etag
+
+
+def test_get_template_bundle_without_template(client):
+    response = client.json.get(reverse("questions-template-bundle"))
+    assert response.status_code == 204
+
+
+def test_get_template_bundle_with_questions_of_question_services(client):
+    question, stress_question, _ = _create_template_flow()
+    mapping = TemplateQuestionMapping.objects.filter(question=question).first()
+    nervous_question = f.create_question(
+        user_response_attribute=constants.HOW_OFTEN_NERVOUS,
+        nested_question=None,
+        leader_question=None,
+    )
+    leader_question = f.create_question(nested_question=None, leader_question=None)
+    employee_name_question = f.create_question(
+        user_response_attribute=constants.EMPLOYEE_NAME,
+        nested_question=None,
+        leader_question=leader_question,
+    )
+    f.create_template_question_mapping(
+        template=mapping.template,
+        question=stress_question,
+        option=None,
+        next_question=None,
+        previous_question=None,
+        next_question_service="starting_question_next_service",
+        previous_question_service="starting_question_previous_service",
+    )
+
+    response = client.json.get(reverse("questions-template-bundle"))
+    assert response.status_code == 200
+    question_ids = {q["id"] for q in response.data["questions"]}
+    assert str(nervous_question.id) in question_ids
+    # Followers are served along with their leader question
+    assert str(leader_question.id) in question_ids
+    assert str(employee_name_question.id) not in question_ids
+
+
+def test_question_services_declare_their_target_questions():
+    assert set(services.QUESTION_SERVICE_TARGETS) == set(
+        services.NEXT_QUESTION_SERVICES
+    ) | set(services.PREVIOUS_QUESTION_SERVICES)
+
+
+def test_template_bundle_version_follows_child_organisations(
+    django_assert_num_queries,
+):
+    _create_template_flow()
+    organisation = org_f.create_organisation(parent=None)
+    child = org_f.create_organisation(parent=organisation)
+    questionnaire_index = get_questionnaire_index()
+    template_flow = questionnaire_index.get_template_flow(None)
+
+    with django_assert_num_queries(0):
+        version = services.get_template_bundle_version(
+            questionnaire_index, template_flow, organisation
+        )
+
+    child.name = "Updated name"
+    child.save()
+    assert version != services.get_template_bundle_version(
+        questionnaire_index, template_flow, organisation
+    )
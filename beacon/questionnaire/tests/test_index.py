@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+# Third Party Stuff
+import pytest
+
+# beacon Stuff
+from beacon.answers import constants
+from beacon.answers.services import validate_response_json
+from beacon.questionnaire.index import get_questionnaire_index
+from beacon.questionnaire.models import Question
+
+from . import factories as f
+
+pytestmark = pytest.mark.django_db
+
+
+def test_validate_response_json_uses_cached_index(django_assert_num_queries):
+    question = f.create_question(
+        kind=Question.DROPDOWN,
+        user_response_attribute=constants.CHIEF_COMPLAINT1,
+        nested_question=None,
+    )
+    f.create_option(question=question, text="Stress", text_mapped_value="stress")
+    json_data = [{"question": str(question.id), "answer": "Stress"}]
+
+    validate_response_json(json_data)
+    with django_assert_num_queries(0):
+        validated_json = validate_response_json(json_data)
+
+    assert validated_json[0]["text_mapped_value"] == "stress"
+    assert validated_json[0]["user_response_attribute"] == constants.CHIEF_COMPLAINT1
+
+
+def test_questionnaire_index_is_rebuilt_on_option_change():
+    question = f.create_question(kind=Question.DROPDOWN, nested_question=None)
+    option = f.create_option(question=question, text="Yes", text_mapped_value="1")
+    index = get_questionnaire_index()
+    assert index.get_choice_values(question) == {"Yes": "1"}
+    assert get_questionnaire_index() is index
+
+    option.text_mapped_value = "2"
+    option.save()
+
+    new_index = get_questionnaire_index()
+    assert new_index is not index
+    assert new_index.get_choice_values(question) == {"Yes": "2"}
+
+
+def test_questionnaire_index_attribute_lookup_returns_latest_question():
+    f.create_question(user_response_attribute=constants.CHIEF_COMPLAINT2)
+    latest = f.create_question(user_response_attribute=constants.CHIEF_COMPLAINT2)
+
+    index = get_questionnaire_index()
+    assert (
+        index.get_question_for_response_attribute(constants.CHIEF_COMPLAINT2)
+        == Question.objects.filter(
+            user_response_attribute=constants.CHIEF_COMPLAINT2
+        ).first()
+    )
+    assert index.get_question(str(latest.id)) == latest
+    assert index.get_question(None) is None
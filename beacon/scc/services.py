@@ -665,7 +665,10 @@ def sync_user_and_get_changes(user_obj, user_serializer, bwb_data):
     old_user_response_data = model_to_json_serializable_dict(
         old_user_response, exclude=("response", "response_backup")
     )
-    save_answer_serializer(answer_serializer, user_obj, answer_data)
+    if not save_answer_serializer(answer_serializer, user_obj, answer_data):
+        # Answers are unchanged, so there is nothing more to diff.
+        return user_diff
+
     user_obj.refresh_from_db()
     updated_user_response = user_obj.answer if hasattr(user_obj, "answer") else None
     updated_user_response_data = model_to_json_serializable_dict(
@@ -9,6 +9,7 @@ from django.contrib.auth import get_user_model
 from django.urls import reverse
 
 # beacon Stuff
+from beacon.answers import services as answer_services
 from beacon.answers.tests import factories as answer_f
 from beacon.organisations.tests import factories as organisation_f
 from beacon.questionnaire.tests import factories as question_f
@@ -519,10 +520,10 @@ def test_response_json_changed_and_backup_not_present_then_create_new_backup(
     assert response.status_code == 200
 
     answer.refresh_from_db()
-    response_backup = answer.response_backup
-    assert response_backup is not None
-    assert len(response_backup) == 1
-    assert str(old_response_json) in str(response_backup)
+    assert answer.response_backup is None
+    response_backups = answer_services.get_user_response_backups(answer)
+    assert len(response_backups) == 1
+    assert response_backups[0][1] == old_response_json
     mock_mdlive_and_cognito_sync.assert_called()
 
 
@@ -555,11 +556,13 @@ def test_response_json_changed_and_backup_present_then_add_data_to_older_backup(
     assert response.status_code == 200
 
     answer.refresh_from_db()
-    response_backup = answer.response_backup
-    assert response_backup is not None
-    assert len(response_backup) == 2
-    assert str(old_response_json) in str(response_backup)
-    assert existing_backup.items() <= response_backup.items()
+    # Legacy backup is moved to the backup table ahead of the new one
+    assert answer.response_backup is None
+    response_backups = answer_services.get_user_response_backups(answer)
+    assert len(response_backups) == 2
+    assert response_backups[0][1] == {"dummy": "test"}
+    assert str(response_backups[0][0]).startswith("2021-12-08 20:05:50.175795")
+    assert response_backups[1][1] == old_response_json
     mock_mdlive_and_cognito_sync.assert_called()
 
 
@@ -597,11 +600,41 @@ def test_if_response_json_not_changed_then_do_not_create_backup(
     assert response.status_code == 200
 
     answer.refresh_from_db()
-    response_backup = answer.response_backup
-    assert response_backup is None
+    assert answer.response_backup is None
+    assert not answer.backups.exists()
     mock_mdlive_and_cognito_sync.assert_called()
 
 
+def test_force_sync_with_unchanged_answers_skips_answer_write(
+    client, mock_mdlive_and_cognito_sync
+):
+    question_f.create_question_number_of_days_missed_work()
+    scc_data = {"outcomesESDQuestion1": "11"}
+    user = user_f.create_user(email="email@test.com")
+    answer_f.create_user_response(user=user, response=[], response_backup=None)
+
+    url = reverse("users-force-sync", kwargs={"pk": str(user.id)})
+    auth_token = generate_incoming_scc_auth_token()
+    response = client.json.put(
+        url,
+        data=json.dumps(scc_data),
+        **{"HTTP_AUTHORIZATION": f"Token {auth_token}"},
+    )
+    assert response.status_code == 200
+    user.refresh_from_db()
+    modified_at = user.answer.modified_at
+
+    response = client.json.put(
+        url,
+        data=json.dumps(scc_data),
+        **{"HTTP_AUTHORIZATION": f"Token {auth_token}"},
+    )
+    assert response.status_code == 200
+    user.refresh_from_db()
+    assert user.answer.modified_at == modified_at
+    assert not user.answer.backups.exists()
+
+
 def test_response_json_backup_gets_created_in_user_sync_api(
     client, mock_mdlive_and_cognito_sync
 ):
@@ -636,10 +669,9 @@ def test_response_json_backup_gets_created_in_user_sync_api(
 
     answer.refresh_from_db()
     assert answer.response is not None
-    assert answer.response_backup is not None
     assert "number_of_days_missed_work" in str(answer.response)
     assert "10" in str(answer.response)
-    assert str(old_response_json) in str(answer.response_backup)
+    assert answer_services.get_user_response_backup(answer) == old_response_json
     mock_mdlive_and_cognito_sync.assert_called()
 
 
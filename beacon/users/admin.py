@@ -23,7 +23,10 @@ from beacon.base.utils.csv_export import convert_to_dataframe
 from beacon.campaign_monitor.services import add_multiple_subscribers
 
 from .models import ReadOnlyProxyUser, User, UserAgent
-from .services import sync_user_data_with_cognito_and_mdlive
+from .services import (
+    remove_all_user_tokens_from_cache,
+    sync_user_data_with_cognito_and_mdlive,
+)
 from .utils import get_changed_dict_keys
 
 
@@ -235,6 +238,11 @@ class UserAdmin(VersionAdmin, AuthUserAdmin):
             kwargs["queryset"] = db_field.related_model.objects.filter(is_active=True)
         return super().formfield_for_foreignkey(db_field, request, **kwargs)
 
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if change and "is_active" in form.changed_data and not obj.is_active:
+            remove_all_user_tokens_from_cache(obj.id)
+
     def has_add_permission(self, request):
         return request.user.is_superuser
 
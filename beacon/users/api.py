@@ -16,6 +16,7 @@ from beacon.answers.serializers import (
     UpdateUserResponseSerializer,
 )
 from beacon.answers.services import (
+    add_or_update_answers,
     replace_or_append_response,
     set_attributes_from_response_json,
     validate_single_response,
@@ -26,12 +27,16 @@ from beacon.cognito import services as cognito_services
 from beacon.mdlive import services as mdlive_services
 from beacon.organisations.models import Organisation
 from beacon.organisations.services import get_organisation
-from beacon.questionnaire.models import Question
+from beacon.questionnaire.index import get_questionnaire_index
 from beacon.users import services as user_services
 
 from . import models, serializers
-from .services import remove_user_token_from_cache, update_or_create_user_agent
-from .tasks import sync_user_mdlive_messages
+from .services import (
+    remove_all_user_tokens_from_cache,
+    remove_user_token_from_cache,
+    update_or_create_user_agent,
+)
+from .tasks import schedule_user_mdlive_messages_sync
 from .utils import get_relationship_from_user
 import environ
 
@@ -62,10 +67,7 @@ class AuthViewSet(MultipleSerializerMixin, viewsets.GenericViewSet):
         user, cognito_user = user_services.get_and_authenticate_user(
             **serializer.validated_data
         )
-        organisation, _ = get_organisation(
-            request,
-            queryset=Organisation.objects.filter(is_active=True, parent__isnull=True),
-        )
+        organisation, _ = get_organisation(request)
         if organisation and user.organisation:
             child_organisations = [
                 str(org_id)
@@ -90,7 +92,7 @@ class AuthViewSet(MultipleSerializerMixin, viewsets.GenericViewSet):
         mdlive_user_token_data = mdlive_services.get_user_token(
             mdlive_data, organisation=user.organisation
         )
-        sync_user_mdlive_messages.delay(str(user.id))
+        schedule_user_mdlive_messages_sync(str(user.id))
         update_or_create_user_agent(user, request)
         ctx = self.get_serializer_context()
         ctx["mdlive_user_token_data"] = mdlive_user_token_data
@@ -186,6 +188,8 @@ class AuthViewSet(MultipleSerializerMixin, viewsets.GenericViewSet):
         )
         user.set_password(serializer.validated_data["new_password"])
         user.save()
+        # Other sessions could have been started with the old password
+        remove_all_user_tokens_from_cache(user.id, request=request)
         return response.Ok({"message": "Password changed successfully!"})
 
     @action(
@@ -224,6 +228,7 @@ class AuthViewSet(MultipleSerializerMixin, viewsets.GenericViewSet):
             user.set_password(serializer.validated_data["new_password"])
             user.num_of_failed_login_attempts = 0
             user.save()
+            remove_all_user_tokens_from_cache(user.id)
             return response.Ok({"message": "Password changed successfully!"})
         raise ValidationError("Either email or otp is invalid!")
 
@@ -254,8 +259,8 @@ class CurrentUserViewSet(MultipleSerializerMixin, viewsets.GenericViewSet):
             birth_date_str=user.birthdate.strftime("%Y-%m-%d"),
             relationship=relationship,
         )
-        mdlive_user_token_data = mdlive_services.get_user_token(
-            mdlive_data, organisation=user.organisation
+        mdlive_user_token_data = mdlive_services.get_cached_user_token(
+            user, mdlive_data, organisation=user.organisation
         )
         ctx = self.get_serializer_context()
         ctx["mdlive_user_token_data"] = mdlive_user_token_data
@@ -317,16 +322,16 @@ class CurrentUserViewSet(MultipleSerializerMixin, viewsets.GenericViewSet):
 
         if not user_response_instance:
             raise ValidationError("No user response found to update appointment_state.")
-        questions_qs = Question.objects.filter(
-            user_response_attribute="appointment_state"
+        questionnaire_index = get_questionnaire_index()
+        question = questionnaire_index.get_question_for_response_attribute(
+            "appointment_state"
         )
         answer_response = {
-            "question": str(questions_qs.first().id),
+            "question": str(question.id),
             "answer": appointment_state,
         }
-        answer = validate_single_response(answer_response, questions_qs)
-        replace_or_append_response(user_response_instance, [answer])
-        set_attributes_from_response_json(user_response_instance)
+        answer = validate_single_response(answer_response, questionnaire_index)
+        add_or_update_answers(user_response_instance, [answer])
         return response.Ok({"message": "Appointment State updated successfully!"})
 
 
@@ -434,10 +439,7 @@ class DFDRegistration(APIView):
 from rest_framework_api_key.permissions import HasAPIKey
 from rest_framework_api_key.models import APIKey
 from django.conf import settings
-from django.core.signing import TimestampSigner
-import jwt
-
-ALGORITHM = "HS256"
+from beacon.base.utils.tokens import unsign_token
 
 
 class DFDlogin(APIView):
@@ -492,7 +494,7 @@ class DFDlogin(APIView):
                     mdlive_user_token_data = mdlive_services.get_user_token(
                         mdlive_data, organisation=user.organisation
                     )
-                    sync_user_mdlive_messages.delay(str(user.id))
+                    schedule_user_mdlive_messages_sync(str(user.id))
                     update_or_create_user_agent(user, request)
                     ctx = self.get_serializer_context()
                     ctx["mdlive_user_token_data"] = mdlive_user_token_data
@@ -518,9 +520,7 @@ class DFDlogin(APIView):
 
             max_age_in_minutes = settings.JWT_TOKEN_EXPIRATION_DURATION
             token = request.headers.get('Authorization')
-            signer = TimestampSigner()
-            token1 = signer.unsign(token, max_age=60 * max_age_in_minutes)
-            data = jwt.decode(token1, settings.SECRET_KEY, algorithms=[ALGORITHM])
+            data = unsign_token(token, max_age=60 * max_age_in_minutes)
 
             model_cls = get_user_model()
             scope = 'authentication'
@@ -537,7 +537,7 @@ class DFDlogin(APIView):
             mdlive_user_token_data = mdlive_services.get_user_token(
                 mdlive_data, organisation=user.organisation
             )
-            sync_user_mdlive_messages.delay(str(user.id))
+            schedule_user_mdlive_messages_sync(str(user.id))
             update_or_create_user_agent(user, request)
             ctx = self.get_serializer_context()
             ctx["mdlive_user_token_data"] = mdlive_user_token_data
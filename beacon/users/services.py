@@ -1,7 +1,9 @@
 # -*- coding: utf-8 -*-
 # Standard Library
 import csv
+import hashlib
 import time
+import uuid
 from datetime import datetime
 from smtplib import SMTPException
 from typing import TYPE_CHECKING, Any, Dict, Optional, Union
@@ -25,6 +27,7 @@ from rest_framework.exceptions import ValidationError
 from beacon.answers.models import UserAppointment, UserResponse
 from beacon.base.exceptions import NotVerified
 from beacon.base.models import UserCSVUpload
+from beacon.base.utils.tokens import verified_tokens
 from beacon.campaign_monitor.services import (
     add_multiple_subscribers_from_data,
     add_new_subscriber,
@@ -49,7 +52,10 @@ if TYPE_CHECKING:
 
 
 def get_cache_key(key, **kwargs):
-    mapping = {"USER_TOKEN": "user:{id}:tokens"}
+    mapping = {
+        "USER_SESSION": "user:{id}:session:{token_hash}",
+        "USER_SESSION_GENERATION": "user:{id}:session-generation",
+    }
     return mapping[key].format(**kwargs)
 
 
@@ -59,30 +65,76 @@ def get_default_user_password(first_name, last_name, birth_date):
     )
 
 
+# Logged in sessions are tracked with a cache key per token, holding the user's session
+# generation at login and expiring along with the token. Generations are random, and
+# replacing the generation logs the user out of all sessions at once. The generation
+# outlives every session started under it, and if it is missing anyway, e.g. evicted,
+# sessions aren't accepted rather than brought back to life.
+def _get_user_session_cache_key(user_id, token):
+    token_hash = hashlib.sha256(token.encode()).hexdigest()
+    return get_cache_key("USER_SESSION", id=user_id, token_hash=token_hash)
+
+
+def _get_user_session_generation_cache_key(user_id):
+    return get_cache_key("USER_SESSION_GENERATION", id=user_id)
+
+
+def _get_user_session_generation_timeout(max_age_in_minutes):
+    return 60 * max(max_age_in_minutes, settings.JWT_TOKEN_EXPIRATION_DURATION)
+
+
 def set_logged_in_user_token_to_cache(
     user_id, token, max_age_in_minutes=settings.JWT_TOKEN_EXPIRATION_DURATION
 ):
-    cache_key = get_cache_key("USER_TOKEN", id=user_id)
-    user_tokens = cache.get(cache_key, [])
-    user_tokens.append(token)
-    cache.set(cache_key, user_tokens, timeout=60 * max_age_in_minutes)
+    generation_key = _get_user_session_generation_cache_key(user_id)
+    generation_timeout = _get_user_session_generation_timeout(max_age_in_minutes)
+    generation = cache.get(generation_key)
+    if generation is None:
+        cache.add(generation_key, uuid.uuid4().hex, timeout=generation_timeout)
+        generation = cache.get(generation_key)
+    else:
+        cache.touch(generation_key, timeout=generation_timeout)
+    cache.set(
+        _get_user_session_cache_key(user_id, token),
+        generation,
+        timeout=60 * max_age_in_minutes,
+    )
 
 
-def get_logged_in_user_tokens_from_cache(user_id):
-    cache_key = get_cache_key("USER_TOKEN", id=user_id)
-    user_tokens = cache.get(cache_key, [])
-    return user_tokens
+def is_logged_in_user_token(user_id, token):
+    session_key = _get_user_session_cache_key(user_id, token)
+    generation_key = _get_user_session_generation_cache_key(user_id)
+    values = cache.get_many([session_key, generation_key])
+    if session_key not in values or generation_key not in values:
+        return False
+    return values[session_key] == values[generation_key]
 
 
-def remove_user_token_from_cache(
-    request, max_age_in_minutes=settings.JWT_TOKEN_EXPIRATION_DURATION
-):
+def remove_user_token_from_cache(request):
     user_id = str(request.user.id)
     token = get_auth_token_from_request(request)
-    cache_key = get_cache_key("USER_TOKEN", id=user_id)
-    user_tokens = cache.get(cache_key, [])
-    user_tokens = [t for t in user_tokens if t != token]
-    cache.set(cache_key, user_tokens, timeout=60 * max_age_in_minutes)
+    verified_tokens.discard(token)
+    if token is not None:
+        cache.delete(_get_user_session_cache_key(user_id, token))
+
+
+def remove_all_user_tokens_from_cache(user_id, request=None):
+    """
+    Log the user out of all sessions, e.g. once their password changed or they are
+    deactivated
+    :param request: Request of the session to keep logged in, if any
+    """
+    user_id = str(user_id)
+    cache.set(
+        _get_user_session_generation_cache_key(user_id),
+        uuid.uuid4().hex,
+        timeout=_get_user_session_generation_timeout(
+            settings.JWT_TOKEN_EXPIRATION_DURATION
+        ),
+    )
+    token = get_auth_token_from_request(request) if request is not None else None
+    if token is not None:
+        set_logged_in_user_token_to_cache(user_id, token)
 
 
 def get_bwb_data(
@@ -331,7 +383,9 @@ def create_user_account(
                 # So, we will re-update the account
                 # on their end with the actual
                 # info that we have
-                mdlive_services.get_mdlive_token_data_for_user(existing_user)
+                mdlive_services.get_mdlive_token_data_for_user(
+                    existing_user, refresh=True
+                )
                 raise ValidationError(
                     "This user account exists on MDlive and can't be created."
                 )
@@ -772,7 +826,7 @@ def sync_user_data_with_cognito_and_mdlive(
         # updating an inactive user on MDLive marks that user active in their system.
         if user_obj.is_active or new_user_data.get("is_active", None):
             mdlive_services.get_mdlive_token_data_for_user(
-                user=user_obj, data_to_update=new_user_data
+                user=user_obj, data_to_update=new_user_data, refresh=True
             )
     except ValidationError as e:
         if raise_mdlive_exception:
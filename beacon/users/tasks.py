@@ -8,6 +8,7 @@ from celery import shared_task
 from django.apps import apps
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.core.mail import BadHeaderError
 from django.forms.models import model_to_dict
 from django_sites import get_by_id as get_site_by_id
@@ -19,6 +20,7 @@ from rest_framework.exceptions import ValidationError
 # beacon Stuff
 from beacon.base.models import UserCSVUpload
 from beacon.cognito import tasks as cognito_tasks
+from beacon.mdlive import constants as mdlive_constants
 from beacon.users.choices import USER_DEACTIVATION_CHOICES
 
 from .utils import (
@@ -197,20 +199,114 @@ def send_users_to_campaign_monitor_from_csv(self):
     services.send_users_to_campaign_monitor_from_csv()
 
 
+def get_mdlive_sync_cache_keys(user_id):
+    return (
+        mdlive_constants.MDLIVE_SYNC_PENDING_CACHE_KEY.format(user_id=user_id),
+        mdlive_constants.MDLIVE_SYNC_EMAIL_CACHE_KEY.format(user_id=user_id),
+        mdlive_constants.MDLIVE_SYNC_RUNNING_CACHE_KEY.format(user_id=user_id),
+    )
+
+
+def _incr_cache_counter(key, timeout):
+    """
+    Atomically increment counter stored in cache
+    :return True if the counter was empty, False if it was already counting
+    """
+    if cache.add(key, 1, timeout=timeout):
+        return True
+    try:
+        return cache.incr(key) <= 1
+    except ValueError:
+        # Counter expired in the meantime
+        cache.add(key, 1, timeout=timeout)
+        return True
+
+
+def schedule_user_mdlive_messages_sync(user_id, send_new_message_email=False):
+    """
+    Schedule sync of user's MDLive messages, merging it with an already pending sync
+    The first event starts a debounce window and enqueues `sync_user_mdlive_messages`
+    to run at its end, further events only increment the pending events count.
+    :param user_id: users.User id
+    :param send_new_message_email: Email the user about new messages after the sync
+    :return True if a sync got enqueued, False if the event was merged into pending one
+    """
+    user_id = str(user_id)
+    pending_key, email_key, _ = get_mdlive_sync_cache_keys(user_id)
+    timeout = (
+        mdlive_constants.MDLIVE_SYNC_DEBOUNCE_SECONDS
+        + mdlive_constants.MDLIVE_SYNC_LOCK_TIMEOUT
+    )
+    if send_new_message_email is True:
+        _incr_cache_counter(email_key, timeout)
+    if not _incr_cache_counter(pending_key, timeout):
+        return False
+    sync_user_mdlive_messages.apply_async(
+        args=[user_id],
+        kwargs={"coalesced": True},
+        countdown=mdlive_constants.MDLIVE_SYNC_DEBOUNCE_SECONDS,
+    )
+    return True
+
+
 @shared_task(bind=True)
-def sync_user_mdlive_messages(self, user_id, send_new_message_email=False):
+def sync_user_mdlive_messages(
+    self, user_id, send_new_message_email=False, coalesced=False
+):
+    """
+    Sync user's contacts and messages from MDLive, see `schedule_user_mdlive_messages_sync`
+    Only one sync per user runs at a time. If events arrive while a sync is running,
+    another sync is scheduled once it's done.
+    :param coalesced: Task was scheduled for pending events, it's skipped if another
+                      sync already picked them up
+    """
     # Importing internally to avoid circular import
     from beacon.mdlive import services
-    from beacon.mdlive.models import Contact
 
-    user_model = get_user_model()
-    user = user_model.objects.filter(id=user_id).first()
-    services.sync_user_contacts(user)
-    contacts = Contact.objects.select_related("provider").filter(user=user)
-    for contact in contacts:
-        services.sync_user_messages(user, contact.provider.mdlive_id)
-    if send_new_message_email is True:
-        services.send_new_message_email_to_user(user)
+    user_id = str(user_id)
+    pending_key, email_key, running_key = get_mdlive_sync_cache_keys(user_id)
+    lock_id = self.request.id or "sync"
+    if not cache.add(
+        running_key, lock_id, timeout=mdlive_constants.MDLIVE_SYNC_LOCK_TIMEOUT
+    ):
+        log.info(f"Sync of MDLive messages already running for user: {user_id}")
+        return
+
+    try:
+        events_count = max(cache.get(pending_key) or 0, 0)
+        email_requests = max(cache.get(email_key) or 0, 0)
+        if coalesced and not events_count and not email_requests:
+            return
+        # Only consume what was read, so events and email requests received in the
+        # meantime are kept for the follow-up sync
+        for key, count in ((pending_key, events_count), (email_key, email_requests)):
+            if count:
+                try:
+                    cache.decr(key, count)
+                except ValueError:
+                    pass
+        send_new_message_email = send_new_message_email or email_requests > 0
+        log.info(
+            f"Syncing MDLive messages for user: {user_id}, merged events: {events_count}",
+            extra={"user_id": user_id, "merged_events": events_count},
+        )
+
+        user_model = get_user_model()
+        user = user_model.objects.filter(id=user_id).first()
+        services.sync_user_contacts_and_messages(user)
+        if send_new_message_email is True:
+            services.send_new_message_email_to_user(user)
+    finally:
+        if cache.get(running_key) == lock_id:
+            cache.delete(running_key)
+
+    if (cache.get(pending_key) or 0) > 0 or (cache.get(email_key) or 0) > 0:
+        # Events received during the sync
+        sync_user_mdlive_messages.apply_async(
+            args=[user_id],
+            kwargs={"coalesced": True},
+            countdown=mdlive_constants.MDLIVE_SYNC_DEBOUNCE_SECONDS,
+        )
 
 
 @shared_task(bind=True)
@@ -224,7 +320,10 @@ def sync_users_active_status_with_organisation_task(self, org_id, is_active):
     :param is_active: latest active status of the organisation
     """
     # Importing internally to avoid circular import
-    from .services import get_cognito_data_from_user_data
+    from .services import (
+        get_cognito_data_from_user_data,
+        remove_all_user_tokens_from_cache,
+    )
 
     if not is_active:
         # Deactivate all the active users of the organisation
@@ -246,6 +345,8 @@ def sync_users_active_status_with_organisation_task(self, org_id, is_active):
         cognito_tasks.update_user_on_cognito_task.delay(
             user_id=user.id, cognito_data=cognito_data
         )
+        if not is_active:
+            remove_all_user_tokens_from_cache(user.id)
     users_qs.update(is_active=is_active, deactivation_reason=new_deactivation_reason)
 
 
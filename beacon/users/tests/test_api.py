@@ -12,11 +12,13 @@ from django.urls import reverse
 from beacon.answers import constants
 from beacon.answers.models import UserAppointment, UserResponse
 from beacon.answers.tests import factories as answers_f
+from beacon.base import exceptions as exc
 from beacon.cognito.tests import factories as cognito_f
 from beacon.organisations.tests import factories as org_f
 from beacon.questionnaire.models import Question
 from beacon.questionnaire.tests import factories as questionnaire_f
 
+from .. import tokens
 from ..models import UserAgent
 from . import factories as f
 
@@ -44,7 +46,9 @@ def test_user_registration(client, mocker):
     )
     mdlive_response = namedtuple("mdlive_response", ["status_code", "content"])
     mdlive_res = mdlive_response(200, json.dumps(mdlive_res_data))
-    mocked_mdlive_user_token = mocker.patch("beacon.mdlive.services.requests_post")
+    mocked_mdlive_user_token = mocker.patch(
+        "beacon.mdlive.mdlive_api.MDLiveClient.post"
+    )
     mocked_mdlive_user_token.return_value = mdlive_res
     mocked_mdlive_timezone_sync_task = mocker.patch(
         "beacon.users.services.mdlive_tasks.sync_user_timezone_with_mdlive_timezone_id_task.delay"
@@ -159,12 +163,14 @@ def test_user_login(client, mocker):
     url = reverse("auth-login")
     user, mdlive_res, cognito_res = f.create_user_with_mocked_values()
     mdlive_res_data = json.loads(mdlive_res.content)
-    mocked_mdlive_user_token = mocker.patch("beacon.mdlive.services.requests_post")
+    mocked_mdlive_user_token = mocker.patch(
+        "beacon.mdlive.mdlive_api.MDLiveClient.post"
+    )
     mocked_mdlive_user_token.return_value = mdlive_res
     mocked_cognito = mocker.patch("beacon.cognito.services.Cognito")
     mocked_cognito.return_value = cognito_res
     mocked_sync_user_messages = mocker.patch(
-        "beacon.users.api.sync_user_mdlive_messages.delay"
+        "beacon.users.api.schedule_user_mdlive_messages_sync"
     )
 
     assert UserAgent.objects.first() is None
@@ -220,11 +226,13 @@ def test_user_logout(client, mocker):
     me_url = reverse("me")
     url = reverse("auth-logout")
     user, mdlive_res, cognito_res = f.create_user_with_mocked_values()
-    mocked_mdlive_user_token = mocker.patch("beacon.mdlive.services.requests_post")
+    mocked_mdlive_user_token = mocker.patch(
+        "beacon.mdlive.mdlive_api.MDLiveClient.post"
+    )
     mocked_mdlive_user_token.return_value = mdlive_res
     mocked_cognito = mocker.patch("beacon.cognito.services.Cognito")
     mocked_cognito.return_value = cognito_res
-    mocker.patch("beacon.users.api.sync_user_mdlive_messages.delay")
+    mocker.patch("beacon.users.api.schedule_user_mdlive_messages_sync")
 
     credentials = {"email": user.email, "password": "TestUser01"}
     response = client.json.post(login_url, json.dumps(credentials))
@@ -244,11 +252,13 @@ def test_extend_token(client, mocker):
     login_url = reverse("auth-login")
     url = reverse("auth-extend-token")
     user, mdlive_res, cognito_res = f.create_user_with_mocked_values()
-    mocked_mdlive_user_token = mocker.patch("beacon.mdlive.services.requests_post")
+    mocked_mdlive_user_token = mocker.patch(
+        "beacon.mdlive.mdlive_api.MDLiveClient.post"
+    )
     mocked_mdlive_user_token.return_value = mdlive_res
     mocked_cognito = mocker.patch("beacon.cognito.services.Cognito")
     mocked_cognito.return_value = cognito_res
-    mocker.patch("beacon.users.api.sync_user_mdlive_messages.delay")
+    mocker.patch("beacon.users.api.schedule_user_mdlive_messages_sync")
 
     credentials = {"email": user.email, "password": "TestUser01"}
     response = client.json.post(login_url, json.dumps(credentials))
@@ -292,8 +302,10 @@ def test_user_password_change(client, mocker):
     client.logout()
 
     url = reverse("auth-login")
-    mocker.patch("beacon.users.api.sync_user_mdlive_messages.delay")
-    mocked_mdlive_user_token = mocker.patch("beacon.mdlive.services.requests_post")
+    mocker.patch("beacon.users.api.schedule_user_mdlive_messages_sync")
+    mocked_mdlive_user_token = mocker.patch(
+        "beacon.mdlive.mdlive_api.MDLiveClient.post"
+    )
     mocked_mdlive_user_token.return_value = mdlive_res
     credentials = {"email": user.email, "password": new_password}
 
@@ -360,6 +372,7 @@ def test_user_password_reset_and_confirm(client, mocker):
     mocked_cognito = mocker.patch("beacon.cognito.services.Cognito")
     mocked_cognito.return_value = cognito_res
 
+    token = tokens.get_token_for_user(user, "authentication")
     new_password = "CompLicatedpaSswOrd2$"
     password_reset_confirm_data = {
         "email": user.email,
@@ -372,6 +385,9 @@ def test_user_password_reset_and_confirm(client, mocker):
 
     user.refresh_from_db()
     assert user.check_password(new_password)
+    # User is logged out of sessions started with the old password
+    with pytest.raises(exc.NotAuthenticated):
+        tokens.get_user_for_token(token, "authentication")
 
 
 def test_get_current_user_api(client, mocker):
@@ -379,7 +395,9 @@ def test_get_current_user_api(client, mocker):
     user, mdlive_res, cognito_res = f.create_user_with_mocked_values()
     mocked_cognito = mocker.patch("beacon.cognito.services.Cognito")
     mocked_cognito.return_value = cognito_res
-    mocked_mdlive_user_token = mocker.patch("beacon.mdlive.services.requests_post")
+    mocked_mdlive_user_token = mocker.patch(
+        "beacon.mdlive.mdlive_api.MDLiveClient.post"
+    )
     mocked_mdlive_user_token.return_value = mdlive_res
 
     # should require auth
@@ -428,7 +446,7 @@ def test_update_appointment_state_api(client, mocker):
     user, mdlive_res, cognito_res = f.create_user_with_mocked_values()
     # mocked_cognito = mocker.patch("beacon.cognito.services.Cognito")
     # mocked_cognito.return_value = cognito_res
-    # mocked_mdlive_user_token = mocker.patch("beacon.mdlive.services.requests_post")
+    # mocked_mdlive_user_token = mocker.patch("beacon.mdlive.mdlive_api.MDLiveClient.post")
     # mocked_mdlive_user_token.return_value = mdlive_res
     payload = {"appointment_state": "Florida"}
     # should require auth
@@ -501,7 +519,9 @@ def test_update_user_responses_api(client, mocker):
     user, mdlive_res, cognito_res = f.create_user_with_mocked_values()
     mocked_cognito = mocker.patch("beacon.cognito.services.Cognito")
     mocked_cognito.return_value = cognito_res
-    mocked_mdlive_user_token = mocker.patch("beacon.mdlive.services.requests_post")
+    mocked_mdlive_user_token = mocker.patch(
+        "beacon.mdlive.mdlive_api.MDLiveClient.post"
+    )
     mocked_mdlive_user_token.return_value = mdlive_res
     answers_f.create_user_response(
         chief_complaint1="Anxiety",
@@ -1,11 +1,18 @@
 # -*- coding: utf-8 -*-
+# Standard Library
+import time
 
 # Third Party Stuff
 import pytest
+from django.conf import settings
+from django.core.cache import cache
+from django.core.signing import TimestampSigner
 from django.forms.models import model_to_dict
+from django.test import RequestFactory
 
 # beacon Stuff
-from beacon.users import services
+from beacon.base import exceptions as exc
+from beacon.users import services, tasks, tokens
 
 from . import factories
 
@@ -67,3 +74,159 @@ def test_activating_an_inactive_user_is_sent_to_cognito_and_mdlive(client, mocke
     )
     assert mocked_cognito.called
     assert mocked_mdlive.called
+
+
+def test_verified_token_skips_signature_check_until_expired_or_logged_out(mocker):
+    user = factories.create_user()
+    token = tokens.get_token_for_user(user, "authentication")
+    unsign = mocker.spy(TimestampSigner, "unsign")
+
+    assert tokens.get_user_for_token(token, "authentication") == user
+    assert tokens.get_user_for_token(token, "authentication") == user
+    assert unsign.call_count == 1
+
+    # Token's age is still checked for cached tokens
+    mocker.patch(
+        "beacon.base.utils.tokens.time.time",
+        return_value=time.time() + 60 * settings.JWT_TOKEN_EXPIRATION_DURATION + 1,
+    )
+    with pytest.raises(exc.NotAuthenticated):
+        tokens.get_user_for_token(token, "authentication")
+    mocker.stopall()
+
+    # Logged out tokens aren't accepted, even though they were verified before
+    token = tokens.get_token_for_user(user, "authentication")
+    assert tokens.get_user_for_token(token, "authentication") == user
+    request = RequestFactory().post("/", HTTP_AUTHORIZATION=f"Token {token}")
+    request.user = user
+    services.remove_user_token_from_cache(request)
+    with pytest.raises(exc.NotAuthenticated):
+        tokens.get_user_for_token(token, "authentication")
+
+
+def test_session_registry_removes_single_or_all_sessions(mocker):
+    user = factories.create_user()
+    user_id = str(user.id)
+    first_token = tokens.get_token_for_user(user, "authentication")
+    # Tokens signed in the same second are equal, so sign the second one later
+    mocker.patch("django.core.signing.time.time", return_value=time.time() + 5)
+    second_token = tokens.get_token_for_user(user, "authentication")
+    mocker.stopall()
+    other_user_token = tokens.get_token_for_user(
+        factories.create_user(), "authentication"
+    )
+    assert services.is_logged_in_user_token(user_id, first_token)
+    assert services.is_logged_in_user_token(user_id, second_token)
+    assert not services.is_logged_in_user_token(user_id, other_user_token)
+
+    request = RequestFactory().post("/", HTTP_AUTHORIZATION=f"Token {first_token}")
+    request.user = user
+    services.remove_user_token_from_cache(request)
+    assert not services.is_logged_in_user_token(user_id, first_token)
+    assert services.is_logged_in_user_token(user_id, second_token)
+
+    services.remove_all_user_tokens_from_cache(user_id)
+    assert not services.is_logged_in_user_token(user_id, second_token)
+    with pytest.raises(exc.NotAuthenticated):
+        tokens.get_user_for_token(second_token, "authentication")
+
+    # Sessions started afterwards are valid again
+    third_token = tokens.get_token_for_user(user, "authentication")
+    assert tokens.get_user_for_token(third_token, "authentication") == user
+
+    # Session of the request stays logged in
+    mocker.patch("django.core.signing.time.time", return_value=time.time() + 10)
+    fourth_token = tokens.get_token_for_user(user, "authentication")
+    mocker.stopall()
+    request = RequestFactory().post("/", HTTP_AUTHORIZATION=f"Token {fourth_token}")
+    services.remove_all_user_tokens_from_cache(user.id, request=request)
+    assert not services.is_logged_in_user_token(user_id, third_token)
+    assert services.is_logged_in_user_token(user_id, fourth_token)
+
+    # Sessions aren't accepted once the generation is gone, e.g. evicted
+    cache.delete(services._get_user_session_generation_cache_key(user_id))
+    assert not services.is_logged_in_user_token(user_id, fourth_token)
+    fifth_token = tokens.get_token_for_user(user, "authentication")
+    assert services.is_logged_in_user_token(user_id, fifth_token)
+
+
+def test_mdlive_messages_syncs_are_coalesced_per_user(mocker):
+    user = factories.create_user()
+    mocked_apply_async = mocker.patch(
+        "beacon.users.tasks.sync_user_mdlive_messages.apply_async"
+    )
+    mocked_sync = mocker.patch("beacon.mdlive.services.sync_user_contacts_and_messages")
+    mocked_email = mocker.patch("beacon.mdlive.services.send_new_message_email_to_user")
+
+    # Burst of events enqueues a single debounced sync
+    assert tasks.schedule_user_mdlive_messages_sync(user.id) is True
+    assert tasks.schedule_user_mdlive_messages_sync(user.id) is False
+    assert (
+        tasks.schedule_user_mdlive_messages_sync(user.id, send_new_message_email=True)
+        is False
+    )
+    assert mocked_apply_async.call_count == 1
+    kwargs = mocked_apply_async.call_args[1]
+    assert kwargs["args"] == [str(user.id)] and kwargs["kwargs"] == {"coalesced": True}
+
+    # Sync doesn't run while another one is in flight
+    running_key = tasks.get_mdlive_sync_cache_keys(str(user.id))[2]
+    cache.set(running_key, "other-task")
+    tasks.sync_user_mdlive_messages(str(user.id), coalesced=True)
+    assert not mocked_sync.called
+    cache.delete(running_key)
+
+    log = mocker.patch("beacon.users.tasks.log")
+    tasks.sync_user_mdlive_messages(str(user.id), coalesced=True)
+    mocked_sync.assert_called_once_with(user)
+    mocked_email.assert_called_once_with(user)
+    assert log.info.call_args[1]["extra"]["merged_events"] == 3
+    assert mocked_apply_async.call_count == 1
+
+    # Scheduled sync is skipped once pending events were already synced
+    tasks.sync_user_mdlive_messages(str(user.id), coalesced=True)
+    assert mocked_sync.call_count == 1
+
+    # Events received during a sync schedule a follow-up sync
+    def receive_event(user):
+        tasks.schedule_user_mdlive_messages_sync(user.id)
+
+    mocked_sync.side_effect = receive_event
+    tasks.sync_user_mdlive_messages(str(user.id))
+    assert mocked_sync.call_count == 2
+    assert mocked_apply_async.call_count == 3
+
+
+def test_mdlive_email_requested_during_sync_is_not_lost(mocker):
+    user = factories.create_user()
+    mocked_apply_async = mocker.patch(
+        "beacon.users.tasks.sync_user_mdlive_messages.apply_async"
+    )
+    mocked_sync = mocker.patch("beacon.mdlive.services.sync_user_contacts_and_messages")
+    mocked_email = mocker.patch("beacon.mdlive.services.send_new_message_email_to_user")
+    _, email_key, _ = tasks.get_mdlive_sync_cache_keys(str(user.id))
+    tasks.schedule_user_mdlive_messages_sync(user.id)
+
+    # New message email is requested right after the sync read the email flag
+    cache_get = cache.get
+
+    def get(key, *args, **kwargs):
+        value = cache_get(key, *args, **kwargs)
+        if key == email_key and not mocked_sync.called:
+            tasks.schedule_user_mdlive_messages_sync(
+                user.id, send_new_message_email=True
+            )
+        return value
+
+    mocker.patch.object(cache, "get", side_effect=get)
+    tasks.sync_user_mdlive_messages(str(user.id), coalesced=True)
+    assert mocked_sync.call_count == 1
+    assert not mocked_email.called
+    assert cache_get(email_key) == 1
+    # Follow-up sync is scheduled and sends the email
+    assert mocked_apply_async.call_count == 2
+
+    tasks.sync_user_mdlive_messages(str(user.id), coalesced=True)
+    assert mocked_sync.call_count == 2
+    mocked_email.assert_called_once_with(user)
+    assert not cache_get(email_key)
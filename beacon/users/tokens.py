@@ -8,11 +8,9 @@ from django.core.signing import BadSignature, SignatureExpired, TimestampSigner
 
 # beacon Stuff
 from beacon.base import exceptions as exc
+from beacon.base.utils.tokens import unsign_token
 
-from .services import (
-    get_logged_in_user_tokens_from_cache,
-    set_logged_in_user_token_to_cache,
-)
+from .services import is_logged_in_user_token, set_logged_in_user_token_to_cache
 from .utils import decode_uuid_from_base64, encode_uuid_to_base64
 
 ALGORITHM = "HS256"  # type: str
@@ -48,30 +46,27 @@ def get_user_for_token(
     a user instance corresponding with user_id stored
     in the incoming token.
     """
-    signer = TimestampSigner()
     try:
-        token = signer.unsign(signed_token, max_age=60 * max_age_in_minutes)
+        data = unsign_token(signed_token, max_age=60 * max_age_in_minutes)
     except SignatureExpired:
         raise exc.NotAuthenticated("Token expired")
     except BadSignature:
         raise exc.NotAuthenticated("Invalid token")
-
-    try:
-        data = jwt.decode(token, settings.SECRET_KEY, algorithms=[ALGORITHM])
     except jwt.DecodeError:
         raise exc.NotAuthenticated("Invalid token!")
 
-    model_cls = get_user_model()
+    user_id = data.get("user_%s_id" % scope)
+    if user_id is None:
+        raise exc.NotAuthenticated("Invalid token!")
 
-    try:
-        user = model_cls.objects.get(pk=data["user_%s_id" % scope])
-    except (model_cls.DoesNotExist, KeyError):
+    # checking the session registry for logged out users
+    if not is_logged_in_user_token(str(user_id), signed_token):
         raise exc.NotAuthenticated("Invalid token!")
-    else:
-        # getting all the tokens for this user from cache to check logged out users
-        tokens = get_logged_in_user_tokens_from_cache(str(user.id))
-        if signed_token in tokens:
-            return user
+
+    model_cls = get_user_model()
+    try:
+        return model_cls.objects.get(pk=user_id)
+    except model_cls.DoesNotExist:
         raise exc.NotAuthenticated("Invalid token!")
 
 
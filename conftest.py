@@ -32,7 +32,12 @@ def cleared_cache():
     """
     from django.core.cache import cache
 
+    from beacon.base.utils.tokens import verified_tokens
+    from beacon.mdlive.directory import local_providers
+
     cache.clear()
+    verified_tokens.clear()
+    local_providers.clear()
     return cache
 
 
@@ -25,6 +25,7 @@ INSTALLED_APPS = (
     "django.contrib.messages",
     "django.contrib.staticfiles",
     "django.contrib.admin",
+    "django.contrib.postgres",
     # 'django.contrib.humanize',  # Useful template tags
     "reversion",
     "beacon.answers",
@@ -158,6 +159,8 @@ REST_FRAMEWORK = {
 JWT_TOKEN_EXPIRATION_DURATION = env.int(
     "JWT_TOKEN_EXPIRATION_DURATION", default=30
 )  # in minutes
+# Number of verified auth tokens cached per process
+VERIFIED_TOKEN_CACHE_SIZE = env.int("VERIFIED_TOKEN_CACHE_SIZE", default=4096)
 
 # https://django-rest-swagger.readthedocs.io/en/latest/settings/
 SWAGGER_SETTINGS = {
@@ -217,6 +220,7 @@ MIDDLEWARE = [
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "beacon.organisations.middleware.OrganisationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
     "django_user_agents.middleware.UserAgentMiddleware",
@@ -526,11 +530,23 @@ MDLIVE_WEBHOOK_BASE_URL = env(
     "MDLIVE_WEBHOOK_BASE_URL", default="http://localhost:8000"
 )
 MDLIVE_WEBHOOK_URL = env("MDLIVE_WEBHOOK_URL", default="/api/messages/webhook")
+MDLIVE_CONNECT_TIMEOUT = env.float("MDLIVE_CONNECT_TIMEOUT", default=3.05)  # in seconds
+MDLIVE_READ_TIMEOUT = env.float("MDLIVE_READ_TIMEOUT", default=15)  # in seconds
+# Retries of idempotent requests on connection errors and 502/503/504 responses
+MDLIVE_MAX_RETRIES = env.int("MDLIVE_MAX_RETRIES", default=2)
+MDLIVE_POOL_MAXSIZE = env.int("MDLIVE_POOL_MAXSIZE", default=10)
+# Conversations and provider profiles fetched in parallel while syncing messages
+MDLIVE_SYNC_MAX_WORKERS = env.int("MDLIVE_SYNC_MAX_WORKERS", default=4)
 
 # VERSATILE IMAGE FIELD SIZES
 # http://django-versatileimagefield.readthedocs.org/en/latest/drf_integration.html
 VERSATILEIMAGEFIELD_RENDITION_KEY_SETS = {
     "logo_image": [("full_size", "url")],
+    "provider_photo": [
+        ("full_size", "url"),
+        ("small", "thumbnail__100x100"),
+        ("medium", "thumbnail__300x300"),
+    ],
 }
 
 # Campaign Monitor Configuration
@@ -562,6 +578,11 @@ USER_CSV_IMPORT_FILE_PATH = env(
 )
 DEFAULT_ORG_FOR_TESTING = env("DEFAULT_ORG_FOR_TESTING", default=None)
 ORG_SEARCH_TERM_CHAR_LIMIT = env.int("ORG_SEARCH_TERM_CHAR_LIMIT", default=5)
+ORG_TYPEAHEAD_SEARCH_TERM_CHAR_LIMIT = env.int(
+    "ORG_TYPEAHEAD_SEARCH_TERM_CHAR_LIMIT", default=2
+)
+# Hard limit of organisations returned by the typeahead search
+ORG_TYPEAHEAD_RESULT_LIMIT = env.int("ORG_TYPEAHEAD_RESULT_LIMIT", default=10)
 # Name of cache backend to cache user agents. If it not specified default
 # cache alias will be used. Set to `None` to disable caching.
 USER_AGENTS_CACHE = "default"